@@ -0,0 +1,397 @@
+"""
+Headless batch runner for the competitor intelligence pipeline.
+
+    python batch.py companies.csv --output reports.jsonl --provider openai --model gpt-4o
+
+The input is a CSV or JSONL file with a `url` and/or `description` for each company, plus an
+optional `id`. Companies are processed in parallel, and each finished report is written to the
+output as soon as it is ready: appended to a JSONL file, or added to a directory of Parquet part
+files with `--format parquet`. Finished companies are checkpointed next to the output, so
+rerunning the same command after an interruption only processes what is left; a company retried
+after a failed or degraded run replaces its earlier JSONL record. `--trace` appends
+every stage span (timings, tokens, cost) as JSON lines and `--metrics` writes OpenMetrics text
+for the run, for tracking latency percentiles across runs. Competitor snapshots are kept between
+runs, so analyzing the same company again only re-analyzes competitors whose websites changed, and
+each report records what changed since the previous one.
+
+API keys are read from the environment: OPENAI_API_KEY, ANTHROPIC_API_KEY, GOOGLE_API_KEY or
+DEEPSEEK_API_KEY for the selected provider, plus FIRECRAWL_API_KEY and EXA_API_KEY.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from cache import CrawlCache, get_response_cache
+from clients import PROVIDER_SDKS, provider_available
+from competitor_agent_team import MODEL_OPTIONS, CompetitorIntelligenceTeam
+from dedupe import DomainIndex
+from reporters import CollectingReporter
+from snapshots import SnapshotStore
+from summarize import DEFAULT_SUMMARY_MODE, SUMMARY_MODES
+from tracing import Tracer, to_openmetrics
+
+logger = logging.getLogger("competitor_intel.batch")
+
+PROVIDER_KEY_ENV = {
+    "openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY",
+    "google": "GOOGLE_API_KEY", "deepseek": "DEEPSEEK_API_KEY",
+}
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_LLM_CALLS = 4
+DEFAULT_CRAWL_CONCURRENCY = 4   # Per company; total crawls in flight is roughly workers x this
+DEFAULT_PARQUET_BATCH = 50
+
+
+# --- Input ---
+def load_companies(path: str) -> List[Dict[str, str]]:
+    """Reads companies from CSV or JSONL, assigning each a stable id. Rows without a URL or description are skipped."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            rows: Iterable[Dict[str, Any]] = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        companies, seen = [], set()
+        for line_no, row in enumerate(rows, 1):
+            url = str(row.get("url") or "").strip()
+            description = str(row.get("description") or "").strip()
+            if not url and not description:
+                logger.warning("Skipping row %d: needs a url or description", line_no)
+                continue
+            company_id = str(row.get("id") or "").strip() or url or \
+                "desc-" + hashlib.sha1(description.encode("utf-8")).hexdigest()[:12]
+            if company_id in seen:
+                logger.warning("Skipping row %d: duplicate id %s", line_no, company_id)
+                continue
+            seen.add(company_id)
+            companies.append({"id": company_id, "url": url, "description": description})
+    return companies
+
+
+# --- Checkpointing ---
+class Checkpoint:
+    """Append-only JSONL log of each company's latest outcome, used to resume interrupted runs"""
+    def __init__(self, path: str):
+        self.path = path
+        self.statuses: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue # Torn last line from an interrupted write
+                    self.statuses[entry["id"]] = entry["status"]
+
+    def is_done(self, company_id: str, retry_failed: bool = True) -> bool:
+        status = self.statuses.get(company_id)
+        return status == "ok" or (status is not None and not retry_failed)
+
+    def record(self, company_id: str, status: str) -> None:
+        with self._lock:
+            self.statuses[company_id] = status
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"id": company_id, "status": status, "at": time.time()}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+# --- Output ---
+class JsonlReportWriter:
+    """
+    Appends one JSON line per report and flushes it immediately. Companies retried on resume are appended
+    again, so the file is compacted to the latest record per company when it is opened and closed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.compact()
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def compact(self) -> None:
+        """Rewrites the file with only the last record of each company, dropping a torn last line."""
+        if not os.path.exists(self.path):
+            return
+        latest: Dict[str, int] = {}
+        with open(self.path, encoding="utf-8") as f: # Two passes, so memory doesn't grow with the file
+            for line_no, line in enumerate(f):
+                try:
+                    latest[json.loads(line)["id"]] = line_no
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+        keep = set(latest.values())
+        temp_path = self.path + ".tmp"
+        with open(self.path, encoding="utf-8") as f, open(temp_path, "w", encoding="utf-8") as out:
+            for line_no, line in enumerate(f):
+                if line_no in keep:
+                    out.write(line if line.endswith("\n") else line + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp_path, self.path)
+
+    def write(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Writes a report and returns the records that are now safely on disk."""
+        with self._lock:
+            self._file.write(json.dumps(record, default=str) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        return [record]
+
+    def close(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._file.close()
+            self.compact()
+        return []
+
+
+class ParquetReportWriter:
+    """
+    Writes reports to a directory of Parquet part files, readable with `pandas.read_parquet(directory)`.
+    A Parquet file is only readable once closed, so reports are buffered and written as a complete part
+    file every `batch_size` reports; only then are they reported as durable.
+    """
+    SCALAR_COLUMNS = ("id", "status", "provider", "model", "analysis_error", "finished_at")
+    JSON_COLUMNS = ("input", "warnings", "errors", "competitors", "analysis", "comparison_table", "changes")
+    FLOAT_COLUMNS = ("elapsed_seconds", "llm_cost_usd")
+
+    def __init__(self, directory: str, batch_size: int = DEFAULT_PARQUET_BATCH):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow: pip install pyarrow")
+        self._pa, self._pq = pa, pq
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self._schema = pa.schema(
+            [(c, pa.string()) for c in self.SCALAR_COLUMNS + self.JSON_COLUMNS] + [(c, pa.float64()) for c in self.FLOAT_COLUMNS]
+        )
+        self._buffer: List[Dict[str, Any]] = []
+        self._parts = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        row = {c: record.get(c) for c in self.SCALAR_COLUMNS}
+        row.update({c: json.dumps(record.get(c), default=str) for c in self.JSON_COLUMNS})
+        row.update({c: record.get(c) for c in self.FLOAT_COLUMNS})
+        return row
+
+    def _flush(self) -> List[Dict[str, Any]]:
+        if not self._buffer:
+            return []
+        flushed, self._buffer = self._buffer, []
+        self._parts += 1
+        name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._parts:05d}.parquet"
+        table = self._pa.Table.from_pylist([self._row(r) for r in flushed], schema=self._schema)
+        self._pq.write_table(table, os.path.join(self.directory, name))
+        return flushed
+
+    def write(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._buffer.append(record)
+            return self._flush() if len(self._buffer) >= self.batch_size else []
+
+    def close(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._flush()
+
+
+def serialize_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Makes a CompetitorIntelligenceTeam report JSON-friendly."""
+    table = report.get("comparison")
+    return {
+        "competitors": report.get("competitors", []),
+        "analysis": report.get("analysis", {}),
+        "analysis_error": report.get("analysis_error"),
+        "comparison_table": table.records() if table is not None else [],
+        "changes": report.get("changes"),
+    }
+
+
+# --- Processing ---
+class BatchRunner:
+    """Runs the competitor pipeline for many companies on a worker pool with a shared cap on LLM calls"""
+    def __init__(self, args: argparse.Namespace, keys: Dict[str, str]):
+        self.args = args
+        self.keys = keys
+        self.llm_slots = threading.BoundedSemaphore(args.max_llm_calls)
+        self.crawl_cache = None if args.no_cache else CrawlCache()
+        self.response_cache = None if args.no_cache else get_response_cache(persist=True)
+        self.domain_index = None if args.no_cache else DomainIndex()
+        self.snapshots = None if args.no_cache else SnapshotStore()
+        self.spans: List[Dict[str, Any]] = [] # Every company's spans, for the run's metrics
+        self._trace_lock = threading.Lock()
+
+    def _export_trace(self, tracer: Tracer) -> None:
+        records = tracer.records()
+        with self._trace_lock:
+            self.spans.extend(records)
+            if self.args.trace:
+                with open(self.args.trace, "a", encoding="utf-8") as f:
+                    f.write(tracer.to_jsonl())
+
+    def analyze(self, company: Dict[str, str]) -> Dict[str, Any]:
+        """Runs discovery, crawling and analysis for one company and returns its output record."""
+        reporter = CollectingReporter(prefix=company["id"])
+        started = time.monotonic()
+        record: Dict[str, Any] = {
+            "id": company["id"], "input": {"url": company["url"], "description": company["description"]},
+            "provider": self.args.provider, "model": self.args.model,
+        }
+        tracer = Tracer(company_id=company["id"])
+        try:
+            team = CompetitorIntelligenceTeam(reporter=reporter, tracer=tracer)
+            team.configure_crawler(max_concurrency=self.args.crawl_concurrency)
+            team.configure_agents(
+                llm_provider=self.args.provider, llm_api_key=self.keys["llm"], llm_model_id=self.args.model,
+                firecrawl_key=self.keys["firecrawl"], exa_key=self.keys["exa"],
+                crawl_cache=self.crawl_cache, response_cache=self.response_cache, llm_slots=self.llm_slots,
+                backup_llms=[(p, os.environ[PROVIDER_KEY_ENV[p]], m) for p, m in self.args.backup],
+                domain_index=self.domain_index, snapshots=self.snapshots, summary_mode=self.args.summaries,
+            )
+            is_url = bool(company["url"])
+            competitors = team.discover_competitors(company["url"] if is_url else company["description"], is_url)
+            if competitors:
+                record.update(serialize_report(team.generate_intelligence_report(competitors)))
+                # Errors mean part of the report is missing (e.g. the analysis failed), so it is retried on resume
+                record["status"] = "degraded" if reporter.errors else "ok"
+            else:
+                reporter.error("No competitors found or discovery failed.")
+                record["status"] = "failed"
+        except Exception as e:
+            reporter.error(f"Unexpected error: {e}")
+            record["status"] = "failed"
+        self._export_trace(tracer)
+        llm_costs = [r["cost_usd"] for r in tracer.records() if r.get("cost_usd") is not None]
+        record.update({
+            "warnings": reporter.warnings, "errors": reporter.errors,
+            "llm_cost_usd": round(sum(llm_costs), 6) if llm_costs else None,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        })
+        return record
+
+    def run(self, companies: List[Dict[str, str]], writer: Any, checkpoint: Checkpoint) -> int:
+        """Processes `companies`, streaming each record to `writer`. Returns the number of failed companies."""
+        total, finished, failures = len(companies), 0, 0
+        handled: Set[Future] = set()
+
+        def handle(future: Future) -> None:
+            nonlocal finished, failures
+            if future in handled:
+                return
+            handled.add(future)
+            record = future.result()
+            finished += 1
+            failures += record["status"] != "ok"
+            logger.info("[%d/%d] %s: %s in %.1fs", finished, total, record["id"], record["status"], record["elapsed_seconds"])
+            for durable in writer.write(record):
+                checkpoint.record(durable["id"], durable["status"])
+
+        executor = ThreadPoolExecutor(max_workers=self.args.workers, thread_name_prefix="company")
+        futures = [executor.submit(self.analyze, company) for company in companies]
+        try:
+            try:
+                for future in as_completed(futures):
+                    handle(future)
+            except KeyboardInterrupt:
+                in_flight = [f for f in futures if f not in handled and not f.cancel()]
+                logger.warning("Interrupted: finishing %d in-flight companies (Ctrl+C again to abort). "
+                               "Rerun the same command to resume.", len(in_flight))
+                for future in as_completed(in_flight):
+                    handle(future)
+                raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            for durable in writer.close():
+                checkpoint.record(durable["id"], durable["status"])
+        return failures
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run competitor analysis for a batch of companies.")
+    parser.add_argument("input", help="CSV or JSONL file with url and/or description columns (optional id)")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file, or a directory with --format parquet")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--provider", choices=sorted(MODEL_OPTIONS), default="openai")
+    parser.add_argument("--model", help="Model id (defaults to the provider's first model)")
+    parser.add_argument("--backup", action="append", default=[], metavar="PROVIDER[:MODEL]",
+                        help="Backup provider to hedge slow requests with (repeatable); its key is read from the environment")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Companies processed in parallel")
+    parser.add_argument("--max-llm-calls", type=int, default=DEFAULT_MAX_LLM_CALLS, help="LLM requests in flight across all workers")
+    parser.add_argument("--crawl-concurrency", type=int, default=DEFAULT_CRAWL_CONCURRENCY, help="Concurrent crawls per company")
+    parser.add_argument("--summaries", choices=sorted(SUMMARY_MODES), default=DEFAULT_SUMMARY_MODE,
+                        help="Summarize pages locally or in batched LLM requests")
+    parser.add_argument("--checkpoint", help="Checkpoint file (defaults to <output>.checkpoint)")
+    parser.add_argument("--no-retry-failed", action="store_true", help="On resume, skip companies that failed previously")
+    parser.add_argument("--parquet-batch", type=int, default=DEFAULT_PARQUET_BATCH, help="Reports per Parquet part file")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the crawl and LLM response caches, the seen-domain index and competitor snapshots")
+    parser.add_argument("--trace", help="Append per-stage spans (timings, tokens, cost) to this JSONL file")
+    parser.add_argument("--metrics", help="Write per-stage latency, token and cost metrics for the run as OpenMetrics text")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    args.model = args.model or next(iter(MODEL_OPTIONS[args.provider]))
+    args.checkpoint = args.checkpoint or args.output.rstrip("/\\") + ".checkpoint"
+    backups = []
+    for spec in args.backup:
+        provider, _, model_id = spec.partition(":")
+        if provider not in MODEL_OPTIONS:
+            parser.error(f"unknown backup provider: {provider}")
+        backups.append((provider, model_id or next(iter(MODEL_OPTIONS[provider]))))
+    args.backup = backups
+    unavailable = [p for p in dict.fromkeys([args.provider] + [p for p, _ in backups]) if not provider_available(p)]
+    if unavailable:
+        parser.error("SDK not installed for " + ", ".join(f"{p} (pip install {PROVIDER_SDKS[p][1]})" for p in unavailable))
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    keys = {
+        "llm": os.environ.get(PROVIDER_KEY_ENV[args.provider], ""),
+        "firecrawl": os.environ.get("FIRECRAWL_API_KEY", ""),
+        "exa": os.environ.get("EXA_API_KEY", ""),
+    }
+    missing = [name for name, value in (
+        (PROVIDER_KEY_ENV[args.provider], keys["llm"]), ("FIRECRAWL_API_KEY", keys["firecrawl"]), ("EXA_API_KEY", keys["exa"])
+    ) + tuple((PROVIDER_KEY_ENV[p], os.environ.get(PROVIDER_KEY_ENV[p], "")) for p, _ in args.backup) if not value]
+    if missing:
+        logger.error("Missing API keys in environment: %s", ", ".join(missing))
+        return 2
+
+    companies = load_companies(args.input)
+    checkpoint = Checkpoint(args.checkpoint)
+    pending = [c for c in companies if not checkpoint.is_done(c["id"], retry_failed=not args.no_retry_failed)]
+    logger.info("%d companies in input, %d already done, %d to process with %s/%s",
+                len(companies), len(companies) - len(pending), len(pending), args.provider, args.model)
+    if not pending:
+        return 0
+
+    writer = ParquetReportWriter(args.output, args.parquet_batch) if args.format == "parquet" else JsonlReportWriter(args.output)
+    runner = BatchRunner(args, keys)
+    try:
+        failures = runner.run(pending, writer, checkpoint)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if args.metrics:
+            with open(args.metrics, "w", encoding="utf-8") as f:
+                f.write(to_openmetrics(runner.spans))
+    logger.info("Done: %d ok, %d failed or degraded.", len(pending) - failures, failures)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+End-to-end benchmark of the competitor pipeline against local stand-in services.
+
+    python benchmark.py --provider openai --sizes 5 50 500 --repeat 3 --output baseline.json
+    python benchmark.py --provider openai --sizes 5 50 500 --repeat 3 --compare baseline.json
+
+Starts the fake_services stand-ins in-process (or uses --services-url for servers started separately
+with `python fake_services.py`, which keeps server work out of the measured process), points
+Firecrawl, Exa and the LLM provider at them and runs CompetitorIntelligenceTeam discovery, crawling
+and analysis for each competitor count. Caches are disabled so every run does the full work.
+For each count it reports throughput (competitors per second), p50/p95 latency of whole runs and of
+the crawl and LLM stages (from the pipeline's tracing spans), errors and peak memory. With
+--compare, throughput drops or p95 increases beyond --regression-threshold fail the run.
+With --change-rate, repeated runs are incremental: they share competitor snapshots and that share
+of the crawled pages changes before each repeat, measuring what continuous tracking costs.
+
+    python benchmark.py --imports --provider anthropic --repeat 5 --output imports.json
+
+With --imports, only the cold start is measured instead: each repeat imports the app in a fresh
+interpreter, then configures an AnalysisAgent for --provider, and the import and configuration
+times are reported together with the heavy modules (SDKs, pandas, Streamlit) each step loaded.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from fake_services import SERVICES, FakeServices, add_profile_arguments, build_profiles, env_for
+from summarize import DEFAULT_SUMMARY_MODE, SUMMARY_MODES
+from tracing import summarize
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+DEFAULT_SIZES = (5, 50, 500)
+DEFAULT_REPEAT = 3
+DEFAULT_REGRESSION_THRESHOLD = 0.10  # Relative change that counts as a regression
+COMPANY_DESCRIPTION = "A B2B SaaS platform for revenue analytics and sales forecasting aimed at mid-market teams."
+HEAVY_MODULES = ("streamlit", "pandas", "numpy", "httpx", "openai", "anthropic", "google.genai", "tiktoken")
+# Run in a fresh interpreter per repeat: times importing the app and configuring one provider's agent
+IMPORT_PROBE = """
+import json, sys, time
+heavy = json.loads(sys.argv[3])
+started = time.perf_counter()
+import competitor_agent_team as app
+imported = time.perf_counter()
+at_import = [m for m in heavy if m in sys.modules]
+agent = app.AnalysisAgent(provider=sys.argv[1], api_key="benchmark", model_id=sys.argv[2])
+configured = time.perf_counter()
+print(json.dumps({"import_s": imported - started, "configure_s": configured - imported, "client": agent.client is not None,
+                  "at_import": at_import, "at_configure": [m for m in heavy if m in sys.modules and m not in at_import]}))
+"""
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))]
+
+
+def _max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024 # Bytes on macOS, KB elsewhere
+
+
+def run_size(args: argparse.Namespace, size: int, services: Optional[FakeServices] = None) -> Dict[str, Any]:
+    """Runs the pipeline `args.repeat` times for `size` competitors and returns the measurements."""
+    # Imported here so the environment pointing the agents at the stand-ins is already in place
+    from competitor_agent_team import CompetitorIntelligenceTeam
+    from reporters import CollectingReporter
+    from snapshots import SnapshotStore
+
+    snapshots = SnapshotStore(os.path.join(tempfile.mkdtemp(prefix="bench-"), "snapshots.sqlite")) if args.change_rate is not None else None
+    reanalyzed = 0
+    run_latencies: List[float] = []
+    spans: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    for index in range(args.repeat):
+        reporter = CollectingReporter(prefix=f"{size}/{index}")
+        with contextlib.redirect_stdout(io.StringIO() if not args.verbose else sys.stdout): # Agents print per competitor
+            team = CompetitorIntelligenceTeam(reporter=reporter)
+            team.configure_crawler(max_concurrency=args.crawl_concurrency)
+            team.configure_agents(llm_provider=args.provider, llm_api_key="bench", llm_model_id=args.model,
+                                  firecrawl_key="bench", exa_key="bench", snapshots=snapshots, summary_mode=args.summaries)
+            if snapshots and index and services:
+                services.revise(args.change_rate)
+            run_started = time.perf_counter()
+            competitors = team.discover_competitors(COMPANY_DESCRIPTION, count=size)
+            report = team.generate_intelligence_report(competitors, on_section=(lambda key, value: None) if args.stream else None)
+            reanalyzed += (report.get("changes") or {}).get("reanalyzed", 0) if index else 0
+        run_latencies.append(time.perf_counter() - run_started)
+        spans.extend(team.tracer.records())
+        errors.extend(reporter.errors)
+    wall = time.perf_counter() - started
+    peak_traced = None
+    if not args.no_tracemalloc:
+        peak_traced = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    stages = {row["stage"]: row for row in summarize(spans)}
+    crawl, llm = stages.get("crawl", {}), stages.get("llm", {})
+    return {
+        "competitors": size, "runs": args.repeat, "wall_s": round(wall, 3),
+        "throughput_cps": round(size * args.repeat / wall, 3) if wall else None,
+        "run_p50_s": _percentile(run_latencies, 50), "run_p95_s": _percentile(run_latencies, 95),
+        "crawl_p50_s": crawl.get("p50_s"), "crawl_p95_s": crawl.get("p95_s"),
+        "llm_calls": llm.get("count", 0), "llm_p50_s": llm.get("p50_s"), "llm_p95_s": llm.get("p95_s"),
+        # Competitors analyzed again by the incremental repeats (--change-rate), out of size x (repeat - 1)
+        "reanalyzed": reanalyzed if snapshots else None,
+        "errors": len(errors), "first_error": errors[0] if errors else None,
+        "peak_traced_mb": round(peak_traced, 1) if peak_traced is not None else None,
+        "max_rss_mb": round(_max_rss_mb(), 1) if resource else None, # Process high-water mark, never resets
+        "stages": list(stages.values()),
+    }
+
+
+def measure_imports(args: argparse.Namespace) -> Dict[str, Any]:
+    """Cold-start cost of the app: `args.repeat` fresh interpreters each import it and configure `args.provider`."""
+    samples = []
+    for _ in range(args.repeat):
+        proc = subprocess.run([sys.executable, "-c", IMPORT_PROBE, args.provider, args.model, json.dumps(HEAVY_MODULES)],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        if proc.returncode:
+            raise RuntimeError(f"import probe failed: {proc.stderr.strip().splitlines()[-1:]}")
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    imports, configures = [s["import_s"] for s in samples], [s["configure_s"] for s in samples]
+    return {
+        "provider": args.provider, "model": args.model, "runs": len(samples), "client": samples[-1]["client"],
+        "import_p50_s": round(_percentile(imports, 50), 4), "import_p95_s": round(_percentile(imports, 95), 4),
+        "configure_p50_s": round(_percentile(configures, 50), 4), "configure_p95_s": round(_percentile(configures, 95), 4),
+        "loaded_at_import": samples[-1]["at_import"], "loaded_at_configure": samples[-1]["at_configure"],
+    }
+
+
+def print_imports(result: Dict[str, Any]) -> None:
+    print(f"Import competitor_agent_team: p50 {result['import_p50_s']:.3f}s, p95 {result['import_p95_s']:.3f}s "
+          f"(heavy modules loaded: {', '.join(result['loaded_at_import']) or 'none'})")
+    print(f"Configure {result['provider']}/{result['model']}: p50 {result['configure_p50_s']:.3f}s, "
+          f"p95 {result['configure_p95_s']:.3f}s (loads {', '.join(result['loaded_at_configure']) or 'nothing'})"
+          + ("" if result["client"] else " - client not created, is the SDK installed?"))
+
+
+def compare_imports(result: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Returns a description of every cold-start regression against `baseline` beyond `threshold`."""
+    base = baseline.get("imports") or {}
+    regressions = []
+    for metric in ("import_p50_s", "configure_p50_s"):
+        old, new = base.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        print(f"  {metric}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+        if change > threshold:
+            regressions.append(f"{metric} {change:+.1%}")
+    return regressions
+
+
+def _fmt(value: Any, spec: str = ".2f") -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'competitors':>11} {'runs':>4} {'comp/s':>8} {'run p50':>8} {'run p95':>8} {'crawl p95':>9} "
+          f"{'llm calls':>9} {'llm p95':>8} {'errors':>6} {'peak MB':>8} {'rss MB':>8}")
+    for r in results:
+        print(f"{r['competitors']:>11} {r['runs']:>4} {_fmt(r['throughput_cps']):>8} {_fmt(r['run_p50_s']):>8} "
+              f"{_fmt(r['run_p95_s']):>8} {_fmt(r['crawl_p95_s']):>9} {r['llm_calls']:>9} {_fmt(r['llm_p95_s']):>8} "
+              f"{r['errors']:>6} {_fmt(r['peak_traced_mb'], '.1f'):>8} {_fmt(r['max_rss_mb'], '.1f'):>8}")
+        if r.get("reanalyzed") is not None and r["runs"] > 1:
+            print(f"{'':>11} incremental repeats re-analyzed {r['reanalyzed']} of {r['competitors'] * (r['runs'] - 1)} competitors")
+        if r["first_error"]:
+            print(f"{'':>11} first error: {r['first_error']}")
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Returns a description of every regression against `baseline` beyond `threshold`."""
+    previous = {r["competitors"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        base = previous.get(r["competitors"])
+        if not base:
+            continue
+        checks = (("throughput_cps", -1), ("run_p95_s", 1), ("peak_traced_mb", 1)) # -1: lower is worse
+        for metric, direction in checks:
+            old, new = base.get(metric), r.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            print(f"  {r['competitors']:>4} competitors {metric}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+            if change * direction > threshold:
+                regressions.append(f"{r['competitors']} competitors: {metric} {change:+.1%}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    from competitor_agent_team import DEFAULT_CRAWL_CONCURRENCY, MODEL_OPTIONS
+    parser = argparse.ArgumentParser(description="Benchmark the competitor pipeline against local stand-in services.")
+    parser.add_argument("--provider", choices=sorted(MODEL_OPTIONS), default="openai")
+    parser.add_argument("--model", help="Model id (defaults to the provider's first model)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Competitor counts to run")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per competitor count")
+    parser.add_argument("--stream", action="store_true", help="Stream analysis replies, as the app does by default")
+    parser.add_argument("--crawl-concurrency", type=int, default=DEFAULT_CRAWL_CONCURRENCY)
+    parser.add_argument("--summaries", choices=sorted(SUMMARY_MODES), default=DEFAULT_SUMMARY_MODE,
+                        help="Summarize pages locally or in batched LLM requests")
+    parser.add_argument("--services-url", help="Use stand-in services already running at this URL")
+    parser.add_argument("--change-rate", type=float,
+                        help="Run repeats incrementally from snapshots, changing this share of the pages before each one")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="Keep the client-side per-key rate limits (off by default: the stand-ins have no quotas)")
+    parser.add_argument("--imports", action="store_true",
+                        help="Measure the cold start (app import and provider setup in fresh interpreters) instead of the pipeline")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip peak memory tracing, which slows allocation-heavy code")
+    parser.add_argument("--output", help="Write results as JSON, e.g. to use as a baseline")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with results written earlier by --output")
+    parser.add_argument("--regression-threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the agents' output")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    args.model = args.model or next(iter(MODEL_OPTIONS[args.provider]))
+    if args.change_rate is not None and args.services_url:
+        parser.error("--change-rate needs the in-process stand-ins (not --services-url) to change their pages")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR, format="%(levelname)s %(message)s")
+    if args.imports:
+        return main_imports(args)
+    services = None
+    if args.services_url:
+        os.environ.update(env_for(args.services_url))
+    else:
+        services = FakeServices(profiles=build_profiles(args.latency, args.error_rate, args.time_scale),
+                                page_kb=args.page_kb, duplicate_rate=args.duplicate_rate).start()
+        os.environ.update(services.env())
+    if not args.keep_rate_limits:
+        from resilience import get_resilience
+        get_resilience().rate_limits = {service: (1e9, 1_000_000) for service in SERVICES}
+
+    print(f"Benchmarking {args.provider}/{args.model} against {args.services_url or services.url} "
+          f"(sizes {', '.join(map(str, args.sizes))}, {args.repeat} runs each, {args.summaries} summaries)...")
+    results = []
+    try:
+        # Untimed warm-up, so one-off costs (imports, client setup, first connections) don't land in the first size
+        run_size(argparse.Namespace(**dict(vars(args), repeat=1, no_tracemalloc=True)), min(args.sizes), services)
+        for size in args.sizes:
+            results.append(run_size(args, size, services))
+            print(f"  {size} competitors: {results[-1]['throughput_cps']} competitors/s")
+    finally:
+        if services:
+            services.stop()
+
+    print()
+    print_results(results)
+    if services:
+        print("\nStand-in requests: " + ", ".join(f"{s} {n} ({services.failures[s]} failed)"
+                                                  for s, n in services.requests.items() if n))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+                       "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare}:")
+        regressions = compare(results, baseline, args.regression_threshold)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+def main_imports(args: argparse.Namespace) -> int:
+    print(f"Measuring cold start with {args.provider}/{args.model} ({args.repeat} fresh interpreters)...")
+    result = measure_imports(args)
+    print_imports(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+                       "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "imports": result}, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare}:")
+        regressions = compare_imports(result, baseline, args.regression_threshold)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Persistent caches for the competitor intelligence app.
+
+DiskCache is a small SQLite-backed key/value store with TTL expiry, LRU eviction against a byte
+budget and hit/miss counters that survive restarts. CrawlCache builds on it to remember crawl
+payloads and their summaries per normalized URL, so repeat analyses can skip the network.
+ResponseCache memoizes validated LLM analyses in a process-wide in-memory LRU, optionally
+backed by a DiskCache tier.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "COMPETITOR_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+DEFAULT_CRAWL_CACHE_TTL = 24 * 60 * 60        # One day
+DEFAULT_CRAWL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_RESPONSE_CACHE_ENTRIES = 256
+DEFAULT_RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_RESPONSE_DISK_TTL = 7 * 24 * 60 * 60   # One week
+DEFAULT_RESPONSE_DISK_MAX_BYTES = 64 * 1024 * 1024
+
+# Query parameters that only track the visitor and never change page content
+TRACKING_PARAMS = ("utm_", "gclid", "fbclid", "mc_cid", "mc_eid", "ref")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Normalizes a URL so trivially different spellings of the same page share a cache key."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def content_hash(content: str) -> str:
+    """Stable fingerprint of crawled page content."""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """SQLite key/value store with TTL, max-bytes LRU eviction and persistent hit/miss counters"""
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation keeps the cache safe to use from crawl worker threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _is_expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def _count(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or self._is_expired(row[1], now):
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(conn, "misses")
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits")
+        return json.loads(row[0])
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Returns the stored value even if expired, without touching counters or LRU order."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any) -> None:
+        """Stores a JSON-serializable value, then evicts least recently used entries over the byte budget."""
+        payload = json.dumps(value)
+        size = len(payload.encode("utf-8"))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return # Would evict everything else and still not fit
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds is not None:
+            conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,))
+        if self.max_bytes is None:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES ('evictions', ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (len(victims),),
+        )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Drops every entry and resets the counters."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM stats")
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss/eviction counters plus the current entry count and size in bytes."""
+        with self._lock, self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "hits": counters.get("hits", 0), "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0), "entries": entries, "bytes": size,
+        }
+
+
+class CrawlCache(DiskCache):
+    """Caches crawl payloads, summaries and content hashes keyed by normalized URL"""
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[float] = DEFAULT_CRAWL_CACHE_TTL,
+                 max_bytes: Optional[int] = DEFAULT_CRAWL_CACHE_MAX_BYTES):
+        super().__init__(path or os.path.join(DEFAULT_CACHE_DIR, "crawl_cache.sqlite3"), ttl_seconds, max_bytes)
+
+    def get_crawl(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns {'crawl', 'summary', 'content_hash'} for a fresh entry, or None."""
+        return self.get(normalize_url(url))
+
+    def peek_crawl(self, url: str) -> Optional[Dict[str, Any]]:
+        """Like get_crawl but also returns expired entries; used to reuse summaries of unchanged content."""
+        return self.peek(normalize_url(url))
+
+    def put_crawl(self, url: str, crawl: Dict[str, Any], summary: Optional[str] = None) -> None:
+        self.set(normalize_url(url), {
+            "crawl": crawl,
+            "summary": summary,
+            "content_hash": content_hash(crawl.get("content", "")),
+        })
+
+
+class MemoryLRU:
+    """Thread-safe in-memory LRU of JSON strings, bounded by entry count and total bytes"""
+    def __init__(self, max_entries: int = DEFAULT_RESPONSE_CACHE_ENTRIES,
+                 max_bytes: int = DEFAULT_RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, payload: str) -> None:
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (payload, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+
+class ResponseCache:
+    """Memoizes validated LLM analyses keyed on (provider, model_id, prompt), with an optional disk tier"""
+    def __init__(self, memory: MemoryLRU, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    @staticmethod
+    def make_key(provider: str, model_id: str, prompt: str) -> str:
+        return hashlib.sha256(json.dumps([provider, model_id, prompt]).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        payload = self.memory.get(key)
+        if payload is not None:
+            return json.loads(payload) # Fresh copy, so callers can't mutate the cached value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, json.dumps(value)) # Promote to the memory tier
+                return value
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.memory.set(key, json.dumps(value))
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+# Process-wide tiers: Streamlit re-executes the app script on every rerun, but imported modules persist
+_response_memory = MemoryLRU()
+_response_disk: Optional[DiskCache] = None
+_response_lock = threading.Lock()
+
+
+def get_response_cache(persist: bool = False) -> ResponseCache:
+    """Returns a ResponseCache over the shared memory tier, adding the shared disk tier when `persist` is set."""
+    global _response_disk
+    if not persist:
+        return ResponseCache(_response_memory)
+    with _response_lock:
+        if _response_disk is None:
+            _response_disk = DiskCache(os.path.join(DEFAULT_CACHE_DIR, "llm_cache.sqlite3"),
+                                       DEFAULT_RESPONSE_DISK_TTL, DEFAULT_RESPONSE_DISK_MAX_BYTES)
+    return ResponseCache(_response_memory, _response_disk)
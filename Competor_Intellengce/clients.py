@@ -0,0 +1,209 @@
+"""
+Process-wide registry of LLM SDK clients and the HTTP clients used for Firecrawl and Exa.
+
+Streamlit re-executes the app script on every interaction, so clients built inside it are thrown
+away together with their connection pools. This module is imported once per process, which lets
+agents borrow long-lived clients (and their keep-alive HTTP pools) instead of paying for client
+setup and TLS handshakes on every rerun.
+
+Provider SDKs are imported the first time a client for that provider is built, so a session only
+pays for the SDK it uses, and a provider whose SDK isn't installed is unavailable instead of
+breaking the import of the app.
+"""
+import hashlib
+import importlib
+import importlib.util
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+
+# Pool sizing can be tuned per deployment through the environment
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get("LLM_POOL_MAX_CONNECTIONS", "20"))
+DEFAULT_MAX_KEEPALIVE = int(os.environ.get("LLM_POOL_MAX_KEEPALIVE", "10"))
+DEFAULT_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_POOL_KEEPALIVE_EXPIRY", "60"))  # Seconds an idle socket stays open
+DEFAULT_CLIENT_IDLE_TTL = float(os.environ.get("LLM_CLIENT_IDLE_TTL", "900"))        # Seconds an unused client is kept
+DEFAULT_REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", "120"))
+
+SDK_MAX_RETRIES = 0 # resilience.py retries every call; SDK retries would multiply its attempts and delays
+# Module and pip package of each provider's SDK (DeepSeek is served through the OpenAI SDK)
+PROVIDER_SDKS = {
+    "openai": ("openai", "openai"), "deepseek": ("openai", "openai"),
+    "anthropic": ("anthropic", "anthropic"), "google": ("google.genai", "google-genai"),
+}
+
+ClientKey = Tuple[str, str, Optional[str]]
+
+
+class SDKUnavailableError(ImportError):
+    """Raised when the SDK of the requested LLM provider is not installed"""
+
+
+def provider_available(provider: str) -> bool:
+    """True if the provider's SDK is installed. Checked without importing it."""
+    module, _ = PROVIDER_SDKS.get(provider.lower(), (None, None))
+    try:
+        return module is not None and importlib.util.find_spec(module) is not None
+    except ImportError: # The parent package (e.g. google) is missing
+        return False
+
+
+def load_sdk(provider: str) -> Any:
+    """Imports and returns the provider's SDK module, raising SDKUnavailableError with an install hint if it is missing."""
+    module, package = PROVIDER_SDKS[provider.lower()]
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise SDKUnavailableError(f"The {provider} SDK is not installed (pip install {package}): {e}") from e
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Short, non-reversible identifier for an API key, so raw keys are never used as dict keys."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class _Entry:
+    def __init__(self, client: Any, http_client: Any):
+        self.client = client
+        self.http_client = http_client # Closed on eviction: our pooled httpx client, or an SDK client that owns its pool
+        self.last_used = time.monotonic()
+        self.leases = 0 # Requests in flight on the client; a leased client is never evicted
+
+
+class ClientRegistry:
+    """Caches SDK clients keyed by (provider, key fingerprint, base_url) with pooled keep-alive sessions"""
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE,
+                 keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+                 idle_ttl: float = DEFAULT_CLIENT_IDLE_TTL,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.idle_ttl = idle_ttl
+        self.request_timeout = request_timeout
+        self._entries: Dict[ClientKey, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def _http_client(self) -> "httpx.Client":
+        import httpx # Only needed once a real API is called; mock crawls and searches never load it
+        return httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=self.request_timeout,
+        )
+
+    def _build(self, provider: str, api_key: str, base_url: Optional[str]) -> _Entry:
+        if provider not in PROVIDER_SDKS:
+            raise ValueError("Unsupported LLM provider specified")
+        sdk = load_sdk(provider)
+        if provider in ("openai", "deepseek"): # DeepSeek's API is OpenAI-compatible, served at {base_url}/chat/completions
+            return self._sdk_entry(sdk.OpenAI, api_key=api_key, base_url=base_url)
+        if provider == "anthropic":
+            return self._sdk_entry(sdk.Anthropic, api_key=api_key, base_url=base_url)
+        # A google-genai client carries its own API key (genai.configure() of the older SDK set it for the whole
+        # process) and keeps its own HTTP pool. It serves every Gemini model.
+        client = sdk.Client(api_key=api_key, http_options={"base_url": base_url} if base_url else None)
+        return _Entry(client, client)
+
+    def _sdk_entry(self, sdk_client: Any, **kwargs: Any) -> _Entry:
+        """
+        Builds an OpenAI-style SDK client on a pooled httpx client. SDK releases with their own HTTP stack reject an
+        httpx.Client with a TypeError; those clients keep their own pool, which lives as long as the cached client.
+        """
+        http_client = self._http_client()
+        try:
+            return _Entry(sdk_client(http_client=http_client, max_retries=SDK_MAX_RETRIES, **kwargs), http_client)
+        except TypeError:
+            http_client.close()
+        client = sdk_client(max_retries=SDK_MAX_RETRIES, timeout=self.request_timeout, **kwargs)
+        return _Entry(client, client)
+
+    def _entry(self, provider: str, api_key: str, base_url: Optional[str], lease: bool = False) -> _Entry:
+        provider = provider.lower()
+        key: ClientKey = (provider, key_fingerprint(api_key), base_url)
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                entry.leases += lease
+                return entry
+        # Built without the lock: importing an SDK and setting up a client shouldn't stall other sessions
+        built = self._build(provider, api_key, base_url)
+        with self._lock:
+            entry = self._entries.setdefault(key, built) # Another thread may have built the same client meanwhile
+            entry.last_used = time.monotonic()
+            entry.leases += lease
+        if entry is not built:
+            self._close(built)
+        return entry
+
+    def get(self, provider: str, api_key: str, base_url: Optional[str] = None) -> Any:
+        """
+        Returns a cached client for the provider/key/base_url, building it on first use. The client may be evicted
+        once idle, so hold on to it only briefly; requests should use lease() instead.
+        """
+        return self._entry(provider, api_key, base_url).client
+
+    @contextmanager
+    def lease(self, provider: str, api_key: str, base_url: Optional[str] = None) -> Iterator[Any]:
+        """Borrows the client for the duration of a request; its connections stay open until the lease ends."""
+        entry = self._entry(provider, api_key, base_url, lease=True)
+        try:
+            yield entry.client
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                entry.last_used = time.monotonic()
+
+    def http(self, base_url: str) -> "httpx.Client":
+        """Returns a pooled HTTP client for a REST service such as Firecrawl or Exa."""
+        key: ClientKey = ("http", "", base_url.rstrip("/"))
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is None:
+                http_client = self._http_client()
+                entry = _Entry(http_client, http_client)
+                self._entries[key] = entry
+            entry.last_used = time.monotonic()
+            return entry.client
+
+    def _evict_idle(self, now: float) -> None:
+        for key, entry in list(self._entries.items()):
+            if entry.leases == 0 and now - entry.last_used > self.idle_ttl:
+                del self._entries[key]
+                self._close(entry)
+
+    def close_all(self) -> None:
+        """Closes every pooled connection and forgets all clients."""
+        with self._lock:
+            for entry in self._entries.values():
+                self._close(entry)
+            self._entries.clear()
+
+    @staticmethod
+    def _close(entry: _Entry) -> None:
+        close = getattr(entry.http_client, "close", None) # Older google-genai clients can't be closed
+        if close is not None:
+            close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"clients": len(self._entries)}
+
+
+_registry = ClientRegistry()
+
+
+def get_client_registry() -> ClientRegistry:
+    """Returns the registry shared by every session in this process."""
+    return _registry
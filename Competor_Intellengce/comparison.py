@@ -0,0 +1,206 @@
+"""
+Columnar comparison table of competitors.
+
+ComparisonTable keeps one list per column and appends a row as each competitor finishes crawling,
+so a table of thousands of tracked competitors is never rebuilt row by row. Technology stacks,
+team sizes and founding years are stored as category codes and nullable integers. The pandas
+frame is built on demand, converting only the rows added since the previous call, and the
+filter/sort/aggregate views work on the codes rather than on strings. pandas and numpy are only
+imported once a frame or view is first requested, so importing the app stays cheap.
+"""
+import re
+import threading
+from itertools import chain
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+COLUMNS = ["Company", "Website", "Description", "Summary", "Technologies", "Team Size", "Founded"]
+TEXT_COLUMNS = ["Company", "Website", "Description", "Summary"]
+SEARCH_COLUMNS = ("Company", "Description", "Summary")
+DEFAULT_PREVIEW_CHARS = 100  # Description and summary characters shown per competitor
+
+
+def _preview(text: Any, limit: int) -> str:
+    text = str(text) if text else "N/A"
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _technologies(value: Any) -> List[str]:
+    """Technologies from crawl metadata, which may be a list or a comma-separated string."""
+    items = value.split(",") if isinstance(value, str) else value or []
+    names = [str(item).strip() for item in items]
+    return list(dict.fromkeys(name for name in names if name and name != "N/A"))
+
+
+def _founded_year(value: Any) -> Optional[int]:
+    match = re.search(r"\b(1[89]\d\d|20\d\d)\b", str(value or ""))
+    return int(match.group(1)) if match else None
+
+
+def _size_order(size: str) -> Tuple[float, str]:
+    """Sort key placing team sizes such as "11-50", "50-200" and "1000+" in numeric order."""
+    match = re.search(r"\d[\d,]*", size)
+    return (float(match.group(0).replace(",", "")) if match else float("inf"), size)
+
+
+class ComparisonTable:
+    """Competitor comparison rows in columnar form, with incremental appends and filter/sort/aggregate views"""
+    def __init__(self, companies: Iterable[Dict[str, Any]] = (), preview_chars: int = DEFAULT_PREVIEW_CHARS):
+        self.preview_chars = preview_chars
+        self._text: Dict[str, List[str]] = {column: [] for column in TEXT_COLUMNS}
+        self._founded: List[Optional[int]] = []
+        self._team_sizes: Dict[str, int] = {}          # Category -> code
+        self._team_size_codes: List[int] = []           # -1 when unknown
+        self._technologies: Dict[str, int] = {}         # Technology -> code
+        self._stacks: Dict[Tuple[int, ...], int] = {}   # Technology codes of a whole stack -> stack code
+        self._stack_codes: List[int] = []
+        self._rows: Dict[str, int] = {}                 # Website (or name) -> row, so re-crawls replace their row
+        self._frame: Optional["pd.DataFrame"] = None
+        self._flat: Optional[Tuple["np.ndarray", "np.ndarray"]] = None # (technology codes, rows) of every stack entry
+        self._lock = threading.Lock()
+        self.extend(companies)
+
+    def __len__(self) -> int:
+        return len(self._founded)
+
+    def append(self, company: Dict[str, Any]) -> None:
+        """Adds a competitor, or replaces its row if the same website was added before."""
+        metadata = company.get("metadata") or {}
+        text = {
+            "Company": str(company.get("name") or "Unknown"), "Website": str(company.get("url") or "N/A"),
+            "Description": _preview(company.get("description"), self.preview_chars),
+            "Summary": _preview(company.get("summary"), self.preview_chars),
+        }
+        team_size = str(metadata.get("team_size") or "").strip()
+        with self._lock:
+            stack = tuple(self._technologies.setdefault(name, len(self._technologies))
+                          for name in _technologies(metadata.get("technologies")))
+            values = (self._stacks.setdefault(stack, len(self._stacks)) if stack else -1,
+                      self._team_sizes.setdefault(team_size, len(self._team_sizes)) if team_size and team_size != "N/A" else -1,
+                      _founded_year(metadata.get("founded")))
+            key = company.get("url") or text["Company"]
+            row = self._rows.get(key)
+            if row is None:
+                self._rows[key] = len(self)
+                for column, value in text.items():
+                    self._text[column].append(value)
+                self._stack_codes.append(values[0])
+                self._team_size_codes.append(values[1])
+                self._founded.append(values[2])
+            else:
+                for column, value in text.items():
+                    self._text[column][row] = value
+                self._stack_codes[row], self._team_size_codes[row], self._founded[row] = values
+                self._frame = None # Rows before the newest changed, so the next frame is rebuilt in full
+            self._flat = None
+
+    def extend(self, companies: Iterable[Dict[str, Any]]) -> None:
+        for company in companies:
+            self.append(company)
+
+    def covers(self, companies: Sequence[Dict[str, Any]]) -> bool:
+        """True when the table holds exactly these competitors, e.g. because it was filled while crawling."""
+        return len(self) == len(companies) and all((c.get("url") or c.get("name") or "Unknown") in self._rows for c in companies)
+
+    def frame(self) -> "pd.DataFrame":
+        """
+        The table as a DataFrame (treat it as read-only). Text columns use pandas' string dtype, Technologies
+        and Team Size are categoricals (team sizes ordered numerically) and Founded is a nullable integer.
+        """
+        import pandas as pd
+        with self._lock:
+            start = 0 if self._frame is None else len(self._frame)
+            if start == len(self) and self._frame is not None:
+                return self._frame
+            added = pd.DataFrame({column: pd.array(values[start:], dtype="string") for column, values in self._text.items()})
+            added["Founded"] = pd.array(self._founded[start:], dtype="Int16")
+            base = added if start == 0 else pd.concat([self._frame[TEXT_COLUMNS + ["Founded"]], added], ignore_index=True)
+            # Categoricals are rebuilt from their integer codes, which is cheap compared with the strings
+            names = list(self._technologies)
+            stacks = [", ".join(names[code] for code in stack) for stack in self._stacks]
+            base["Technologies"] = pd.Categorical.from_codes(self._stack_codes, categories=pd.Index(stacks, dtype=object)
+                                                              ).reorder_categories(sorted(stacks, key=str.lower), ordered=True)
+            sizes = list(self._team_sizes)
+            base["Team Size"] = pd.Categorical.from_codes(self._team_size_codes, categories=pd.Index(sizes, dtype=object)
+                                                           ).reorder_categories(sorted(sizes, key=_size_order), ordered=True)
+            self._frame = base[COLUMNS]
+            return self._frame
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Rows as JSON-friendly dicts, with None for unknown values. Read from the columns, without pandas."""
+        with self._lock:
+            names = list(self._technologies)
+            stacks = [", ".join(names[code] for code in stack) for stack in self._stacks]
+            sizes = list(self._team_sizes)
+            records = []
+            for row, (stack, size, founded) in enumerate(zip(self._stack_codes, self._team_size_codes, self._founded)):
+                record: Dict[str, Any] = {column: self._text[column][row] for column in TEXT_COLUMNS}
+                record["Technologies"] = stacks[stack] if stack >= 0 else None
+                record["Team Size"] = sizes[size] if size >= 0 else None
+                record["Founded"] = founded
+                records.append(record)
+            return records
+
+    def technology_names(self) -> List[str]:
+        return sorted(self._technologies, key=str.lower)
+
+    def _flat_stacks(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Every (technology code, row) pair, like an exploded Arrow list column."""
+        import numpy as np
+        with self._lock:
+            if self._flat is None:
+                stacks = list(self._stacks)
+                entries = [stacks[code] if code >= 0 else () for code in self._stack_codes]
+                lengths = np.fromiter((len(stack) for stack in entries), dtype=np.int64, count=len(entries))
+                codes = np.fromiter(chain.from_iterable(entries), dtype=np.int64, count=int(lengths.sum()))
+                self._flat = (codes, np.repeat(np.arange(len(entries)), lengths))
+            return self._flat
+
+    def filter(self, technologies: Sequence[str] = (), team_sizes: Sequence[str] = (),
+               founded: Optional[Tuple[int, int]] = None, text: str = "") -> "pd.DataFrame":
+        """Rows whose stack includes every one of `technologies`, with one of `team_sizes`, founded within the
+        (first, last) year range and mentioning `text` in the name, description or summary."""
+        import numpy as np
+        frame = self.frame()
+        mask = np.ones(len(frame), dtype=bool)
+        if technologies:
+            codes, rows = self._flat_stacks()
+            for name in technologies:
+                using = np.zeros(len(frame), dtype=bool)
+                if name in self._technologies:
+                    using[rows[codes == self._technologies[name]]] = True
+                mask &= using
+        if team_sizes:
+            mask &= frame["Team Size"].isin(team_sizes).to_numpy()
+        if founded:
+            mask &= frame["Founded"].between(*founded).fillna(False).to_numpy(dtype=bool)
+        if text:
+            matches = np.zeros(len(frame), dtype=bool)
+            for column in SEARCH_COLUMNS:
+                matches |= frame[column].str.contains(text, case=False, regex=False).fillna(False).to_numpy(dtype=bool)
+            mask &= matches
+        return frame if mask.all() else frame[mask]
+
+    def sorted(self, by: str = "Company", ascending: bool = True, frame: Optional["pd.DataFrame"] = None) -> "pd.DataFrame":
+        """`frame` (default: the whole table) sorted by a column; unknown values go last."""
+        frame = self.frame() if frame is None else frame
+        return frame.sort_values(by, ascending=ascending, na_position="last", kind="stable")
+
+    def technology_frequency(self) -> "pd.DataFrame":
+        """How many competitors use each technology, most common first."""
+        import numpy as np
+        import pandas as pd
+        codes, _ = self._flat_stacks()
+        names = list(self._technologies)
+        counts = np.bincount(codes, minlength=len(names))
+        frequency = pd.DataFrame({"Technology": pd.array(names, dtype="string"), "Competitors": counts,
+                                  "Share": counts / len(self) if len(self) else counts.astype(float)})
+        return frequency.sort_values("Competitors", ascending=False, kind="stable", ignore_index=True)
+
+    def count_by(self, column: str) -> "pd.DataFrame":
+        """Number of competitors per value of a column such as "Team Size" or "Founded"."""
+        counts = self.frame()[column].value_counts(dropna=False).sort_index()
+        return counts.rename("Competitors").rename_axis(column).reset_index()
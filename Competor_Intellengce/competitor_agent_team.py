@@ -1,12 +1,44 @@
-import streamlit as st
-import pandas as pd
+import itertools
 import json
+import logging
 import os
 import re
-from typing import List, Dict, Any, Optional, Tuple
-from openai import OpenAI, AzureOpenAI # Added AzureOpenAI for DeepSeek compatibility
-from anthropic import Anthropic
-import google.generativeai as genai
+import sys
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Callable, Iterator, Sequence, ContextManager
+from urllib.parse import urlparse
+
+# Only main() uses Streamlit. `streamlit run` has already imported it, so headless batch, watch and benchmark
+# runs importing this module skip its import cost
+if "streamlit" in sys.modules or __name__ == "__main__":
+    try:
+        import streamlit as st
+    except ImportError:
+        st = None
+else:
+    st = None
+if TYPE_CHECKING:
+    import pandas as pd # Imported where a DataFrame is built, so importing the app doesn't load pandas
+
+from cache import CrawlCache, ResponseCache, DEFAULT_CRAWL_CACHE_TTL, content_hash, get_response_cache
+from clients import PROVIDER_SDKS, ClientRegistry, get_client_registry, provider_available
+from comparison import ComparisonTable
+from dedupe import DEFAULT_DUPLICATE_THRESHOLD, Deduplicator, DomainIndex, minhash
+from jobs import QUEUED, Job, JobCancelled, JobLimitError, JobRunner, get_job_runner
+from json_stream import IncrementalObjectParser, extract_json_object, is_partial
+from prompt_budget import (DEFAULT_MAX_PROMPT_TOKENS, MIN_FIELD_TOKENS, OUTPUT_TOKEN_RESERVE, compact_metadata,
+                           context_window, estimate_tokens, fair_share, find_shared_sentences, prompt_token_budget,
+                           remove_sentences, truncate_to_tokens)
+from reporters import Reporter, LoggingReporter, StreamlitReporter, logger
+from resilience import ProviderError, describe, get_resilience
+from routing import HedgedRouter, RequestCancelled, RoutingError, get_latency_tracker
+from snapshots import SnapshotStore, change_report, company_key, subject_key
+from summarize import DEFAULT_SUMMARY_MODE, SUMMARY_MODES, NO_SUMMARY, SummaryBatcher, extractive_summary
+from tracing import Tracer, summarize, to_openmetrics
 
 # --- Model Definitions with Tiers/Cost Indicators ---
 # Note: Tiers are approximate and relative. Check provider pricing pages for details.
@@ -38,14 +70,82 @@ def get_model_id(display_name: str) -> Optional[str]:
     match = re.match(r"([^(]+)", display_name)
     return match.group(1).strip() if match else None
 
-# --- Agent Classes (Firecrawl, Exa - unchanged mocks) ---
+# --- Agent Classes (Firecrawl, Exa - mocks unless an API URL is configured) ---
+DEFAULT_COMPETITOR_COUNT = 5
+
 class FirecrawlAgent:
     """Agent that crawls and extracts data from competitor websites"""
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[CrawlCache] = None, refresh_cache: bool = False,
+                 tracer: Optional[Tracer] = None, base_url: Optional[str] = None, summary_mode: str = DEFAULT_SUMMARY_MODE):
         self.api_key = api_key or os.environ.get("FIRECRAWL_API_KEY", "")
-        
+        self.base_url = base_url or os.environ.get("FIRECRAWL_API_URL", "") # e.g. https://api.firecrawl.dev
+        self.cache = cache
+        self.refresh_cache = refresh_cache # Skip cache reads but still write fresh results
+        self.tracer = tracer or Tracer()
+        self.summary_mode = summary_mode # "llm" leaves summaries to the caller's SummaryBatcher (see summarize.py)
+
+    def _cached(self, url: str) -> Optional[Dict[str, Any]]:
+        if not self.cache or self.refresh_cache:
+            return None
+        return self.cache.get_crawl(url)
+
     def crawl_website(self, url: str) -> Dict[str, Any]:
-        print(f"Mock Crawling: {url}") 
+        with self.tracer.span("crawl", url=url) as span:
+            cached = self._cached(url)
+            span.set(cache_hit=bool(cached))
+            if cached:
+                logger.debug("Crawl cache hit: %s", url)
+                return cached["crawl"]
+            crawl_data = self._fetch(url)
+            if self.cache:
+                self.cache.put_crawl(url, crawl_data)
+            return crawl_data
+
+    def crawl_and_summarize(self, url: str, previous: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Crawls and summarizes a URL, reusing cached results when possible. `previous` is an earlier
+        {'content_hash', 'summary'} of the page (e.g. its snapshot), whose summary is reused if the content is unchanged.
+        In "llm" summary mode a page that needs a new summary is returned with None, to be summarized in a batch.
+        """
+        with self.tracer.span("crawl", url=url) as span:
+            cached = self._cached(url)
+            span.set(cache_hit=bool(cached))
+            if cached and cached.get("summary"):
+                logger.debug("Crawl cache hit: %s", url)
+                return cached["crawl"], cached["summary"]
+            crawl_data = cached["crawl"] if cached else self._fetch(url)
+            content = crawl_data.get("content", "")
+            # Content that hasn't changed since the last crawl keeps its summary, even if the entry expired
+            if not previous and self.cache and not cached:
+                previous = self.cache.peek_crawl(url)
+            if previous and previous.get("summary") and previous.get("content_hash") == content_hash(content):
+                summary = previous["summary"]
+                span.set(summary_reused=True)
+            elif self.summary_mode == "llm":
+                summary = None
+            else:
+                with self.tracer.span("summarize", url=url, content_chars=len(content)):
+                    summary = self.summarize_content(content)
+            if self.cache:
+                self.cache.put_crawl(url, crawl_data, summary)
+            return crawl_data, summary
+
+    def _fetch(self, url: str) -> Dict[str, Any]:
+        """Crawls `url` with retries and rate limiting; raises ProviderError when Firecrawl can't be reached."""
+        return get_resilience().call("firecrawl", self.api_key, lambda: self._request_crawl(url))
+
+    def _request_crawl(self, url: str) -> Dict[str, Any]:
+        if self.base_url:
+            response = get_client_registry().http(self.base_url).post(
+                self.base_url.rstrip("/") + "/v1/scrape", json={"url": url, "formats": ["markdown"]},
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+            response.raise_for_status()
+            data = response.json().get("data") or {}
+            metadata = dict(data.get("metadata") or {})
+            return {"url": url, "title": metadata.pop("title", ""), "description": metadata.pop("description", ""),
+                    "content": data.get("markdown", ""), "metadata": metadata}
+        print(f"Mock Crawling: {url}")
         return {
             "url": url, "title": f"Website for {url.split('://')[1].split('.')[0].capitalize()}",
             "description": f"A company specializing in services and products.",
@@ -54,15 +154,38 @@ class FirecrawlAgent:
         }
     
     def summarize_content(self, content: str) -> str:
-        print("Mock Summarizing content...") 
-        return "This company provides various products and services in the technology sector, focusing on innovation and customer satisfaction."
+        """Local extractive summary of the page: its most representative sentences (see summarize.py)."""
+        return extractive_summary(content) or NO_SUMMARY
+
+    def store_summary(self, url: str, summary: str) -> None:
+        """Caches a summary made after the crawl (by a batched LLM request) with the cached page."""
+        cached = self.cache.peek_crawl(url) if self.cache else None
+        if cached:
+            self.cache.put_crawl(url, cached["crawl"], summary)
 
 class ExaSearchAgent:
     """Agent that discovers competitors using Exa AI search"""
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
         self.api_key = api_key or os.environ.get("EXA_API_KEY", "")
+        self.base_url = base_url or os.environ.get("EXA_API_URL", "") # e.g. https://api.exa.ai
         
-    def find_similar_companies(self, company_description: str, count: int = 5) -> List[Dict[str, str]]:
+    def find_similar_companies(self, company_description: str, count: int = DEFAULT_COMPETITOR_COUNT) -> List[Dict[str, str]]:
+        """Searches with retries and rate limiting; raises ProviderError when Exa can't be reached."""
+        return get_resilience().call("exa", self.api_key, lambda: self._search(company_description, count))
+
+    def _search(self, company_description: str, count: int) -> List[Dict[str, str]]:
+        if self.base_url:
+            response = get_client_registry().http(self.base_url).post(
+                self.base_url.rstrip("/") + "/search",
+                json={"query": company_description, "numResults": count, "contents": {"text": {"maxCharacters": 1000}}},
+                headers={"x-api-key": self.api_key},
+            )
+            response.raise_for_status()
+            return [
+                {"name": result.get("title") or urlparse(result.get("url", "")).netloc, "url": result.get("url", ""),
+                 "description": (result.get("text") or "").strip()}
+                for result in response.json().get("results", [])[:count]
+            ]
         print(f"Mock Finding similar companies for: {company_description[:50]}...") 
         companies = [
             {"name": "CompetitorA", "url": "https://competitora.com", "description": "A leading provider in the industry"},
@@ -77,271 +200,1246 @@ class ExaSearchAgent:
         urls = re.findall(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+', description)
         return urls
 
+# --- Concurrent Crawl Engine ---
+DEFAULT_CRAWL_CONCURRENCY = 8      # Max crawls in flight at once
+DEFAULT_CRAWL_RATE_PER_HOST = 2.0  # Max requests per second against a single host
+DEFAULT_CRAWL_TIMEOUT = 60.0       # Seconds before a single crawl is abandoned
+
+class HostRateLimiter:
+    """Spaces out requests to the same host so concurrent crawls stay polite"""
+    def __init__(self, requests_per_second: float = DEFAULT_CRAWL_RATE_PER_HOST):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second and requests_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        """Blocks until the host of `url` may be contacted again."""
+        if not self.min_interval:
+            return
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+class CrawlEngine:
+    """Runs crawl tasks on a thread pool with a global concurrency cap, per-host rate limit and per-request timeout"""
+    def __init__(self, max_concurrency: int = DEFAULT_CRAWL_CONCURRENCY,
+                 requests_per_host_per_second: float = DEFAULT_CRAWL_RATE_PER_HOST,
+                 timeout: Optional[float] = DEFAULT_CRAWL_TIMEOUT):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate_limiter = HostRateLimiter(requests_per_host_per_second)
+        self.timeout = timeout if timeout and timeout > 0 else None
+
+    def run(self, urls: List[str], task: Callable[[str], Any],
+            on_complete: Optional[Callable[[int, Any, Optional[Exception]], None]] = None,
+            cancel_event: Optional[threading.Event] = None) -> List[Tuple[Any, Optional[Exception]]]:
+        """
+        Calls `task(url)` for every URL concurrently and returns (result, error) pairs in input order.
+        `on_complete(index, result, error)` fires on the calling thread as each task finishes, so it is
+        safe to update Streamlit elements from it. Timed-out tasks are abandoned and reported as TimeoutError.
+        Once `cancel_event` is set, tasks that haven't finished are abandoned without being reported.
+        """
+        outcomes: List[Tuple[Any, Optional[Exception]]] = [(None, None)] * len(urls)
+        if not urls:
+            return outcomes
+        started: Dict[int, float] = {}
+
+        def _run(index: int, url: str) -> Any:
+            self.rate_limiter.wait(url)
+            started[index] = time.monotonic() # Timeout clock starts once the request is actually sent
+            return task(url)
+
+        def _finish(index: int, result: Any, error: Optional[Exception]) -> None:
+            outcomes[index] = (result, error)
+            if on_complete:
+                on_complete(index, result, error)
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(urls)), thread_name_prefix="crawl")
+        futures = {executor.submit(_run, i, url): i for i, url in enumerate(urls)}
+        pending = set(futures)
+        try:
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result, error = None, None
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error = e
+                    _finish(futures[future], result, error)
+                if self.timeout is None:
+                    continue
+                now = time.monotonic()
+                for future in list(pending):
+                    index = futures[future]
+                    if index in started and now - started[index] > self.timeout:
+                        pending.discard(future)
+                        future.cancel()
+                        _finish(index, None, TimeoutError(f"timed out after {self.timeout:g}s"))
+        finally:
+            # Don't block on abandoned (timed-out) crawls; their results are simply ignored
+            executor.shutdown(wait=False, cancel_futures=True)
+        return outcomes
+
+# --- Map-Reduce Analysis ---
+DEFAULT_MAP_REDUCE_THRESHOLD = 8           # Competitors above which analysis is split into map calls
+DEFAULT_MAP_REDUCE_TOKEN_THRESHOLD = 6000  # Estimated prompt tokens above which analysis is split
+DEFAULT_MAP_CHUNK_TOKENS = 2500            # Token budget for the competitor data in one map call
+DEFAULT_MAP_CONCURRENCY = 4
+NEAR_DUPLICATE_SIMILARITY = 0.7            # Word-set Jaccard similarity at which two items count as the same
+
+def _item_words(item: Any) -> frozenset:
+    return frozenset(w for w in re.findall(r"[a-z0-9]+", str(item).lower()) if len(w) > 2)
+
+def merge_partial_reports(partials: List[Dict[str, Any]], keys: List[str],
+                          similarity: float = NEAR_DUPLICATE_SIMILARITY) -> Dict[str, List[Any]]:
+    """Reduce step: concatenates each key's lists across partial reports, dropping near-identical items."""
+    merged = {}
+    for key in keys:
+        items, seen = [], []
+        for partial in partials:
+            values = partial.get(key) or []
+            for item in values if isinstance(values, list) else [values]:
+                if not str(item).strip() or item == "N/A":
+                    continue
+                words = _item_words(item)
+                if any(words == other or (words and len(words & other) / len(words | other) >= similarity) for other in seen):
+                    continue
+                seen.append(words)
+                items.append(item)
+        merged[key] = items or ["N/A"]
+    return merged
+
 # --- Analysis Agent (Updated) ---
+class AnalysisError(Exception):
+    """Raised when no analysis could be generated; the message says why"""
+
 class AnalysisAgent:
     """Agent that generates detailed competitive analysis using a selected LLM"""
     # Define base URLs for providers compatible with OpenAI client
     BASE_URLS = {
         "deepseek": "https://api.deepseek.com/v1" 
     }
+    REQUIRED_KEYS = ['strengths', 'weaknesses', 'opportunities', 'market_gaps', 'pricing_strategies', 'growth_opportunities', 'recommendations']
+    # OpenAI models that accept a strict JSON schema; older ones get plain JSON mode
+    OPENAI_SCHEMA_MODELS = ("gpt-4o", "gpt-4.1", "o1", "o3", "o4")
+    REPORT_TOOL = "record_competitive_analysis" # Tool Anthropic models are made to call with the report
 
-    def __init__(self, provider: str = "openai", api_key: Optional[str] = None, model_id: Optional[str] = None):
+    def __init__(self, provider: str = "openai", api_key: Optional[str] = None, model_id: Optional[str] = None,
+                 response_cache: Optional[ResponseCache] = None, client_registry: Optional[ClientRegistry] = None,
+                 map_reduce_threshold: int = DEFAULT_MAP_REDUCE_THRESHOLD,
+                 map_reduce_token_threshold: int = DEFAULT_MAP_REDUCE_TOKEN_THRESHOLD,
+                 map_chunk_tokens: int = DEFAULT_MAP_CHUNK_TOKENS, map_concurrency: int = DEFAULT_MAP_CONCURRENCY,
+                 max_prompt_tokens: int = DEFAULT_MAX_PROMPT_TOKENS,
+                 reporter: Optional[Reporter] = None, llm_slots: Optional[threading.Semaphore] = None,
+                 tracer: Optional[Tracer] = None, cancel_event: Optional[threading.Event] = None):
         self.provider = provider.lower() 
         self.api_key = api_key
         self.model_id = model_id # Store the actual model ID
-        self.base_url = self.BASE_URLS.get(self.provider)
-        self.client = None
+        # {PROVIDER}_BASE_URL points a provider at a proxy or local stand-in (see benchmark.py)
+        self.base_url = os.environ.get(f"{self.provider.upper()}_BASE_URL") or self.BASE_URLS.get(self.provider)
+        self.client_registry = client_registry or get_client_registry()
+        self.client_ready = False # Set once the provider's client could be built
+        self.response_cache = response_cache
+        self.map_reduce_threshold = map_reduce_threshold
+        self.map_reduce_token_threshold = map_reduce_token_threshold
+        self.map_chunk_tokens = map_chunk_tokens
+        self.map_concurrency = max(1, map_concurrency)
+        self.prompt_token_budget = prompt_token_budget(model_id, max_prompt_tokens)
+        self.reporter = reporter or LoggingReporter()
+        self.llm_slots = llm_slots # Optional cap on LLM calls in flight, shared between agents
+        self.router: Optional[HedgedRouter] = None # Set when backup providers are configured
+        self.tracer = tracer or Tracer()
+        self.cancel_event = cancel_event # Set by a background job's cancel; requests are then streamed and abandoned
 
         if not self.model_id:
              # Should not happen if UI selectbox is used correctly, but good fallback
-             st.warning(f"No model selected for provider: {self.provider}. Analysis may fail or use mock data.")
+             self.reporter.warning(f"No model selected for provider: {self.provider}. Analysis will fail.")
              return 
 
         if self.api_key:
             try:
-                if self.provider == "openai":
-                    self.client = OpenAI(api_key=self.api_key)
-                elif self.provider == "anthropic":
-                    self.client = Anthropic(api_key=self.api_key)
-                elif self.provider == "google":
-                    genai.configure(api_key=self.api_key)
-                    self.client = genai.GenerativeModel(self.model_id) 
-                elif self.provider in self.BASE_URLS: 
-                     if not self.base_url:
-                          raise ValueError(f"Base URL required for provider {self.provider} but not found.")
-                     self.client = AzureOpenAI(
-                          api_key=self.api_key,
-                          api_version="2024-02-15-preview", 
-                          azure_endpoint=self.base_url, 
-                     )
-                else:
-                    raise ValueError("Unsupported LLM provider specified")
+                # Builds the pooled client shared across reruns now, so configuration errors surface here
+                self.client_registry.get(self.provider, self.api_key, base_url=self.base_url)
+                self.client_ready = True
             except Exception as e:
-                 st.error(f"Failed to initialize LLM client for {self.provider}: {e}")
-                 self.client = None 
+                 self.reporter.error(f"Failed to initialize LLM client for {self.provider}: {e}")
         
-    def _generate_prompt(self, company_data: List[Dict[str, Any]]) -> str:
-        """Helper function to create the analysis prompt"""
-        prompt = "Analyze the following competitor data and provide a detailed report including:\n"
-        prompt += "- Strengths\n- Weaknesses\n- Opportunities\n- Market Gaps\n"
-        prompt += "- Suggested Pricing Strategies\n- Potential Growth Opportunities\n- Actionable Recommendations\n\n"
-        prompt += "Competitor Data:\n"
-        for i, company in enumerate(company_data, 1):
-            prompt += f"\nCompetitor {i}:\n"
-            prompt += f"  Name: {company.get('name', 'N/A')}\n"
-            prompt += f"  URL: {company.get('url', 'N/A')}\n"
-            prompt += f"  Description: {company.get('description', 'N/A')}\n"
-            prompt += f"  Summary: {company.get('summary', 'N/A')}\n"
-            if "metadata" in company:
-                 prompt += f"  Metadata: {json.dumps(company['metadata'])}\n"
-        prompt += "\nGenerate the analysis strictly in JSON format with keys: 'strengths', 'weaknesses', 'opportunities', 'market_gaps', 'pricing_strategies', 'growth_opportunities', 'recommendations'. Do not include any introductory text or explanations outside the JSON structure."
+    @property
+    def client(self) -> Any:
+        """
+        The provider's pooled client, or None if it couldn't be built. It is looked up on every use rather than kept,
+        since the registry closes clients that sit idle; requests hold it through _lease_client() instead.
+        """
+        if not self.client_ready:
+            return None
+        return self.client_registry.get(self.provider, self.api_key, base_url=self.base_url)
+
+    def _lease_client(self) -> ContextManager[Any]:
+        """Borrows the pooled client for one request, so it can't be evicted while the request is in flight."""
+        return self.client_registry.lease(self.provider, self.api_key, base_url=self.base_url)
+
+    def _generate_prompt(self, company_data: List[Dict[str, Any]], token_budget: Optional[int] = None) -> str:
+        """
+        Helper function to create the analysis prompt within a token budget (defaults to the model's budget).
+        Sentences shared by several competitors are listed once. When over budget, each competitor gets a fair share
+        of the tokens and its fields are truncated by priority (summary, then description, then metadata).
+        """
+        budget = token_budget or self.prompt_token_budget
+        header = "Analyze the following competitor data and provide a detailed report including:\n"
+        header += "- Strengths\n- Weaknesses\n- Opportunities\n- Market Gaps\n"
+        header += "- Suggested Pricing Strategies\n- Potential Growth Opportunities\n- Actionable Recommendations\n\n"
+        header += "Competitor Data:\n"
+        footer = "\nGenerate the analysis strictly in JSON format with keys: 'strengths', 'weaknesses', 'opportunities', 'market_gaps', 'pricing_strategies', 'growth_opportunities', 'recommendations'. Do not include any introductory text or explanations outside the JSON structure."
+
+        shared = find_shared_sentences([[c.get('description', ''), c.get('summary', '')] for c in company_data])
+        common = ""
+        if shared:
+            common = "\nCommon to several competitors:\n" + "".join(f"  - {sentence}\n" for sentence in shared)
+
+        available = budget - self._estimate_tokens(header + common + footer)
+        blocks = [self._competitor_block(i, company, shared) for i, company in enumerate(company_data, 1)]
+        sizes = [self._estimate_tokens(block) for block in blocks]
+        if sum(sizes) > available:
+            allocations = fair_share(sizes, available, floor=4 * MIN_FIELD_TOKENS)
+            blocks = [
+                block if size <= allocation else self._competitor_block(i, company, shared, allocation)
+                for i, (company, block, size, allocation) in enumerate(zip(company_data, blocks, sizes, allocations), 1)
+            ]
+        prompt = header + "".join(blocks)
+        prompt += common + footer
         return prompt
 
+    def _competitor_block(self, index: int, company: Dict[str, Any], shared: List[str], token_budget: Optional[int] = None) -> str:
+        """Formats one competitor, spending the token budget on summary, then description, then metadata."""
+        block = f"\nCompetitor {index}:\n"
+        block += f"  Name: {company.get('name', 'N/A')}\n"
+        block += f"  URL: {company.get('url', 'N/A')}\n"
+        fields = {
+            "Summary": remove_sentences(str(company.get('summary', 'N/A')), shared) or "(see common notes)",
+            "Description": remove_sentences(str(company.get('description', 'N/A')), shared) or "(see common notes)",
+        }
+        if "metadata" in company:
+            fields["Metadata"] = compact_metadata(company['metadata'] or {}) or "N/A"
+        if token_budget is not None:
+            remaining = token_budget - self._estimate_tokens(block)
+            for label, text in fields.items(): # Priority order
+                fields[label] = truncate_to_tokens(text, max(MIN_FIELD_TOKENS, remaining), self.provider, self.model_id)
+                remaining -= self._estimate_tokens(fields[label]) + 2
+        block += f"  Description: {fields['Description']}\n"
+        block += f"  Summary: {fields['Summary']}\n"
+        if "Metadata" in fields:
+             block += f"  Metadata: {fields['Metadata']}\n"
+        return block
+
+    def _estimate_tokens(self, text: str) -> int:
+        return estimate_tokens(text, self.provider, self.model_id)
+
+    def estimate_prompt_tokens(self, company_data: List[Dict[str, Any]], compacted: bool = True) -> int:
+        """Estimated prompt size before the call; `compacted=False` gives the size without truncation."""
+        budget = None if compacted else sys.maxsize // 2
+        return self._estimate_tokens(self._generate_prompt(company_data, token_budget=budget))
+
     def _parse_llm_response(self, response_text: str) -> Optional[Dict[str, Any]]:
-         """Attempts to parse JSON from the LLM response text."""
-         try:
-             return json.loads(response_text)
-         except json.JSONDecodeError:
-             json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-             if json_match:
-                 try:
-                     return json.loads(json_match.group(0))
-                 except json.JSONDecodeError:
-                     print("Extracted text looked like JSON but failed to parse.")
-                     return None
-             else:
-                 print("Could not find JSON structure in the response.")
-                 return None
+         """Parses the report JSON from the LLM response text, repairing trailing commas and truncation."""
+         analysis_data = extract_json_object(response_text)
+         if analysis_data is None:
+             logger.warning("Could not find JSON structure in the response.")
+         return analysis_data
 
-    def generate_analysis_report(self, company_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Generate a detailed analysis report using the configured LLM"""
-        if not self.client or not self.model_id or not self.api_key: 
-            st.warning("LLM provider not configured correctly (check API key/model selection). Using mock analysis data.")
-            return self._generate_mock_report()
+    @staticmethod
+    def analysis_schema(keys: Sequence[str]) -> Dict[str, Any]:
+        """JSON schema of a report with the given sections, each a list of strings."""
+        return {
+            "type": "object",
+            "properties": {key: {"type": "array", "items": {"type": "string"}} for key in keys},
+            "required": list(keys),
+            "additionalProperties": False,
+        }
 
-        prompt = self._generate_prompt(company_data)
-        analysis_json_str = None 
-        
-        try:
-            print(f"Generating analysis using {self.provider} model {self.model_id}...") 
-            
-            if self.provider == "openai":
-                response = self.client.chat.completions.create(
+    def _structured_output(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Request arguments that make the provider return the report as schema-valid JSON."""
+        schema = self.analysis_schema(keys)
+        if self.provider == "openai":
+            if self.model_id.startswith(self.OPENAI_SCHEMA_MODELS):
+                return {"response_format": {"type": "json_schema", "json_schema": {
+                    "name": "competitive_analysis", "strict": True, "schema": schema}}}
+            return {"response_format": {"type": "json_object"}}
+        if self.provider == "anthropic":
+            tool = {"name": self.REPORT_TOOL, "description": "Record the competitive analysis report.", "input_schema": schema}
+            return {"tools": [tool], "tool_choice": {"type": "tool", "name": self.REPORT_TOOL}}
+        if self.provider == "google":
+            if self.model_id.startswith("gemini-1.0"): # No JSON mode before Gemini 1.5
+                return {}
+            schema.pop("additionalProperties") # Not part of Gemini's schema subset
+            return {"config": {"response_mime_type": "application/json", "response_schema": schema}}
+        return {"response_format": {"type": "json_object"}} # DeepSeek: JSON mode, no schemas
+
+    def _messages(self, prompt: str, history: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """The conversation as (role, text) turns in the provider's message format."""
+        turns = list(history) + [("user", prompt)]
+        if self.provider == "google":
+            return [{"role": "model" if role == "assistant" else role, "parts": [{"text": text}]} for role, text in turns]
+        return [{"role": role, "content": text} for role, text in turns]
+
+    def _llm_slot(self) -> Any:
+        """Context that holds one of the shared LLM call slots, if a limit is configured."""
+        return self.llm_slots or nullcontext()
+
+    def _call_provider(self, request: Callable[[], Any]) -> Any:
+        """Sends a provider request with retries, rate limiting and circuit breaking (see resilience.py)."""
+        return get_resilience().call(self.provider, self.api_key, request)
+
+    def _record_usage(self, usage: Any, prompt: str, text: Optional[str]) -> None:
+        """Attaches token usage to the current LLM span, estimating it when the provider reported none."""
+        span = self.tracer.current()
+        if span is None:
+            return
+        def first(*names: str) -> Optional[int]:
+            values = [getattr(usage, name, None) for name in names]
+            return next((v for v in values if isinstance(v, int)), None)
+        # OpenAI/DeepSeek, Anthropic and Gemini name the counts differently
+        prompt_tokens = first("prompt_tokens", "input_tokens", "prompt_token_count")
+        completion_tokens = first("completion_tokens", "output_tokens", "candidates_token_count")
+        if prompt_tokens is None or completion_tokens is None:
+            span.record_usage(self.provider, self.model_id, self._estimate_tokens(prompt),
+                              self._estimate_tokens(text or ""), estimated=True)
+        else:
+            span.record_usage(self.provider, self.model_id, prompt_tokens, completion_tokens)
+
+    def _request_completion(self, prompt: str, history: Sequence[Tuple[str, str]] = (),
+                            keys: Optional[Sequence[str]] = None) -> Optional[str]:
+        """
+        Sends the prompt in a single blocking request and returns the full response text.
+        `history` holds earlier (role, text) turns; `keys` are the report sections to ask for (default: all).
+        """
+        messages = self._messages(prompt, history)
+        structured = self._structured_output(keys or self.REQUIRED_KEYS)
+        with self._lease_client() as client:
+            if self.provider == "openai" or self.provider in self.BASE_URLS: # DeepSeek etc. use the OpenAI API
+                response = client.chat.completions.create(
                     model=self.model_id,
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"} 
+                    messages=messages,
+                    **structured
                 )
-                analysis_json_str = response.choices[0].message.content
+                text, usage = response.choices[0].message.content, response.usage
             elif self.provider == "anthropic":
-                message = self.client.messages.create(
+                message = client.messages.create(
                     model=self.model_id,
                     max_tokens=3072, 
-                    messages=[{"role": "user", "content": prompt}]
+                    messages=messages,
+                    **structured
                 )
-                analysis_json_str = message.content[0].text 
+                # The report arrives as the forced tool call's input
+                tool_input = next((block.input for block in message.content if block.type == "tool_use"), None)
+                text = json.dumps(tool_input) if tool_input is not None else "".join(
+                    block.text for block in message.content if block.type == "text")
+                usage = message.usage
             elif self.provider == "google":
-                 response = self.client.generate_content(prompt)
-                 analysis_json_str = response.text 
-            elif self.provider in self.BASE_URLS: # DeepSeek etc.
-                 response = self.client.chat.completions.create(
-                      model=self.model_id, 
-                      messages=[{"role": "user", "content": prompt}]
-                 )
-                 analysis_json_str = response.choices[0].message.content 
-
-            # --- Response Parsing and Validation ---
-            if analysis_json_str:
-                 analysis_data = self._parse_llm_response(analysis_json_str)
-                 if analysis_data:
-                      required_keys = ['strengths', 'weaknesses', 'opportunities', 'market_gaps', 'pricing_strategies', 'growth_opportunities', 'recommendations']
-                      if not all(key in analysis_data for key in required_keys):
-                           st.warning("LLM response missing some expected analysis keys. Results might be incomplete.")
-                           for key in required_keys:
-                               analysis_data.setdefault(key, ["N/A"]) 
-                      return analysis_data
-                 else:
-                      st.error(f"Could not parse valid JSON from {self.provider} response.")
-                      print(f"{self.provider} Raw Response: {analysis_json_str}") 
-                      return self._generate_mock_report() 
+                 response = client.models.generate_content(model=self.model_id, contents=messages, **structured)
+                 text, usage = response.text, getattr(response, "usage_metadata", None)
             else:
-                 st.error(f"Received empty response from {self.provider}.")
-                 return self._generate_mock_report() 
+                 return None
+        self._record_usage(usage, "".join(text for _, text in history) + prompt, text)
+        return text
 
+    def _iter_completion_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Yields response text chunks using each provider's streaming API. Opening the stream is retried;
+        a stream that breaks after text has been yielded is not, since the text can't be taken back.
+        """
+        received: List[str] = [] # Only used to estimate usage when the provider doesn't report it
+        usage = None
+        messages = self._messages(prompt, ())
+        structured = self._structured_output(self.REQUIRED_KEYS)
+        with self._lease_client() as client: # Held until the stream is closed
+            if self.provider == "openai" or self.provider in self.BASE_URLS:
+                extra = {"stream_options": {"include_usage": True}} if self.provider == "openai" else {}
+                stream = self._call_provider(lambda: client.chat.completions.create(
+                    model=self.model_id,
+                    messages=messages,
+                    stream=True,
+                    **structured,
+                    **extra
+                ))
+                try:
+                    for chunk in stream:
+                        usage = getattr(chunk, "usage", None) or usage # Sent in a final chunk without choices
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            received.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                finally:
+                    stream.close() # Releases the connection when a consumer stops early (e.g. a cancelled hedge)
+            elif self.provider == "anthropic":
+                def open_stream() -> Tuple[Any, Any]:
+                    manager = client.messages.stream(
+                        model=self.model_id,
+                        max_tokens=3072,
+                        messages=messages,
+                        **structured
+                    )
+                    return manager, manager.__enter__() # The request is sent on enter
+                manager, stream = self._call_provider(open_stream)
+                try:
+                    for event in stream:
+                        if event.type != "content_block_delta":
+                            continue
+                        # The forced tool call streams its input as JSON fragments
+                        text = event.delta.partial_json if event.delta.type == "input_json_delta" else getattr(event.delta, "text", None)
+                        if text:
+                            received.append(text)
+                            yield text
+                    usage = stream.get_final_message().usage
+                finally:
+                    manager.__exit__(None, None, None)
+            elif self.provider == "google":
+                def open_stream() -> Tuple[Any, Any]:
+                    stream = client.models.generate_content_stream(model=self.model_id, contents=messages, **structured)
+                    return stream, next(stream, None) # The request is sent when the first chunk is read
+                stream, first = self._call_provider(open_stream)
+                for chunk in itertools.chain([first] if first is not None else [], stream):
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if chunk.text:
+                        received.append(chunk.text)
+                        yield chunk.text
+        self._record_usage(usage, prompt, "".join(received))
+
+    def complete_text(self, prompt: str, cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """
+        Returns the full response text. With a `cancel_event` the request is streamed so it can be
+        abandoned between chunks; RequestCancelled is raised once the event is set.
+        """
+        if cancel_event is None:
+            with self._llm_slot(), self.tracer.span("llm", provider=self.provider, model=self.model_id):
+                return self._call_provider(lambda: self._request_completion(prompt))
+        chunks = []
+        with self._llm_slot(), self.tracer.span("llm", provider=self.provider, model=self.model_id, streamed=True) as span:
+            if cancel_event.is_set(): # Cancelled while waiting for a slot: don't send the request at all
+                span.set(cancelled=True)
+                raise RequestCancelled()
+            stream = self._iter_completion_stream(prompt)
+            try:
+                for chunk in stream:
+                    if cancel_event.is_set():
+                        span.set(cancelled=True) # Another route won; not a failure of this one
+                        break
+                    chunks.append(chunk)
+            finally:
+                stream.close()
+        if cancel_event.is_set():
+            raise RequestCancelled()
+        return "".join(chunks)
+
+    def summarize_pages(self, pages: Sequence[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Summarizes several pages, given as (key, text) pairs, in one structured request and returns {key: summary}.
+        Used by SummaryBatcher (see summarize.py); runs on a worker thread, so must not touch Streamlit.
+        """
+        ids = {f"page_{i}": key for i, (key, _) in enumerate(pages, 1)}
+        prompt = ("Summarize each of the following competitor web pages in 2-3 sentences: what the company offers, "
+                  "who it targets and anything notable about pricing or positioning. Reply with a JSON object with one "
+                  "key per page id, each holding the summary sentences as a list of strings.\n\n"
+                  + "\n\n".join(f"[{page_id}]\n{text}" for page_id, (_, text) in zip(ids, pages)))
+        cache_key = ResponseCache.make_key(self.provider, self.model_id, prompt) if self.response_cache else None
+        summaries = self.response_cache.get(cache_key) if cache_key else None
+        if not summaries:
+            with self._llm_slot(), self.tracer.span("llm", provider=self.provider, model=self.model_id,
+                                                    summary=True, pages=len(pages)):
+                text = self._call_provider(lambda: self._request_completion(prompt, keys=list(ids)))
+            parsed = extract_json_object(text or "") or {}
+            summaries = {page_id: " ".join(map(str, value)) if isinstance(value, list) else str(value)
+                         for page_id, value in parsed.items() if page_id in ids and value}
+            if not summaries:
+                raise AnalysisError(f"{'empty' if not text else 'unparseable'} summary response from {self.provider}")
+            if cache_key and len(summaries) == len(ids) and not is_partial(parsed):
+                self.response_cache.set(cache_key, summaries)
+        return {ids[page_id]: summary for page_id, summary in summaries.items() if page_id in ids}
+
+    def _complete_missing(self, prompt: str, response_text: str, missing: List[str]) -> Dict[str, Any]:
+        """
+        Asks only for the sections a reply left out (e.g. one cut off at the token limit), continuing the
+        conversation instead of regenerating the whole report. Returns the sections it recovered.
+        """
+        followup = ("Your JSON reply was incomplete. Reply with a JSON object containing only these missing keys: "
+                    + ", ".join(f"'{key}'" for key in missing) + ". Do not repeat the other keys.")
+        history = [("user", prompt), ("assistant", response_text)]
+        logger.info("Requesting %d missing analysis sections from %s model %s...", len(missing), self.provider, self.model_id)
+        try:
+            with self._llm_slot(), self.tracer.span("llm", provider=self.provider, model=self.model_id, followup=True):
+                text = self._call_provider(lambda: self._request_completion(followup, history=history, keys=missing))
         except Exception as e:
-            st.error(f"Error generating analysis report with {self.provider}: {e}")
-            print(f"Error details: {e}") 
-            return self._generate_mock_report() 
+            logger.warning("Follow-up for missing analysis sections failed: %s", e if isinstance(e, ProviderError) else describe(e))
+            return {}
+        recovered = extract_json_object(text or "") or {}
+        return {key: recovered[key] for key in missing if key in recovered}
 
-    def _generate_mock_report(self) -> Dict[str, Any]:
-        """Generates mock analysis data"""
-        print("Generating mock analysis report...") 
-        return {
-            "strengths": ["Mock: Strong online presence", "Mock: Innovative product lineup"],
-            "weaknesses": ["Mock: Limited market reach", "Mock: Price point concerns"],
-            "opportunities": ["Mock: Expand to new markets", "Mock: Develop budget offerings"],
-            "market_gaps": ["Mock: Underserved budget segment"],
-            "pricing_strategies": ["Mock: Consider freemium model"],
-            "growth_opportunities": ["Mock: International expansion"],
-            "recommendations": ["Mock: Develop a stronger social media presence"]
-        }
+    def _parse_report(self, prompt: str, response_text: str,
+                      on_section: Optional[Callable[[str, Any], None]] = None) -> Optional[Dict[str, Any]]:
+        """Parses a reply to `prompt`; sections it lacks are requested in one follow-up and reported to `on_section`."""
+        with self.tracer.span("parse", chars=len(response_text)):
+            analysis_data = self._parse_llm_response(response_text)
+        missing = [key for key in self.REQUIRED_KEYS if key not in (analysis_data or {})]
+        if analysis_data and missing:
+            recovered = self._complete_missing(prompt, response_text, missing)
+            analysis_data.update(recovered)
+            for key, value in recovered.items():
+                if on_section:
+                    on_section(key, value)
+        return analysis_data
 
-# --- Comparison Agent (Unchanged) ---
+    def _is_complete_response(self, response_text: str) -> bool:
+        analysis_data = self._parse_llm_response(response_text)
+        return (bool(analysis_data) and not is_partial(analysis_data)
+                and all(key in analysis_data for key in self.REQUIRED_KEYS))
+
+    def _complete(self, prompt: str) -> Tuple[Optional[str], "AnalysisAgent"]:
+        """Returns the response text and the agent that produced it, hedged across providers when a router is set."""
+        if self.router:
+            return self.router.complete(prompt, self._is_complete_response)
+        return self.complete_text(prompt, self.cancel_event), self
+
+    def _stream_completion(self, prompt: str, on_section: Callable[[str, Any], None]) -> str:
+        """Streams the response, reporting each top-level JSON section as soon as it is complete."""
+        parser = IncrementalObjectParser()
+        with self._llm_slot(), self.tracer.span("llm", provider=self.provider, model=self.model_id, streamed=True) as span:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                span.set(cancelled=True)
+                raise RequestCancelled()
+            stream = self._iter_completion_stream(prompt)
+            try:
+                for chunk in stream:
+                    if self.cancel_event is not None and self.cancel_event.is_set():
+                        span.set(cancelled=True)
+                        raise RequestCancelled()
+                    for key, value in parser.feed(chunk):
+                        on_section(key, value)
+            finally:
+                stream.close()
+        return parser.text
+
+    def generate_analysis_report(self, company_data: List[Dict[str, Any]],
+                                 on_section: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        Generate a detailed analysis report using the configured LLM.
+        When `on_section(key, value)` is given the response is streamed and each section is reported as it completes.
+        Raises AnalysisError with the reason when no analysis could be produced.
+        """
+        if not self.client or not self.model_id or not self.api_key: 
+            raise AnalysisError("LLM provider not configured correctly (check API key/model selection).")
+
+        prompt = self._generate_prompt(company_data)
+        logger.info("Estimated prompt size: %d tokens (budget %d).", self._estimate_tokens(prompt), self.prompt_token_budget)
+        if self.should_map_reduce(company_data, prompt):
+            return self._generate_map_reduce_report(company_data, on_section)
+
+        cache_key = ResponseCache.make_key(self.provider, self.model_id, prompt) if self.response_cache else None
+        if cache_key:
+            cached_analysis = self.response_cache.get(cache_key)
+            if cached_analysis:
+                logger.info("LLM response cache hit for %s model %s.", self.provider, self.model_id)
+                return cached_analysis
+        analysis_json_str, responder = None, self
+        
+        try:
+            logger.info("Generating analysis using %s model %s...", self.provider, self.model_id)
+            if on_section and not self.router: # Hedged requests render once the winner is known
+                analysis_json_str = self._stream_completion(prompt, on_section)
+            else:
+                analysis_json_str, responder = self._complete(prompt)
+                if responder is not self:
+                    logger.info("Analysis answered by %s model %s.", responder.provider, responder.model_id)
+                    cache_key = ResponseCache.make_key(responder.provider, responder.model_id, prompt) if cache_key else None
+        except (ProviderError, RoutingError) as e:
+            raise AnalysisError(str(e)) from e
+        except Exception as e:
+            raise AnalysisError(f"{self.provider}: {describe(e)}") from e
+
+        # --- Response Parsing and Validation ---
+        if not analysis_json_str:
+            raise AnalysisError(f"Received empty response from {responder.provider}.")
+        analysis_data = responder._parse_report(prompt, analysis_json_str, on_section)
+        if not analysis_data:
+            logger.debug("%s raw response: %s", responder.provider, analysis_json_str)
+            raise AnalysisError(f"Could not parse valid JSON from {responder.provider} response.")
+        if not all(key in analysis_data for key in self.REQUIRED_KEYS):
+            self.reporter.warning("LLM response missing some expected analysis keys. Results might be incomplete.")
+            for key in self.REQUIRED_KEYS:
+                analysis_data.setdefault(key, ["N/A"]) 
+        elif cache_key and not is_partial(analysis_data):
+            # Only complete, validated analyses are memoized - never patched or truncated ones
+            self.response_cache.set(cache_key, analysis_data)
+        return analysis_data
+
+    def should_map_reduce(self, company_data: List[Dict[str, Any]], prompt: str) -> bool:
+        """Large competitor sets are analyzed in parallel chunks instead of one oversized prompt."""
+        return len(company_data) > self.map_reduce_threshold or self._estimate_tokens(prompt) > self.map_reduce_token_threshold
+
+    def _chunk_competitors(self, company_data: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Greedily packs competitors into chunks whose data fits the map token budget."""
+        chunks, current, current_tokens = [], [], 0
+        for company in company_data:
+            tokens = self._estimate_tokens(json.dumps(company, default=str))
+            if current and current_tokens + tokens > self.map_chunk_tokens:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(company)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _map_chunk(self, chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Map step for one chunk. Runs on a worker thread, so must not touch Streamlit."""
+        prompt = self._generate_prompt(chunk)
+        cache_key = ResponseCache.make_key(self.provider, self.model_id, prompt) if self.response_cache else None
+        if cache_key:
+            cached_analysis = self.response_cache.get(cache_key)
+            if cached_analysis:
+                return cached_analysis
+        response_text, responder = self._complete(prompt)
+        if responder is not self and cache_key:
+            cache_key = ResponseCache.make_key(responder.provider, responder.model_id, prompt)
+        analysis_data = responder._parse_report(prompt, response_text) if response_text else None
+        if not analysis_data:
+            raise AnalysisError(f"{'empty' if not response_text else 'unparseable'} response from {responder.provider}")
+        if cache_key and not is_partial(analysis_data) and all(key in analysis_data for key in self.REQUIRED_KEYS):
+            self.response_cache.set(cache_key, analysis_data)
+        return analysis_data
+
+    def generate_fragments(self, company_data: List[Dict[str, Any]],
+                           on_section: Optional[Callable[[str, Any], None]] = None) -> List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Like generate_analysis_report, but returns (competitors, report) for each group of competitors analyzed
+        together instead of one merged report: a single pair, or one per chunk when the data is map-reduced
+        (`on_section` is then left to the caller). Used to keep analyses per competitor group (see snapshots.py).
+        """
+        if not self.client or not self.model_id or not self.api_key:
+            raise AnalysisError("LLM provider not configured correctly (check API key/model selection).")
+        if self.should_map_reduce(company_data, self._generate_prompt(company_data)):
+            return self._map_fragments(company_data)
+        return [(company_data, self.generate_analysis_report(company_data, on_section))]
+
+    def _map_fragments(self, company_data: List[Dict[str, Any]]) -> List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """Map step: analyzes competitor chunks in parallel and returns each successful (chunk, partial report)."""
+        chunks = self._chunk_competitors(company_data)
+        logger.info("Map-reduce analysis of %d competitors in %d chunks using %s model %s...",
+                    len(company_data), len(chunks), self.provider, self.model_id)
+        partials, failures = [], []
+        with ThreadPoolExecutor(max_workers=min(self.map_concurrency, len(chunks)), thread_name_prefix="analysis-map") as executor:
+            futures = [executor.submit(self.tracer.bind(self._map_chunk), chunk) for chunk in chunks]
+            for chunk, future in zip(chunks, futures): # Submission order keeps the merged lists in competitor order
+                try:
+                    partials.append((chunk, future.result()))
+                except Exception as e:
+                    reason = describe(e) if not isinstance(e, (AnalysisError, ProviderError, RoutingError)) else str(e)
+                    logger.warning("Map-step analysis failed: %s", reason)
+                    failures.append(reason)
+
+        if not partials:
+            raise AnalysisError(f"Every map-step analysis failed with {self.provider}: {failures[0]}")
+        if failures:
+            self.reporter.warning(f"{len(failures)} of {len(chunks)} analysis chunks failed ({failures[0]}). "
+                                  "The report covers the remaining competitors.")
+        return partials
+
+    def _generate_map_reduce_report(self, company_data: List[Dict[str, Any]],
+                                    on_section: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """Analyzes competitor chunks in parallel, then merges the partial reports into one."""
+        report = merge_partial_reports([partial for _, partial in self._map_fragments(company_data)], self.REQUIRED_KEYS)
+        if on_section:
+            for key in self.REQUIRED_KEYS:
+                on_section(key, report[key])
+        return report
+
+# --- Comparison Agent (Columnar, see comparison.py) ---
 class ComparisonAgent:
     """Agent that creates structured comparisons between competitors"""
     def __init__(self):
         pass
-        
-    def create_comparison_table(self, company_data: List[Dict[str, Any]]) -> pd.DataFrame:
-        data = []
-        for company in company_data:
-            metadata = company.get("metadata", {})
-            technologies = ", ".join(metadata.get("technologies", ["N/A"]))
-            team_size = metadata.get("team_size", "N/A")
-            founded = metadata.get("founded", "N/A")
-            data.append({
-                "Company": company.get("name", "Unknown"), "Website": company.get("url", "N/A"),
-                "Description": company.get("description", "N/A")[:100] + "...", 
-                "Summary": company.get("summary", "N/A")[:100] + "...",
-                "Technologies": technologies, "Team Size": team_size, "Founded": founded,
-            })
-        if not data: return pd.DataFrame(columns=["Company", "Website", "Description", "Summary", "Technologies", "Team Size", "Founded"])
-        return pd.DataFrame(data)
+
+    def build_table(self, company_data: List[Dict[str, Any]]) -> ComparisonTable:
+        return ComparisonTable(company_data)
+
+    def create_comparison_table(self, company_data: List[Dict[str, Any]]) -> "pd.DataFrame":
+        return self.build_table(company_data).frame()
 
 # --- Competitor Intelligence Team (Updated configure_agents) ---
 class CompetitorIntelligenceTeam:
     """Main agent team that coordinates the specialized agents"""
-    def __init__(self):
-        self.firecrawl_agent = FirecrawlAgent()
+    def __init__(self, reporter: Optional[Reporter] = None, tracer: Optional[Tracer] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        self.reporter = reporter or LoggingReporter()
+        self.tracer = tracer or Tracer() # Per-stage timings, tokens and cost of this team's runs
+        self.cancel_event = cancel_event # Set to stop a run at its next stage, crawl or streamed LLM chunk
+        self.firecrawl_agent = FirecrawlAgent(tracer=self.tracer)
         self.exa_agent = ExaSearchAgent()
-        self.analysis_agent = AnalysisAgent() # Default init
+        # Placeholder until configure_agents; it reports to the log so its "no model" warning doesn't reach users
+        self.analysis_agent = AnalysisAgent(tracer=self.tracer)
         self.comparison_agent = ComparisonAgent()
-        
-    def configure_agents(self, llm_provider: str, llm_api_key: str, llm_model_id: str, firecrawl_key: str, exa_key: str):
-        """Configure agents with API keys and LLM choice"""
-        self.firecrawl_agent = FirecrawlAgent(firecrawl_key)
+        self.comparison_table = ComparisonTable() # Filled as competitors finish crawling
+        self.deduplicator = Deduplicator()
+        self.snapshots: Optional[SnapshotStore] = None # Set to re-analyze only competitors that changed
+        self.subject: Optional[str] = None # Input of the current run, to compare with its previous run
+        self.crawl_engine = CrawlEngine()
+
+    def configure_crawler(self, max_concurrency: int = DEFAULT_CRAWL_CONCURRENCY,
+                          requests_per_host_per_second: float = DEFAULT_CRAWL_RATE_PER_HOST,
+                          timeout: Optional[float] = DEFAULT_CRAWL_TIMEOUT):
+        """Configure concurrency, politeness and timeout limits for competitor crawling"""
+        self.crawl_engine = CrawlEngine(max_concurrency, requests_per_host_per_second, timeout)
+
+    def configure_agents(self, llm_provider: str, llm_api_key: str, llm_model_id: str, firecrawl_key: str, exa_key: str,
+                         crawl_cache: Optional[CrawlCache] = None, refresh_cache: bool = False,
+                         response_cache: Optional[ResponseCache] = None,
+                         map_reduce_threshold: int = DEFAULT_MAP_REDUCE_THRESHOLD,
+                         max_prompt_tokens: int = DEFAULT_MAX_PROMPT_TOKENS,
+                         llm_slots: Optional[threading.Semaphore] = None,
+                         backup_llms: Optional[List[Tuple[str, str, str]]] = None,
+                         domain_index: Optional[DomainIndex] = None,
+                         duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                         snapshots: Optional[SnapshotStore] = None,
+                         summary_mode: str = DEFAULT_SUMMARY_MODE):
+        """
+        Configure agents with API keys and LLM choice. `backup_llms` lists (provider, api_key, model_id) routes to hedge with.
+        With `snapshots`, runs reuse the summaries and analyses of competitors whose pages haven't changed.
+        `summary_mode` is "extractive" (local) or "llm" (pages summarized in batched requests to the analysis model).
+        """
+        self.deduplicator = Deduplicator(domain_index, duplicate_threshold)
+        self.snapshots = snapshots
         self.exa_agent = ExaSearchAgent(exa_key)
         # Pass the actual model ID now
-        self.analysis_agent = AnalysisAgent(provider=llm_provider, api_key=llm_api_key, model_id=llm_model_id) 
-        print(f"Agents configured with LLM Provider: {llm_provider}, Model: {self.analysis_agent.model_id}") 
+        self.analysis_agent = AnalysisAgent(provider=llm_provider, api_key=llm_api_key, model_id=llm_model_id,
+                                            response_cache=response_cache, map_reduce_threshold=map_reduce_threshold,
+                                            max_prompt_tokens=max_prompt_tokens, reporter=self.reporter, llm_slots=llm_slots,
+                                            tracer=self.tracer, cancel_event=self.cancel_event)
+        if summary_mode == "llm" and not self.analysis_agent.client:
+            self.reporter.warning("LLM summaries need a configured LLM client; pages will be summarized locally.")
+            summary_mode = "extractive"
+        self.firecrawl_agent = FirecrawlAgent(firecrawl_key, cache=crawl_cache, refresh_cache=refresh_cache, tracer=self.tracer,
+                                              summary_mode=summary_mode)
+        backups = [
+            AnalysisAgent(provider=provider, api_key=api_key, model_id=model_id, reporter=self.reporter, llm_slots=llm_slots,
+                          tracer=self.tracer, cancel_event=self.cancel_event)
+            for provider, api_key, model_id in backup_llms or []
+        ]
+        backups = [agent for agent in backups if agent.client]
+        if backups and self.analysis_agent.client:
+            self.analysis_agent.router = HedgedRouter([self.analysis_agent] + backups, cancel_event=self.cancel_event,
+                                                      tracer=self.tracer)
+        logger.info("Agents configured with LLM Provider: %s, Model: %s%s", llm_provider, self.analysis_agent.model_id,
+                    f", backups: {', '.join(a.provider + '/' + a.model_id for a in backups)}" if backups else "")
         
-    def discover_competitors(self, input_text: str, is_url: bool = False) -> List[Dict[str, Any]]:
-        """Discover competitors based on input (URL or description)"""
-        # (Logic unchanged from previous version)
+    def _check_cancelled(self) -> None:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def discover_competitors(self, input_text: str, is_url: bool = False,
+                             count: int = DEFAULT_COMPETITOR_COUNT) -> List[Dict[str, Any]]:
+        """Discover up to `count` competitors based on input (URL or description)"""
+        with self.tracer.span("discover_competitors", is_url=is_url) as span:
+            competitors = self._discover_competitors(input_text, is_url, count)
+            span.set(competitors=len(competitors))
+            return competitors
+
+    def _discover_competitors(self, input_text: str, is_url: bool, count: int) -> List[Dict[str, Any]]:
+        self.subject = subject_key(input_text, is_url) if input_text else None
         if is_url:
             if not re.match(r'^https?://', input_text):
-                 st.error("Invalid URL provided. Please include http:// or https://")
+                 self.reporter.error("Invalid URL provided. Please include http:// or https://")
+                 return []
+            try:
+                 company_data = self.firecrawl_agent.crawl_website(input_text)
+            except ProviderError as e:
+                 self.reporter.error(f"Could not crawl {input_text}: {e.reason}")
                  return []
-            company_data = self.firecrawl_agent.crawl_website(input_text)
             description = company_data.get("description", "")
             if not description:
-                 st.warning("Could not extract description from website for competitor search.")
+                 self.reporter.warning("Could not extract description from website for competitor search.")
                  description = company_data.get("title", "") 
         else:
             description = input_text
             
         if not description:
-             st.error("Cannot search for competitors without a description or URL.")
+             self.reporter.error("Cannot search for competitors without a description or URL.")
              return []
 
-        competitors = self.exa_agent.find_similar_companies(description)
+        try:
+            with self.tracer.span("discovery"):
+                competitors = self.exa_agent.find_similar_companies(description, count)
+        except ProviderError as e:
+            self.reporter.error(f"Competitor search failed: {e.reason}")
+            return []
+
+        # The same company under another URL (www, locale path, known alias) is merged before it costs a crawl
+        with self.tracer.span("dedupe", stage="urls", found=len(competitors)) as span:
+            found = len(competitors)
+            competitors = self.deduplicator.merge_urls(competitors, exclude=input_text if is_url else None)
+            span.set(kept=len(competitors))
+        if len(competitors) < found:
+            self.reporter.info(f"Merged {found - len(competitors)} search results that point to an already listed site.")
+        self._check_cancelled()
         
-        enriched_competitors = []
-        progress_bar = st.progress(0.0, text="Crawling competitor websites...")
+        progress_bar = self.reporter.progress(0.0, text="Crawling competitor websites...")
         num_competitors = len(competitors)
         if num_competitors == 0:
              progress_bar.progress(1.0, text="No competitors found to crawl.")
              return []
-             
-        for i, competitor in enumerate(competitors):
-            name = competitor.get('name', 'Unknown')
-            url = competitor.get('url')
-            progress_text = f"Crawling {name} ({i+1}/{num_competitors})..."
-            progress_bar.progress((i + 1) / num_competitors, text=progress_text)
 
-            if url:
-                try:
-                    crawl_data = self.firecrawl_agent.crawl_website(url)
-                    competitor.update({
-                        "summary": self.firecrawl_agent.summarize_content(crawl_data.get("content", "")),
-                        "metadata": crawl_data.get("metadata", {})
-                    })
-                except Exception as e:
-                     st.warning(f"Could not crawl {name} ({url}): {e}")
-                     competitor["summary"] = "Crawling failed"
-                     competitor["metadata"] = {}
-            else:
+        self.comparison_table = self.comparison_agent.build_table([])
+        for competitor in competitors:
+            if not competitor.get('url'):
                  competitor["summary"] = "No URL provided"
                  competitor["metadata"] = {}
-                 
-            enriched_competitors.append(competitor)
-            
+                 self.comparison_table.append(competitor)
+        crawlable = [c for c in competitors if c.get('url')]
+        completed = num_competitors - len(crawlable)
+        signatures: Dict[str, Any] = {} # MinHash of each crawled page, by URL
+        snapshots = self.snapshots.companies(crawlable) if self.snapshots else {}
+        previous = {c['url']: snapshots.get(company_key(c)) for c in crawlable}
+
+        # In "llm" mode, pages needing a new summary are packed into token-budgeted requests as their crawls finish
+        batcher = SummaryBatcher(
+            self.tracer.bind(self.analysis_agent.summarize_pages),
+            provider=self.analysis_agent.provider, model_id=self.analysis_agent.model_id,
+        ) if self.firecrawl_agent.summary_mode == "llm" else None
+        batched: List[Dict[str, Any]] = [] # Competitors waiting for their batched summary
+
+        def on_complete(index: int, enrichment: Optional[Dict[str, Any]], error: Optional[Exception]) -> None:
+            # Runs on the calling thread, so UI reporters are safe to use here
+            nonlocal completed
+            competitor = crawlable[index]
+            name = competitor.get('name', 'Unknown')
+            if error is None:
+                signatures[competitor['url']] = enrichment.pop("signature")
+                competitor.update(enrichment)
+                if competitor["summary"] is None:
+                    batched.append(competitor) # Added to the table once its batch returns
+                    completed += 1
+                    progress_bar.progress(completed / num_competitors, text=f"Crawled {name} ({completed}/{num_competitors})...")
+                    return
+            elif previous[competitor['url']] and previous[competitor['url']]["content_hash"]:
+                snapshot = previous[competitor['url']]
+                self.reporter.warning(f"Could not crawl {name} ({competitor.get('url')}): {error}. "
+                                      f"Using its snapshot from {time.strftime('%Y-%m-%d %H:%M', time.localtime(snapshot['updated']))}.")
+                competitor.update(summary=snapshot["summary"], metadata=snapshot["metadata"], content_hash=snapshot["content_hash"])
+            else:
+                self.reporter.warning(f"Could not crawl {name} ({competitor.get('url')}): {error}")
+                competitor["summary"] = "Crawling failed"
+                competitor["metadata"] = {}
+            self.comparison_table.append(competitor)
+            completed += 1
+            progress_bar.progress(completed / num_competitors, text=f"Crawled {name} ({completed}/{num_competitors})...")
+
+        crawl = self.tracer.bind(self._crawl_competitor)
+        try:
+            self.crawl_engine.run([c['url'] for c in crawlable], lambda url: crawl(url, previous[url], batcher), on_complete,
+                                  cancel_event=self.cancel_event)
+            self._check_cancelled()
+            if batcher:
+                self._collect_summaries(batcher, batched, progress_bar)
+        finally:
+            if batcher:
+                batcher.close()
+
+        # Results were written in place, so Exa's original ordering is preserved
         progress_bar.progress(1.0, text="Competitor crawling complete.")
-        return enriched_competitors
-        
-    def generate_intelligence_report(self, competitors: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Generate a complete intelligence report"""
+        with self.tracer.span("dedupe", stage="content", crawled=len(signatures)) as span:
+            distinct = self.deduplicator.merge_content(competitors, signatures)
+            span.set(merged=len(competitors) - len(distinct))
+        if len(distinct) < len(competitors):
+            self.reporter.info(f"Merged {len(competitors) - len(distinct)} competitors whose websites are near-duplicates.")
+            self.comparison_table = self.comparison_agent.build_table(distinct)
+        return distinct
+
+    def _collect_summaries(self, batcher: SummaryBatcher, batched: List[Dict[str, Any]], progress_bar: Any) -> None:
+        """Waits for the batched LLM summaries and adds their competitors to the table."""
+        if not batched:
+            return
+        progress_bar.progress(1.0, text=f"Summarizing {len(batched)} competitor websites...")
+        with self.tracer.span("summarize_batches", pages=len(batched)) as span:
+            summaries, errors = batcher.results()
+            span.set(batches=batcher.batches, failed=len(errors))
+        if errors:
+            self.reporter.warning(f"{len(errors)} of {batcher.batches} summary requests failed ({errors[0]}); "
+                                  "the affected pages were summarized locally.")
+        for competitor in batched:
+            competitor["summary"] = summaries[competitor['url']]
+            self.firecrawl_agent.store_summary(competitor['url'], competitor["summary"])
+            self.comparison_table.append(competitor)
+        self._check_cancelled()
+
+    def _crawl_competitor(self, url: str, previous: Optional[Dict[str, Any]] = None,
+                          batcher: Optional[SummaryBatcher] = None) -> Dict[str, Any]:
+        """
+        Crawls and summarizes a single competitor, reusing the summary of its `previous` snapshot if the page is
+        unchanged. Pages left unsummarized in "llm" mode are queued on `batcher`. Runs on a worker thread, so must
+        not touch Streamlit.
+        """
+        crawl_data, summary = self.firecrawl_agent.crawl_and_summarize(url, previous)
+        content = crawl_data.get("content", "")
+        if summary is None:
+            if batcher:
+                batcher.add(url, content)
+            else:
+                summary = self.firecrawl_agent.summarize_content(content)
+        return {"summary": summary, "metadata": crawl_data.get("metadata", {}), "content_hash": content_hash(content),
+                "signature": minhash(content)} # Compared after all crawls finish
+
+    def generate_intelligence_report(self, competitors: List[Dict[str, Any]],
+                                     on_section: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        Generate a complete intelligence report, optionally streaming analysis sections to `on_section`.
+        The report's "comparison" is a ComparisonTable; its DataFrame is only built where the table is shown.
+        """
         # (Logic mostly unchanged, relies on configured analysis_agent)
         if not competitors:
-             return {"competitors": [], "analysis": {}, "comparison_table": pd.DataFrame()}
-             
-        if not self.analysis_agent or not self.analysis_agent.client:
-             st.error("Analysis agent not configured. Please check API keys in sidebar.")
-             analysis = self.analysis_agent._generate_mock_report() 
-        else:
-             analysis = self.analysis_agent.generate_analysis_report(competitors)
+             return {"competitors": [], "analysis": {}, "analysis_error": None,
+                     "comparison": self.comparison_agent.build_table([]), "changes": None}
              
-        comparison_df = self.comparison_agent.create_comparison_table(competitors)
+        with self.tracer.span("generate_intelligence_report", competitors=len(competitors)):
+             analysis, analysis_error, reanalyzed = {}, None, len(competitors)
+             if not self.analysis_agent or not self.analysis_agent.client:
+                  analysis_error = "Analysis agent not configured. Please check API keys in sidebar."
+             else:
+                  try:
+                      with self.tracer.span("analysis", provider=self.analysis_agent.provider,
+                                            model=self.analysis_agent.model_id, incremental=bool(self.snapshots)):
+                          if self.snapshots:
+                              analysis, reanalyzed = self._incremental_analysis(competitors, on_section)
+                          else:
+                              analysis = self.analysis_agent.generate_analysis_report(competitors, on_section=on_section)
+                  except AnalysisError as e:
+                      analysis_error = str(e)
+             self._check_cancelled() # A cancelled analysis is neither reported nor recorded
+             if analysis_error:
+                  self.reporter.error(f"Analysis failed: {analysis_error}")
+                  
+             with self.tracer.span("comparison_table", rows=len(competitors)) as span:
+                  # The table filled while crawling is reused unless the caller passed other competitors
+                  table = self.comparison_table
+                  if not table.covers(competitors):
+                       table = self.comparison_agent.build_table(competitors)
+                  span.set(incremental=table is self.comparison_table)
+
+             changes = None
+             if self.snapshots and self.subject:
+                  with self.tracer.span("change_report"):
+                       changes = change_report(self.snapshots.last_run(self.subject), competitors, analysis)
+                       changes["reanalyzed"] = reanalyzed
+                       if not analysis_error: # A failed analysis is not a baseline for the next run
+                            self.snapshots.record_run(self.subject, competitors, analysis)
         
-        return {"competitors": competitors, "analysis": analysis, "comparison_table": comparison_df}
+        return {"competitors": competitors, "analysis": analysis, "analysis_error": analysis_error,
+                "comparison": table, "changes": changes}
+
+    def _incremental_analysis(self, competitors: List[Dict[str, Any]],
+                              on_section: Optional[Callable[[str, Any], None]] = None) -> Tuple[Dict[str, Any], int]:
+        """
+        Reuses the stored analysis fragments of competitors whose pages are unchanged, analyzes the rest and merges
+        both into one report. Returns the report and the number of competitors that were analyzed again.
+        """
+        agent = self.analysis_agent
+        analyzer = f"{agent.provider}/{agent.model_id}"
+        with self.tracer.span("snapshot_diff", competitors=len(competitors)) as span:
+            reused, pending = self.snapshots.plan(self.subject or "", competitors, analyzer)
+            span.set(reused_fragments=len(reused), reanalyzed=len(pending))
+        if reused:
+            logger.info("Reusing %d stored analyses; %d of %d competitors changed.", len(reused), len(pending), len(competitors))
+        fragments = []
+        try:
+            if pending: # Sections are streamed only when nothing is merged in afterwards
+                fragments = agent.generate_fragments(pending, on_section=None if reused else on_section)
+        finally:
+            # Patched reports (missing sections filled with "N/A") are not worth reusing
+            complete = [(group, report) for group, report in fragments
+                        if all(report.get(key) not in (None, ["N/A"]) for key in agent.REQUIRED_KEYS)]
+            self.snapshots.record(self.subject or "", competitors, complete, analyzer)
+        if not reused and len(fragments) == 1:
+            return fragments[0][1], len(pending)
+        # Fragments are merged in the order of their first competitor, like map-reduce chunks
+        positions = {id(c): index for index, c in enumerate(competitors)}
+        ordered = sorted(reused + fragments, key=lambda fragment: positions[id(fragment[0][0])])
+        analysis = merge_partial_reports([report for _, report in ordered], agent.REQUIRED_KEYS)
+        if on_section:
+            for key in agent.REQUIRED_KEYS:
+                on_section(key, analysis[key])
+        return analysis, len(pending)
+
+# --- Streamlit UI Helpers ---
+INSIGHT_LABELS = {
+    "strengths": "Strengths", "weaknesses": "Weaknesses",
+    "opportunities": "Opportunities", "market_gaps": "Market Gaps",
+    "pricing_strategies": "Suggested Pricing Strategies", "growth_opportunities": "Potential Growth Opportunities",
+}
+
+def describe_prompt_size(analysis_agent: AnalysisAgent, competitors: List[Dict[str, Any]]) -> str:
+    """Summarizes the estimated prompt size and which of the provider's models could take the uncompacted data"""
+    prompt_tokens = analysis_agent.estimate_prompt_tokens(competitors)
+    full_tokens = analysis_agent.estimate_prompt_tokens(competitors, compacted=False)
+    fitting = [model_id for model_id in MODEL_OPTIONS.get(analysis_agent.provider, {})
+               if full_tokens + OUTPUT_TOKEN_RESERVE <= context_window(model_id)]
+    text = f"Estimated prompt: ~{prompt_tokens:,} tokens (~{full_tokens:,} before compaction, budget {analysis_agent.prompt_token_budget:,})."
+    if fitting:
+        return text + f" Models with room for the full data: {', '.join(fitting)}."
+    return text + " No model for this provider has room for the full data; fields will be truncated."
+
+COMPARISON_PAGE_SIZES = (25, 50, 100, 250)
+COMPARISON_TOP_TECHNOLOGIES = 20 # Bars in the technology frequency chart
+
+def ui_fragment(render: Callable, run_every: Optional[float] = None) -> Callable:
+    """
+    Makes widget changes inside `render` rerun only that function (st.fragment), not the analysis above it.
+    With `run_every` the function also reruns on its own every that many seconds.
+    """
+    if st is None or not hasattr(st, "fragment"):
+        return render
+    return st.fragment(render, run_every=run_every)
+
+def _first_comparison_page() -> None:
+    st.session_state["comparison_page"] = 1
+
+@ui_fragment
+def render_comparison_table(table: ComparisonTable) -> None:
+    """Filterable, sortable comparison table sent to the browser one page at a time, with tech-stack frequencies"""
+    if not len(table):
+        st.write("No data for comparison table.")
+        return
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
+    # A new filter, sort order or page size starts over at the first page
+    technologies = col1.multiselect("Uses technologies", table.technology_names(), key="comparison_technologies",
+                                    on_change=_first_comparison_page)
+    search = col2.text_input("Search", placeholder="Name, description or summary", key="comparison_search",
+                             on_change=_first_comparison_page)
+    sort_by = col3.selectbox("Sort by", list(table.frame().columns), key="comparison_sort", on_change=_first_comparison_page)
+    page_size = col4.selectbox("Rows per page", COMPARISON_PAGE_SIZES, key="comparison_page_size",
+                               on_change=_first_comparison_page)
+    view = table.sorted(sort_by, frame=table.filter(technologies=technologies, text=search.strip()))
+    pages = max(1, -(-len(view) // page_size))
+    if st.session_state.get("comparison_page", 1) > pages: # The filter shrank the view
+        st.session_state["comparison_page"] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key="comparison_page")
+    st.dataframe(view.iloc[(page - 1) * page_size:page * page_size], use_container_width=True, hide_index=True)
+    st.caption(f"{len(view):,} of {len(table):,} competitors")
+    frequency = table.technology_frequency()
+    if not frequency.empty:
+        with st.expander("Technology frequency"):
+            st.bar_chart(frequency.head(COMPARISON_TOP_TECHNOLOGIES), x="Technology", y="Competitors", horizontal=True)
+            st.dataframe(frequency, use_container_width=True, hide_index=True)
+
+def render_change_report(changes: Optional[Dict[str, Any]]) -> None:
+    """What changed since the previous run for the same input: competitors and analysis items"""
+    if not changes:
+        return
+    if not changes["previous_run"]:
+        st.caption("Competitor snapshots saved. The next run for this input will show what changed.")
+        return
+    moved = changes["added"] or changes["removed"] or changes["changed"]
+    with st.expander("Changes since the last run", expanded=bool(moved)):
+        st.caption(f"Compared with the run of {time.strftime('%Y-%m-%d %H:%M', time.localtime(changes['previous_run']))}. "
+                   f"{changes['reanalyzed']} of {changes['unchanged'] + len(changes['changed']) + len(changes['added'])} "
+                   "competitors were analyzed again; the other analyses were reused.")
+        for label, key in (("New competitors", "added"), ("Changed websites", "changed"), ("No longer found", "removed")):
+            if changes[key]:
+                st.markdown(f"**{label}:** " + ", ".join(f"{c['name']} ({c['url']})" for c in changes[key]))
+        if not moved:
+            st.write("No competitor website changed.")
+        for key, diff in changes["analysis"].items():
+            if diff["added"] or diff["removed"]:
+                st.markdown(f"**{INSIGHT_LABELS.get(key, 'Recommendations')}**")
+                for item in diff["added"]:
+                    st.markdown(f"- :green[+] {item}")
+                for item in diff["removed"]:
+                    st.markdown(f"- :red[-] ~~{item}~~")
+
+def render_performance_panel(records: List[Dict[str, Any]]) -> None:
+    """Collapsible per-stage timing, token and cost breakdown of a run's spans, with span and metric downloads"""
+    if not records:
+        return
+    import pandas as pd
+    with st.expander("Performance"):
+        summary = pd.DataFrame(summarize(records))
+        st.dataframe(summary, use_container_width=True)
+        cost = summary["cost_usd"].dropna().sum() if "cost_usd" in summary else 0.0
+        llm_spans = [r for r in records if r["name"] == "llm"]
+        st.caption(f"{len(llm_spans)} LLM requests, {summary['prompt_tokens'].sum():,} prompt / "
+                   f"{summary['completion_tokens'].sum():,} completion tokens, estimated cost ${cost:.4f}"
+                   + (" (some token counts estimated)" if any(r.get("tokens_estimated") for r in llm_spans) else ""))
+        st.markdown("**Spans**") # Shown inline: a toggle would rerun the script and clear the results
+        st.dataframe(pd.DataFrame(records), use_container_width=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("Download spans (JSON lines)", "".join(json.dumps(r, default=str) + "\n" for r in records),
+                             file_name="trace.jsonl", mime="application/jsonl")
+        col2.download_button("Download metrics (OpenMetrics)", to_openmetrics(records), file_name="metrics.txt",
+                             mime="application/openmetrics-text")
+
+def create_insight_slots() -> Dict[str, Any]:
+    """Lays out the Analysis Insights section with one empty placeholder per analysis key"""
+    slots = {}
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("#### Strengths & Weaknesses")
+        slots["strengths"], slots["weaknesses"] = st.empty(), st.empty()
+    with col2:
+        st.markdown("#### Opportunities & Market Gaps")
+        slots["opportunities"], slots["market_gaps"] = st.empty(), st.empty()
+
+    st.markdown("#### Pricing & Growth")
+    slots["pricing_strategies"], slots["growth_opportunities"] = st.empty(), st.empty()
+
+    st.subheader("Strategic Recommendations")
+    slots["recommendations"] = st.empty()
+    return slots
+
+def render_insight(slots: Dict[str, Any], key: str, items: Any) -> None:
+    """Fills the placeholder for one analysis section; unknown keys are ignored"""
+    slot = slots.get(key)
+    if slot is None:
+        return
+    items = items if isinstance(items, list) else [items]
+    with slot.container():
+        if key == "recommendations":
+            if items and items != ["N/A"]: [st.markdown(f"**{i}.** {rec}") for i, rec in enumerate(items, 1)]
+            else: st.write("No specific recommendations generated.")
+        else:
+            st.write(f"**{INSIGHT_LABELS[key]}:**"); [st.markdown(f"- {item}") for item in (items or ["N/A"])]
+
+# --- Background Analysis Jobs (see jobs.py) ---
+JOB_POLL_SECONDS = 1.0 # How often the job panel refreshes while analyses are queued or running
+RECENT_JOBS = 10       # Finished analyses listed per user
+
+def run_analysis_job(job: Job, input_text: str, is_url: bool, crawler: Tuple[int, float, float],
+                     agents: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+    """
+    Job work: runs discovery, crawling and analysis with a team of its own, reporting to the job. Returns a
+    JSON-friendly report; analysis sections are published on the job as they are written when `stream` is set.
+    """
+    team = CompetitorIntelligenceTeam(reporter=job.reporter, cancel_event=job.cancel_event)
+    team.configure_crawler(*crawler)
+    team.configure_agents(**agents)
+    competitors = team.discover_competitors(input_text, is_url)
+    result = {"input": input_text, "competitors": competitors, "analysis": {}, "analysis_error": None,
+              "changes": None, "prompt_size": None}
+    if competitors:
+        result["prompt_size"] = describe_prompt_size(team.analysis_agent, competitors)
+        report = team.generate_intelligence_report(competitors, on_section=job.sections.__setitem__ if stream else None)
+        result.update(competitors=report["competitors"], analysis=report["analysis"],
+                      analysis_error=report["analysis_error"], changes=report["changes"])
+    result["spans"] = team.tracer.records()
+    return result
+
+def session_user() -> str:
+    """
+    Who job limits and ownership apply to: the signed-in user when Streamlit auth is set up, otherwise this browser
+    session. Without auth the limit is per session (a new tab gets its own), and jobs can't be reopened after a reload.
+    """
+    user = getattr(st, "user", None)
+    if getattr(user, "is_logged_in", False) and getattr(user, "email", None):
+        return user.email
+    return st.session_state.setdefault("session_user", uuid.uuid4().hex)
+
+def select_job(job_id: str) -> None:
+    st.session_state["selected_job"] = job_id
+    st.query_params["job"] = job_id # Reloading the page reopens the job's results from the job store (signed-in users)
+
+def describe_job(job: Job) -> str:
+    started = time.strftime("%H:%M", time.localtime(job.created))
+    return f"{job.label} ({job.status}, {started})"
+
+def render_job_panel(runner: JobRunner, user: str) -> None:
+    """Progress of the user's queued and running analyses with cancel buttons; reruns the page when one finishes"""
+    active = runner.active(user)
+    for job in active:
+        with st.container(border=True):
+            value, text = job.progress
+            st.markdown(f"**{job.label}** - {job.status}")
+            st.progress(min(1.0, value), text=text or ("Waiting for a free worker..." if job.status == QUEUED else "Starting..."))
+            for level, message in job.messages[-3:]:
+                st.caption(message)
+            if job.sections:
+                with st.expander(f"Analysis so far ({len(job.sections)} of {len(AnalysisAgent.REQUIRED_KEYS)} sections)"):
+                    slots = create_insight_slots()
+                    for key, items in list(job.sections.items()): # Still being written by the job
+                        render_insight(slots, key, items)
+            if st.button("Cancel", key=f"cancel_{job.id}", disabled=job.cancel_event.is_set()):
+                runner.cancel(job.id, user)
+                st.rerun()
+    watched = {job.id for job in active}
+    if st.session_state.get("watched_jobs", set()) - watched:
+        st.session_state["watched_jobs"] = watched
+        st.rerun() # A job finished: render its results with the rest of the page
+    st.session_state["watched_jobs"] = watched
+
+def job_comparison_table(job: Job) -> ComparisonTable:
+    """Comparison table of a finished job, built once per session rather than on every rerun"""
+    cached = st.session_state.get("job_table")
+    if not cached or cached[0] != job.id:
+        cached = (job.id, ComparisonTable(job.result["competitors"]))
+        st.session_state["job_table"] = cached
+    return cached[1]
+
+def render_job_result(job: Job) -> None:
+    """Messages and report of a finished job, read from the job store instead of recomputed"""
+    for level, message in job.messages:
+        getattr(st, level, st.info)(message)
+    if job.status != "done":
+        if job.error:
+            st.error(f"An unexpected error occurred during analysis: {job.error}")
+        elif job.status == "cancelled":
+            st.info("This analysis was cancelled.")
+        return
+    result = job.result
+    if not result["competitors"]:
+        st.warning("No competitors found or discovery failed.")
+        return
+    if result.get("prompt_size"):
+        st.caption(result["prompt_size"])
+
+    # --- Display Results ---
+    st.header("Competitor Analysis Results")
+    st.subheader("Competitor Comparison")
+    render_comparison_table(job_comparison_table(job))
+    render_change_report(result.get("changes"))
+
+    st.subheader("Analysis Insights")
+    analysis_data = result.get("analysis", {})
+    if result.get("analysis_error"):
+        pass # The reason is already shown with the job's messages
+    elif analysis_data and not all(v == ["N/A"] or v == [] for v in analysis_data.values()):
+        insight_slots = create_insight_slots()
+        for key in insight_slots:
+            render_insight(insight_slots, key, analysis_data.get(key, ["N/A"]))
+    else:
+        st.warning("Analysis could not be generated or returned empty. Check API keys and LLM configuration.")
+
+    st.subheader("Detailed Competitor Information")
+    for competitor in result["competitors"]:
+        with st.expander(f"{competitor.get('name', 'Unknown')} - {competitor.get('url', 'N/A')}"):
+            st.markdown(f"**Description:** {competitor.get('description', 'N/A')}")
+            st.markdown(f"**Summary:** {competitor.get('summary', 'N/A')}")
+            metadata = competitor.get("metadata", {})
+            if metadata:
+                st.markdown("**Technologies:** " + ", ".join(metadata.get("technologies", ["N/A"])))
+                st.markdown(f"**Team Size:** {metadata.get('team_size', 'N/A')}")
+                st.markdown(f"**Founded:** {metadata.get('founded', 'N/A')}")
+            else: st.write("No metadata available.")
+    render_performance_panel(result.get("spans") or [])
 
 # --- Streamlit UI (Updated Sidebar) ---
 def main():
+    # Pipeline diagnostics go to the server console, as print() output did
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     st.set_page_config(page_title="AI Competitor Intelligence Agent Team", page_icon="🔍", layout="wide")
     st.title("🔍 AI Competitor Intelligence Agent Team")
     st.markdown("Analyze your competitors and get actionable intelligence using AI agents.")
     
     # Initialize the agent team
-    agent_team = CompetitorIntelligenceTeam()
+    agent_team = CompetitorIntelligenceTeam(reporter=StreamlitReporter())
     selected_model_id = None # Initialize
     keys_provided = False # Initialize
 
@@ -349,12 +1447,21 @@ def main():
     with st.sidebar:
         st.header("API Configuration")
         
-        # LLM Provider Selection
+        # LLM Provider Selection (providers whose SDK isn't installed are left out)
+        provider_labels = [label for label in ("OpenAI", "Anthropic", "Google", "DeepSeek") if provider_available(label.lower())]
+        if not provider_labels:
+            st.error("No LLM provider SDK is installed. Install one of: "
+                     + ", ".join(sorted({package for _, package in PROVIDER_SDKS.values()})))
+            return
         llm_provider = st.selectbox(
             "Choose LLM Provider:",
-            ("OpenAI", "Anthropic", "Google", "DeepSeek"), 
+            provider_labels,
             key="llm_provider", index=0
         ).lower() 
+        missing_sdks = [p for p in MODEL_OPTIONS if not provider_available(p)]
+        if missing_sdks:
+            st.caption("Unavailable (SDK not installed): " + ", ".join(
+                f"{p.capitalize()} (`pip install {PROVIDER_SDKS[p][1]}`)" for p in missing_sdks))
 
         # --- Conditional API Key and Model Inputs ---
         llm_api_key = ""
@@ -385,9 +1492,12 @@ def main():
              )
              # Extract the actual model ID from the selected display name
              selected_model_id = get_model_id(selected_model_display_name)
+             stream_analysis = st.checkbox("Stream analysis results", value=True, key="stream_analysis",
+                                           help="Show each analysis section as soon as the model has written it.")
         else:
              st.warning(f"No predefined models found for {llm_provider}. Analysis may fail.")
              selected_model_id = None # Ensure it's None if no options
+             stream_analysis = False
 
         # Other API Keys
         firecrawl_key = st.text_input("Firecrawl API Key", type="password", key="firecrawl_key")
@@ -400,24 +1510,122 @@ def main():
         else:
              st.warning("Please provide all required API keys and ensure a model is selected.")
 
+        with st.expander("Crawl Settings"):
+            crawl_concurrency = st.slider("Max concurrent crawls", min_value=1, max_value=32, value=DEFAULT_CRAWL_CONCURRENCY, key="crawl_concurrency")
+            crawl_rate = st.number_input("Requests/sec per host", min_value=0.1, max_value=20.0, value=DEFAULT_CRAWL_RATE_PER_HOST, step=0.5, key="crawl_rate")
+            crawl_timeout = st.number_input("Per-crawl timeout (s)", min_value=5.0, max_value=600.0, value=DEFAULT_CRAWL_TIMEOUT, step=5.0, key="crawl_timeout")
+            duplicate_threshold = st.slider("Near-duplicate similarity", min_value=0.5, max_value=1.0, value=DEFAULT_DUPLICATE_THRESHOLD,
+                                            step=0.05, key="duplicate_threshold",
+                                            help="Competitors whose crawled pages are at least this similar are merged before analysis.")
+
+        with st.expander("Analysis Settings"):
+            map_reduce_threshold = st.number_input("Map-reduce above N competitors", min_value=1, max_value=500,
+                                                   value=DEFAULT_MAP_REDUCE_THRESHOLD, step=1, key="map_reduce_threshold",
+                                                   help="Larger competitor sets are analyzed in parallel chunks and merged.")
+            max_prompt_tokens = st.number_input("Max prompt tokens", min_value=1024, max_value=1000000,
+                                                value=DEFAULT_MAX_PROMPT_TOKENS, step=1024, key="max_prompt_tokens",
+                                                help="Competitor data is compacted and truncated to fit this budget (or the model's context, if smaller).")
+            summary_mode = st.selectbox("Summarization", list(SUMMARY_MODES), format_func=SUMMARY_MODES.get,
+                                        key="summary_mode",
+                                        help="Summarize competitor websites locally (no LLM calls), or with the selected "
+                                             "model, several pages per request.")
+            incremental = st.checkbox("Incremental re-analysis", value=True, key="incremental_analysis",
+                                      help="Keep per-competitor snapshots and only re-summarize and re-analyze competitors "
+                                           "whose websites changed since the last run.")
+            snapshots = SnapshotStore() if incremental else None
+            if snapshots:
+                stats = snapshots.stats()
+                st.caption(f"{stats['companies']} competitor snapshots - {stats['fragments']} stored analyses")
+                if st.button("Clear snapshots", key="clear_snapshots"):
+                    snapshots.clear()
+                    st.success("Snapshots cleared.")
+
+        with st.expander("Provider Routing"):
+            backup_providers = st.multiselect(
+                "Backup providers", [p for p in MODEL_OPTIONS if p != llm_provider and provider_available(p)], key="backup_providers",
+                help="Slow requests are hedged with a backup provider; the first valid reply wins and the other is cancelled."
+            )
+            backup_llms = []
+            for backup in backup_providers:
+                backup_key = st.text_input(f"{backup.capitalize()} API Key", type="password", key=f"{backup}_backup_api_key")
+                backup_model = st.selectbox(f"{backup.capitalize()} backup model", list(MODEL_OPTIONS[backup].values()),
+                                            key=f"{backup}_backup_model")
+                if backup_key:
+                    backup_llms.append((backup, backup_key, get_model_id(backup_model)))
+            for (provider, model_id), route_stats in get_latency_tracker().snapshot().items():
+                if route_stats["p50"] is not None:
+                    st.caption(f"{provider}/{model_id}: p50 {route_stats['p50']:.1f}s, p95 {route_stats['p95']:.1f}s, "
+                               f"errors {route_stats['error_rate']:.0%} ({route_stats['samples']} samples)")
+            for service, state in get_resilience().breaker_states().items():
+                if state != "closed":
+                    st.caption(f"{service}: circuit {state} after repeated failures; requests fail fast until it recovers.")
+
+        with st.expander("Caching"):
+            use_crawl_cache = st.checkbox("Use crawl cache", value=True, key="use_crawl_cache",
+                                          help="Reuse crawled pages and summaries from earlier analyses.")
+            refresh_crawl_cache = st.checkbox("Refresh cached crawls", value=False, key="refresh_crawl_cache",
+                                              help="Ignore cached entries for this run and re-crawl every competitor.")
+            cache_ttl_hours = st.number_input("Cache TTL (hours)", min_value=1.0, max_value=24.0 * 30,
+                                              value=DEFAULT_CRAWL_CACHE_TTL / 3600, step=1.0, key="crawl_cache_ttl")
+            crawl_cache = CrawlCache(ttl_seconds=cache_ttl_hours * 3600) if use_crawl_cache else None
+            if crawl_cache:
+                stats = crawl_cache.stats()
+                st.caption(f"{stats['entries']} entries ({stats['bytes'] / 1024:.0f} KB) - "
+                           f"{stats['hits']} hits / {stats['misses']} misses")
+                if st.button("Clear crawl cache", key="clear_crawl_cache"):
+                    crawl_cache.clear()
+                    st.success("Crawl cache cleared.")
+            remember_domains = st.checkbox("Remember competitor domains", value=True, key="remember_domains",
+                                           help="Keep an index of domains seen across runs, so domains known to redirect "
+                                                "to another are merged before crawling.")
+            domain_index = DomainIndex() if remember_domains else None
+            if domain_index:
+                stats = domain_index.stats()
+                st.caption(f"{stats['domains']} domains seen - {stats['aliases']} known redirects")
+                if st.button("Clear domain index", key="clear_domain_index"):
+                    domain_index.clear()
+                    st.success("Domain index cleared.")
+            use_response_cache = st.checkbox("Cache LLM analyses", value=True, key="use_response_cache",
+                                             help="Reuse an earlier analysis when the prompt, provider and model are identical.")
+            persist_response_cache = st.checkbox("Persist LLM cache to disk", value=False, key="persist_response_cache",
+                                                 disabled=not use_response_cache)
+            response_cache = get_response_cache(persist=persist_response_cache) if use_response_cache else None
+            if response_cache:
+                stats = response_cache.memory.stats()
+                st.caption(f"LLM cache: {stats['entries']} entries - {stats['hits']} hits / {stats['misses']} misses")
+                if st.button("Clear LLM cache", key="clear_response_cache"):
+                    response_cache.clear()
+                    st.success("LLM cache cleared.")
+
         st.markdown("---")
         st.markdown("### About")
         st.markdown("Provides competitor analysis using AI.")
         st.markdown("**Note:** Model tiers (e.g., Balanced, Fast) are relative indicators. Check provider websites for exact pricing.")
 
     # --- End Sidebar ---
-    
+
     # Configure agents only if all keys and model are present
+    agent_config = dict(
+        llm_provider=llm_provider,
+        llm_api_key=llm_api_key,
+        llm_model_id=selected_model_id, # Use the extracted ID
+        firecrawl_key=firecrawl_key,
+        exa_key=exa_key,
+        crawl_cache=crawl_cache,
+        refresh_cache=refresh_crawl_cache,
+        response_cache=response_cache,
+        map_reduce_threshold=int(map_reduce_threshold),
+        max_prompt_tokens=int(max_prompt_tokens),
+        backup_llms=backup_llms,
+        domain_index=domain_index,
+        duplicate_threshold=duplicate_threshold,
+        snapshots=snapshots,
+        summary_mode=summary_mode
+    )
     if keys_provided:
         try:
-            # Pass the extracted model_id
-            agent_team.configure_agents(
-                llm_provider=llm_provider, 
-                llm_api_key=llm_api_key, 
-                llm_model_id=selected_model_id, # Use the extracted ID
-                firecrawl_key=firecrawl_key, 
-                exa_key=exa_key
-            )
+            # Validates the settings here; each analysis job configures a team of its own with them
+            agent_team.configure_agents(**agent_config)
         except ValueError as e:
              st.sidebar.error(f"Configuration Error: {e}") 
              keys_provided = False 
@@ -433,66 +1641,36 @@ def main():
         input_text = st.text_area("Describe your company:", placeholder="We are a tech company...", height=150, key="input_desc")
         is_url = False
     
-    # Analysis button (disabled if keys not provided)
+    # Analyses run as background jobs, so reruns triggered by other widgets don't interrupt them
+    runner = get_job_runner()
+    user = session_user()
     if st.button("Analyze Competitors", type="primary", key="analyze_button", disabled=not keys_provided):
         if not input_text:
             st.error("Please provide either a URL or description.")
         else:
-            st.empty() # Clear previous results
-            with st.spinner(f"Analyzing competitors using {agent_team.analysis_agent.provider.capitalize()} ({agent_team.analysis_agent.model_id})... This may take a few minutes."):
-                try:
-                    competitors = agent_team.discover_competitors(input_text, is_url)
-                    if not competitors:
-                         st.warning("No competitors found or discovery failed.")
-                    else:
-                         report = agent_team.generate_intelligence_report(competitors)
-                         
-                         # --- Display Results ---
-                         st.header("Competitor Analysis Results")
-                         st.subheader("Competitor Comparison")
-                         if not report["comparison_table"].empty: st.dataframe(report["comparison_table"], use_container_width=True)
-                         else: st.write("No data for comparison table.")
-
-                         st.subheader("Analysis Insights")
-                         analysis_data = report.get("analysis", {})
-                         if analysis_data and not all(v == ["N/A"] or v == [] for v in analysis_data.values()): 
-                             col1, col2 = st.columns(2)
-                             with col1:
-                                 st.markdown("#### Strengths & Weaknesses")
-                                 st.write("**Strengths:**"); [st.markdown(f"- {item}") for item in analysis_data.get("strengths", ["N/A"])]
-                                 st.write("**Weaknesses:**"); [st.markdown(f"- {item}") for item in analysis_data.get("weaknesses", ["N/A"])]
-                             with col2:
-                                 st.markdown("#### Opportunities & Market Gaps")
-                                 st.write("**Opportunities:**"); [st.markdown(f"- {item}") for item in analysis_data.get("opportunities", ["N/A"])]
-                                 st.write("**Market Gaps:**"); [st.markdown(f"- {item}") for item in analysis_data.get("market_gaps", ["N/A"])]
-
-                             st.markdown("#### Pricing & Growth")
-                             st.write("**Suggested Pricing Strategies:**"); [st.markdown(f"- {item}") for item in analysis_data.get("pricing_strategies", ["N/A"])]
-                             st.write("**Potential Growth Opportunities:**"); [st.markdown(f"- {item}") for item in analysis_data.get("growth_opportunities", ["N/A"])]
-
-                             st.subheader("Strategic Recommendations")
-                             recommendations = analysis_data.get("recommendations", [])
-                             if recommendations and recommendations != ["N/A"]: [st.markdown(f"**{i}.** {rec}") for i, rec in enumerate(recommendations, 1)]
-                             else: st.write("No specific recommendations generated.")
-                         else:
-                              st.warning("Analysis could not be generated or returned empty. Check API keys and LLM configuration.")
-
-                         st.subheader("Detailed Competitor Information")
-                         if report["competitors"]:
-                             for competitor in report["competitors"]:
-                                 with st.expander(f"{competitor.get('name', 'Unknown')} - {competitor.get('url', 'N/A')}"):
-                                     st.markdown(f"**Description:** {competitor.get('description', 'N/A')}")
-                                     st.markdown(f"**Summary:** {competitor.get('summary', 'N/A')}")
-                                     metadata = competitor.get("metadata", {})
-                                     if metadata:
-                                         st.markdown("**Technologies:** " + ", ".join(metadata.get("technologies", ["N/A"])))
-                                         st.markdown(f"**Team Size:** {metadata.get('team_size', 'N/A')}")
-                                         st.markdown(f"**Founded:** {metadata.get('founded', 'N/A')}")
-                                     else: st.write("No metadata available.")
-                         else: st.write("No detailed competitor information available.")
-                except Exception as e:
-                     st.error(f"An unexpected error occurred during analysis: {e}")
-                     print(f"Analysis Error: {e}") 
+            crawler = (crawl_concurrency, crawl_rate, crawl_timeout)
+            label = f"{' '.join(input_text.split())[:60]} - {llm_provider.capitalize()} ({selected_model_id})"
+            try:
+                job = runner.submit(user, label, lambda job: run_analysis_job(job, input_text, is_url, crawler,
+                                                                              agent_config, stream_analysis))
+                select_job(job.id)
+            except JobLimitError as e:
+                st.warning(str(e))
+
+    active = runner.active(user)
+    ui_fragment(render_job_panel, run_every=JOB_POLL_SECONDS if active else None)(runner, user)
+
+    selected = st.session_state.get("selected_job") or st.query_params.get("job")
+    recent = runner.store.recent(user, RECENT_JOBS)
+    if len(recent) > 1:
+        if selected in {job.id for job in recent}:
+            st.session_state["job_select"] = selected
+        labels = {job.id: describe_job(job) for job in recent}
+        st.selectbox("Finished analyses", list(labels), format_func=labels.get, key="job_select",
+                     on_change=lambda: select_job(st.session_state["job_select"]))
+    job = runner.get(selected, user) if selected else None # Only the user's own jobs, whatever the URL says
+    if job and not job.active:
+        render_job_result(job)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
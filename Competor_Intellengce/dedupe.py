@@ -0,0 +1,278 @@
+"""
+De-duplication of discovered competitors.
+
+Competitor search can return one company under several URLs: www and apex hosts, locale paths
+such as /en-us/, tracking parameters, or a domain that redirects to another. Deduplicator merges
+them in two passes:
+
+* before crawling, by canonical URL (with host aliases learned in earlier runs applied), so
+  duplicates never use crawl quota;
+* after crawling, by near-duplicate page content, using MinHash signatures over word shingles
+  and LSH banding so that only likely pairs are compared.
+
+DomainIndex persists the domains seen across runs and which of them redirect to another, so later
+runs merge those before crawling. Near-duplicate content is only evidence for the run that saw it
+(two parked pages or sites built on one template look alike too), so content merges are never
+persisted.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+if TYPE_CHECKING:
+    import numpy as np
+
+from cache import DEFAULT_CACHE_DIR, DEFAULT_PORTS, TRACKING_PARAMS
+
+HOST_PREFIXES = ("www.", "www2.", "m.")   # Host prefixes serving the same site as the apex domain
+# Language codes recognised as locale path segments such as /en, /en-us or /pt_BR
+LOCALE_LANGUAGES = frozenset(
+    "ar cs da de el en es fi fr he hi hu id it ja ko nb nl no pl pt ro ru sv th tr uk vi zh".split()
+)
+LOCALE_SEGMENT = re.compile(r"^([a-z]{2})(?:[-_][a-z]{2,4})?$")
+INDEX_PAGES = ("index.html", "index.htm", "index.php", "default.aspx")
+
+SHINGLE_WORDS = 5              # Words per shingle
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16                 # 16 bands of 4 rows: pairs above ~0.5 similarity are compared
+MIN_SHINGLES = 50              # Pages shorter than this (placeholders, errors) are never called duplicates
+DEFAULT_DUPLICATE_THRESHOLD = 0.8  # Estimated Jaccard similarity of two pages' shingles to count as duplicates
+MAX_ALIAS_HOPS = 5
+_SHINGLE_BASE = 1000003
+_PRIME = 4294967311            # First prime above 2**32; a*x + b stays below 2**64 for 32-bit a, b and x
+
+
+def site_host(url: str) -> str:
+    """Lower-cased host without www-style prefixes, e.g. "https://WWW.Acme.com/en" -> "acme.com"."""
+    host = (urlsplit(url.strip() if "://" in url else "https://" + url.strip()).hostname or "").lower().rstrip(".")
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            return host[len(prefix):]
+    return host
+
+
+def canonical_url(url: str, aliases: Optional[Dict[str, str]] = None) -> str:
+    """
+    Canonical form of a competitor URL: https, no www prefix, default port, locale path segment,
+    index page, trailing slash, fragment or tracking parameters. `aliases` maps hosts to the host they
+    are known to stand for.
+    """
+    parts = urlsplit(url.strip() if "://" in url else "https://" + url.strip())
+    host = site_host(url)
+    host = (aliases or {}).get(host, host)
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    segments = [s for s in parts.path.split("/") if s]
+    if segments and _is_locale(segments[0]):
+        segments = segments[1:]
+    if segments and segments[-1].lower() in INDEX_PAGES:
+        segments = segments[:-1]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit(("https", host, "/" + "/".join(segments), urlencode(query), ""))
+
+
+def _is_locale(segment: str) -> bool:
+    match = LOCALE_SEGMENT.match(segment.lower())
+    return bool(match) and match.group(1) in LOCALE_LANGUAGES
+
+
+# --- Near-duplicate content ---
+@lru_cache(maxsize=None)
+def _permutations() -> Tuple["np.ndarray", "np.ndarray"]:
+    """The (a, b) coefficients of the MinHash permutations, drawn once numpy is first needed."""
+    import numpy as np # Deferred: URL canonicalization (used by every import of the app) needs no numpy
+    rng = np.random.default_rng(20240607) # Fixed seed: signatures must be comparable across processes
+    return (rng.integers(1, 2**32, size=(MINHASH_PERMUTATIONS, 1), dtype=np.uint64),
+            rng.integers(0, 2**32, size=(MINHASH_PERMUTATIONS, 1), dtype=np.uint64))
+
+
+def minhash(text: str) -> Optional["np.ndarray"]:
+    """MinHash signature of the text's word shingles, or None when the text is too short to compare."""
+    words = re.findall(r"\w+", (text or "").lower())
+    count = len(words) - SHINGLE_WORDS + 1
+    if count < MIN_SHINGLES:
+        return None
+    import numpy as np
+    perm_a, perm_b = _permutations()
+    # Each word is hashed once; shingle hashes are rolled from them with array arithmetic (wrapping mod 2**64)
+    word_hashes = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        shingles = shingles * np.uint64(_SHINGLE_BASE) + word_hashes[offset:offset + count]
+    shingles = np.unique((shingles ^ (shingles >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+    return ((perm_a * shingles + perm_b) % _PRIME).min(axis=1)
+
+
+def similarity(a: "np.ndarray", b: "np.ndarray") -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float((a == b).mean())
+
+
+def near_duplicate_groups(signatures: Sequence[Optional["np.ndarray"]],
+                          threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> Dict[int, List[int]]:
+    """
+    Maps the index of each page that has near-duplicates to the later indices duplicating it.
+    Only pages sharing an LSH band are compared, so the cost grows with the number of pages, not pairs.
+    """
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    buckets: Dict[bytes, List[int]] = {}
+    owner: Dict[int, int] = {} # Duplicate index -> index of the page it duplicates
+    groups: Dict[int, List[int]] = {}
+    for index, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        keys = [bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes() for band in range(LSH_BANDS)]
+        candidates = sorted({other for key in keys for other in buckets.get(key, ())})
+        match = next((other for other in candidates if similarity(signature, signatures[other]) >= threshold), None)
+        if match is not None:
+            match = owner.get(match, match)
+            owner[index] = match
+            groups.setdefault(match, []).append(index)
+            continue # Duplicates aren't indexed, so every group keeps a single representative
+        for key in keys:
+            buckets.setdefault(key, []).append(index)
+    return groups
+
+
+# --- Cross-run domain index ---
+class DomainIndex:
+    """SQLite index of competitor domains seen across runs and the domain each redirects to"""
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "domains.sqlite")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS domains ("
+                " domain TEXT PRIMARY KEY, canonical TEXT, first_seen REAL NOT NULL, last_seen REAL NOT NULL,"
+                " times_seen INTEGER NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def aliases(self, domains: Iterable[str]) -> Dict[str, str]:
+        """Maps each of `domains` known to be an alias to the domain it stands for (following chains)."""
+        resolved: Dict[str, str] = {}
+        with self._lock, self._connect() as conn:
+            for domain in set(domains):
+                target, hops = domain, 0
+                while hops < MAX_ALIAS_HOPS:
+                    row = conn.execute("SELECT canonical FROM domains WHERE domain = ?", (target,)).fetchone()
+                    if not row or not row[0] or row[0] == target:
+                        break
+                    target, hops = row[0], hops + 1
+                if target != domain:
+                    resolved[domain] = target
+        return resolved
+
+    def seen(self, domains: Iterable[str]) -> List[str]:
+        """The given domains that earlier runs have already recorded."""
+        domains = list(set(domains))
+        with self._lock, self._connect() as conn:
+            return [d for d in domains if conn.execute("SELECT 1 FROM domains WHERE domain = ?", (d,)).fetchone()]
+
+    def record(self, domains: Iterable[str], aliases: Optional[Dict[str, str]] = None) -> None:
+        """Records domains seen in this run, and `aliases` (domain -> domain it redirected to) learned during it."""
+        now = time.time()
+        known = self.aliases((aliases or {}).values())
+        # An alias pointing back at its own alias would form a cycle
+        aliases = {alias: target for alias, target in (aliases or {}).items() if alias != target and known.get(target) != alias}
+        with self._lock, self._connect() as conn:
+            for domain in set(domains) | set(aliases):
+                conn.execute(
+                    "INSERT INTO domains (domain, canonical, first_seen, last_seen, times_seen) VALUES (?, ?, ?, ?, 1)"
+                    " ON CONFLICT(domain) DO UPDATE SET last_seen = excluded.last_seen, times_seen = times_seen + 1,"
+                    " canonical = COALESCE(excluded.canonical, canonical)",
+                    (domain, aliases.get(domain), now, now),
+                )
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM domains")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock, self._connect() as conn:
+            domains, aliases = conn.execute("SELECT COUNT(*), COUNT(canonical) FROM domains").fetchone()
+        return {"domains": domains, "aliases": aliases}
+
+
+# --- Merging ---
+def _merge_into(kept: Dict[str, Any], duplicate: Dict[str, Any]) -> None:
+    kept.setdefault("aliases", []).append(duplicate.get("url"))
+    kept["aliases"].extend(duplicate.get("aliases", []))
+    for field in ("description", "name"):
+        if not kept.get(field) and duplicate.get(field):
+            kept[field] = duplicate[field]
+
+
+class Deduplicator:
+    """Merges competitors that are the same company, by canonical URL before crawling and by content after"""
+    def __init__(self, index: Optional[DomainIndex] = None, threshold: float = DEFAULT_DUPLICATE_THRESHOLD):
+        self.index = index
+        self.threshold = threshold
+
+    def merge_urls(self, competitors: List[Dict[str, Any]], exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Merges competitors whose URLs are the same site, keeping the first (best ranked) one with the
+        others' URLs under "aliases". A competitor matching `exclude` (the user's own site) is dropped.
+        """
+        hosts = [site_host(c["url"]) for c in competitors if c.get("url")]
+        aliases = self.index.aliases(hosts + ([site_host(exclude)] if exclude else [])) if self.index else {}
+        excluded = canonical_url(exclude, aliases) if exclude else None
+        kept: Dict[str, Dict[str, Any]] = {}
+        merged: List[Dict[str, Any]] = []
+        for competitor in competitors:
+            if not competitor.get("url"):
+                merged.append(competitor)
+                continue
+            key = canonical_url(competitor["url"], aliases)
+            if key == excluded:
+                continue
+            if key in kept:
+                _merge_into(kept[key], competitor)
+            else:
+                kept[key] = competitor
+                merged.append(competitor)
+        return merged
+
+    def merge_content(self, competitors: List[Dict[str, Any]],
+                      signatures: Dict[str, Optional["np.ndarray"]]) -> List[Dict[str, Any]]:
+        """
+        Merges competitors whose crawled pages (MinHash `signatures` by URL) are near-duplicates, and records
+        every crawled domain, plus the domains that redirected to another, in the domain index. Content merges
+        apply to this run only: a false positive must not drop a competitor before crawling in later runs.
+        """
+        crawled = [c for c in competitors if c.get("url") in signatures]
+        groups = near_duplicate_groups([signatures[c["url"]] for c in crawled], self.threshold)
+        dropped = set()
+        for index, duplicates in groups.items():
+            for duplicate in duplicates:
+                _merge_into(crawled[index], crawled[duplicate])
+                dropped.add(id(crawled[duplicate]))
+        merged = [c for c in competitors if id(c) not in dropped]
+        if self.index:
+            aliases = {}
+            for competitor in crawled: # A page that redirected to another domain makes that domain the canonical one
+                final = (competitor.get("metadata") or {}).get("url")
+                if final and site_host(final) != site_host(competitor["url"]):
+                    aliases[site_host(competitor["url"])] = site_host(final)
+            self.index.record([site_host(c["url"]) for c in merged if c.get("url")], aliases)
+        return merged
@@ -0,0 +1,426 @@
+"""
+Local stand-ins for Firecrawl, Exa and the LLM providers, for benchmarks and offline runs.
+
+One threaded HTTP server speaks each service's wire format:
+  * Firecrawl  POST /v1/scrape
+  * Exa        POST /search
+  * OpenAI     POST /v1/chat/completions (blocking or SSE streaming, with include_usage)
+  * DeepSeek   POST /deepseek/chat/completions (OpenAI-compatible, mounted under /deepseek to tell it apart)
+  * Anthropic  POST /v1/messages (blocking or SSE event streaming)
+  * Gemini     POST /v1beta/models/<model>:generateContent and :streamGenerateContent
+Responses have realistic sizes (multi-KB page markdown, full JSON analysis reports) and each service
+draws its latency from a log-normal distribution with a configurable median and p95. A configurable
+share of requests fails with 429 (with Retry-After) or 503.
+
+Run standalone to keep server work out of the process being measured:
+
+    python fake_services.py --port 8787 --latency llm=2000:6000 --error-rate firecrawl=0.02
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SERVICES = ("firecrawl", "exa", "openai", "anthropic", "google", "deepseek")
+LLM_SERVICES = ("openai", "anthropic", "google", "deepseek")
+
+# (median ms, p95 ms) per service, roughly what the hosted APIs show
+DEFAULT_LATENCY_MS: Dict[str, Tuple[float, float]] = {
+    "firecrawl": (600.0, 2500.0), "exa": (400.0, 1200.0),
+    "openai": (4000.0, 12000.0), "anthropic": (4500.0, 14000.0), "google": (3000.0, 9000.0), "deepseek": (5000.0, 15000.0),
+}
+DEFAULT_PAGE_KB = 30      # Markdown size of a crawled page
+PAGE_SECTIONS = 512       # Sections generated up front; each site's page is a different mix of them
+LOCALE_PATHS = ("/en/", "/en-us/", "/de/", "/fr/")
+STREAM_CHUNK_CHARS = 40
+FIRST_TOKEN_SHARE = 0.3   # Share of a streamed reply's latency spent before the first chunk
+
+REPORT_KEYS = ("strengths", "weaknesses", "opportunities", "market_gaps", "pricing_strategies",
+               "growth_opportunities", "recommendations")
+TECHNOLOGIES = ("React", "Vue", "Angular", "Next.js", "Django", "Rails", "Node.js", "Go", "Java", "PostgreSQL",
+                "MySQL", "MongoDB", "Redis", "Kafka", "Snowflake", "AWS", "GCP", "Azure", "Kubernetes", "Terraform")
+TEAM_SIZES = ("1-10", "11-50", "51-200", "201-500", "501-1000", "1000+")
+WORDS = ("platform", "customers", "pricing", "enterprise", "analytics", "integration", "workflow", "security",
+         "teams", "automation", "cloud", "data", "insights", "mobile", "support", "scale", "growth", "market",
+         "partners", "subscription", "onboarding", "compliance", "performance", "reporting", "collaboration",
+         "revenue", "retention", "product", "features", "roadmap", "self-serve", "API", "dashboard", "global",
+         "mid-market", "startups", "pipeline", "forecasting", "ecosystem", "marketplace", "trial", "annual")
+
+
+class ServiceProfile:
+    """Latency and error distribution of one fake service"""
+    def __init__(self, median_ms: float, p95_ms: Optional[float] = None, error_rate: float = 0.0):
+        self.median = median_ms / 1000.0
+        p95 = (p95_ms or median_ms) / 1000.0
+        self.sigma = math.log(p95 / self.median) / 1.645 if p95 > self.median > 0 else 0.0
+        self.error_rate = error_rate
+
+    def latency(self, rng: random.Random) -> float:
+        return self.median * math.exp(self.sigma * rng.gauss(0.0, 1.0)) if self.median > 0 else 0.0
+
+    def fails(self, rng: random.Random) -> bool:
+        return rng.random() < self.error_rate
+
+
+def build_profiles(latency_specs: List[str] = (), error_specs: List[str] = (), time_scale: float = 1.0) -> Dict[str, ServiceProfile]:
+    """
+    Builds profiles from `NAME=MEDIAN_MS[:P95_MS]` latency and `NAME=RATE` error specs. NAME is a
+    service, or `llm` for every LLM provider. Latencies are multiplied by `time_scale`.
+    """
+    def targets(name: str) -> Tuple[str, ...]:
+        if name == "llm":
+            return LLM_SERVICES
+        if name not in SERVICES:
+            raise ValueError(f"unknown service {name!r}; expected one of {', '.join(SERVICES)} or llm")
+        return (name,)
+
+    latencies = dict(DEFAULT_LATENCY_MS)
+    errors = {service: 0.0 for service in SERVICES}
+    for spec in latency_specs:
+        name, _, value = spec.partition("=")
+        median, _, p95 = value.partition(":")
+        for service in targets(name):
+            latencies[service] = (float(median), float(p95 or median))
+    for spec in error_specs:
+        name, _, value = spec.partition("=")
+        for service in targets(name):
+            errors[service] = float(value)
+    return {
+        service: ServiceProfile(latencies[service][0] * time_scale, latencies[service][1] * time_scale, errors[service])
+        for service in SERVICES
+    }
+
+
+def _text(rng: random.Random, chars: int) -> str:
+    sentences, size = [], 0
+    while size < chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))).capitalize() + "."
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def _section(rng: random.Random) -> str:
+    return f"## {' '.join(rng.choice(WORDS) for _ in range(3)).title()}\n\n{_text(rng, 700)}\n"
+
+
+def _report(rng: random.Random, body: Dict[str, Any]) -> str:
+    """A report with the sections required by the request's structured-output schema (all of them without one)"""
+    schema = (((body.get("response_format") or {}).get("json_schema") or {}).get("schema")
+              or next((tool.get("input_schema") for tool in body.get("tools") or []), None)
+              or (body.get("generationConfig") or {}).get("responseSchema") or {})
+    return json.dumps({key: [_text(rng, 80) for _ in range(5)] for key in schema.get("required") or REPORT_KEYS})
+
+
+def _chunks(text: str) -> List[str]:
+    return [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real APIs
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _service(self) -> Optional[str]:
+        path = self.path.split("?", 1)[0]
+        if path == "/v1/scrape":
+            return "firecrawl"
+        if path == "/search":
+            return "exa"
+        if path == "/v1/chat/completions":
+            return "openai"
+        if path in ("/deepseek/chat/completions", "/deepseek/v1/chat/completions"): # DeepSeek serves both
+            return "deepseek"
+        if path == "/v1/messages":
+            return "anthropic"
+        if ":generateContent" in path or ":streamGenerateContent" in path:
+            return "google"
+        return None
+
+    def do_POST(self) -> None:
+        service = self._service()
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if service is None:
+            return self._send_json(404, {"error": {"message": f"no route for {self.path}"}})
+        services = self.server.services
+        rng = random.Random()
+        profile = services.profiles[service]
+        latency = profile.latency(rng)
+        services.record(service, failed=False)
+        if profile.fails(rng):
+            time.sleep(latency * rng.random()) # Errors tend to come back faster than full replies
+            services.record(service, failed=True)
+            status = rng.choice((429, 503))
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            return self._send_json(status, {"error": {"message": "simulated failure", "type": "rate_limit_error" if status == 429 else "overloaded_error"}}, headers)
+        getattr(self, f"_{service}")(body, rng, latency)
+
+    # --- Transport ---
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, events: Iterator[str], latency: float, count: int, content_type: str = "text/event-stream") -> None:
+        """Sends events with chunked encoding, spreading `latency` over time-to-first-chunk and the rest."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(latency * FIRST_TOKEN_SHARE)
+        gap = latency * (1 - FIRST_TOKEN_SHARE) / max(1, count)
+        for event in events:
+            data = event.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(gap)
+        self.wfile.write(b"0\r\n\r\n")
+
+    # --- Services ---
+    def _firecrawl(self, body: Dict[str, Any], rng: random.Random, latency: float) -> None:
+        time.sleep(latency)
+        url = body.get("url", "")
+        name = url.split("://")[-1].split("/")[0]
+        self._send_json(200, {"success": True, "data": {
+            "markdown": self.server.services.page_for(url),
+            "metadata": {"title": f"{name} | {_text(rng, 30)}", "description": _text(rng, 160), "language": "en",
+                         "keywords": ", ".join(rng.sample(WORDS, 6)), "sourceURL": url, "statusCode": 200,
+                         # Firecrawl doesn't detect these; they stand in for enrichment the comparison table reads
+                         "technologies": rng.sample(TECHNOLOGIES, rng.randint(2, 5)), "team_size": rng.choice(TEAM_SIZES),
+                         "founded": str(rng.randint(1995, 2023))},
+        }})
+
+    def _exa(self, body: Dict[str, Any], rng: random.Random, latency: float) -> None:
+        time.sleep(latency)
+        results = []
+        for i in range(int(body.get("numResults", 10))):
+            url = f"https://competitor-{i:04d}.example.com"
+            if i and rng.random() < self.server.services.duplicate_rate: # The same company again, under another URL
+                url = rng.choice(results)["url"].replace("https://", "https://www.") + rng.choice(LOCALE_PATHS)
+            results.append({"id": url, "url": url, "title": f"Competitor {i:04d}", "score": round(1 - i / 1000, 4),
+                            "publishedDate": None, "author": None, "text": _text(rng, 800)})
+        self._send_json(200, {"requestId": uuid.uuid4().hex, "results": results})
+
+    def _usage(self, body: Dict[str, Any], reply: str) -> Tuple[int, int]:
+        return len(json.dumps(body)) // 4, len(reply) // 4
+
+    def _openai(self, body: Dict[str, Any], rng: random.Random, latency: float) -> None:
+        reply = _report(rng, body)
+        prompt_tokens, completion_tokens = self._usage(body, reply)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body.get("model")}
+        if not body.get("stream"):
+            time.sleep(latency)
+            return self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[
+                {"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}]))
+
+        def events() -> Iterator[str]:
+            for piece in _chunks(reply):
+                yield "data: " + json.dumps(dict(base, object="chat.completion.chunk", choices=[
+                    {"index": 0, "delta": {"content": piece}, "finish_reason": None}])) + "\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield "data: " + json.dumps(dict(base, object="chat.completion.chunk", choices=[], usage=usage)) + "\n\n"
+            yield "data: [DONE]\n\n"
+        self._send_stream(events(), latency, len(reply) // STREAM_CHUNK_CHARS + 1)
+
+    _deepseek = _openai
+
+    def _anthropic(self, body: Dict[str, Any], rng: random.Random, latency: float) -> None:
+        reply = _report(rng, body)
+        input_tokens, output_tokens = self._usage(body, reply)
+        tool = next(iter(body.get("tools") or []), None) # Forced tool calls return the report as the tool input
+        stop_reason = "tool_use" if tool else "end_turn"
+        message = {"id": f"msg_{uuid.uuid4().hex[:12]}", "type": "message", "role": "assistant", "model": body.get("model"),
+                   "stop_reason": stop_reason, "stop_sequence": None}
+        block = ({"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:12]}", "name": tool["name"]} if tool
+                 else {"type": "text"})
+        if not body.get("stream"):
+            time.sleep(latency)
+            content = dict(block, input=json.loads(reply)) if tool else dict(block, text=reply)
+            return self._send_json(200, dict(message, content=[content],
+                                             usage={"input_tokens": input_tokens, "output_tokens": output_tokens}))
+
+        def event(name: str, data: Dict[str, Any]) -> str:
+            return f"event: {name}\ndata: {json.dumps(dict(data, type=name))}\n\n"
+
+        def events() -> Iterator[str]:
+            yield event("message_start", {"message": dict(message, content=[], stop_reason=None,
+                                                          usage={"input_tokens": input_tokens, "output_tokens": 1})})
+            yield event("content_block_start", {"index": 0, "content_block": dict(block, input={}) if tool else dict(block, text="")})
+            for piece in _chunks(reply):
+                delta = {"type": "input_json_delta", "partial_json": piece} if tool else {"type": "text_delta", "text": piece}
+                yield event("content_block_delta", {"index": 0, "delta": delta})
+            yield event("content_block_stop", {"index": 0})
+            yield event("message_delta", {"delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                                          "usage": {"output_tokens": output_tokens}})
+            yield event("message_stop", {})
+        self._send_stream(events(), latency, len(reply) // STREAM_CHUNK_CHARS + 1)
+
+    def _google(self, body: Dict[str, Any], rng: random.Random, latency: float) -> None:
+        reply = _report(rng, body)
+        prompt_tokens, completion_tokens = self._usage(body, reply)
+
+        def candidate(text: str, final: bool) -> Dict[str, Any]:
+            response = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+            if final:
+                response["candidates"][0]["finishReason"] = "STOP"
+                response["usageMetadata"] = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens,
+                                             "totalTokenCount": prompt_tokens + completion_tokens}
+            return response
+
+        if ":streamGenerateContent" not in self.path:
+            time.sleep(latency)
+            return self._send_json(200, candidate(reply, final=True))
+        pieces = _chunks(reply)
+        responses = [candidate(piece, final=i == len(pieces) - 1) for i, piece in enumerate(pieces)]
+        if "alt=sse" in self.path:
+            events = ("data: " + json.dumps(r) + "\r\n\r\n" for r in responses)
+            return self._send_stream(events, latency, len(responses))
+        # Without alt=sse the REST API streams a single JSON array
+        events = (("[" if i == 0 else ",") + json.dumps(r) + ("]" if i == len(responses) - 1 else "")
+                  for i, r in enumerate(responses))
+        self._send_stream(events, latency, len(responses), content_type="application/json")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256 # Bursts of concurrent crawls shouldn't be refused
+    services: "FakeServices"
+
+
+class FakeServices:
+    """Runs the stand-in services on a background thread; use as a context manager"""
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, profiles: Optional[Dict[str, ServiceProfile]] = None,
+                 page_kb: int = DEFAULT_PAGE_KB, seed: int = 0, duplicate_rate: float = 0.0):
+        self.profiles = profiles or build_profiles()
+        self.page_kb = page_kb
+        self.duplicate_rate = duplicate_rate
+        rng = random.Random(seed)
+        self._sections = [_section(rng) for _ in range(PAGE_SECTIONS)]
+        self._revisions: Dict[str, int] = {} # Site -> number of times its page changed (see revise)
+        self._rng = random.Random(seed)
+        self.requests = {service: 0 for service in SERVICES}
+        self.failures = {service: 0 for service in SERVICES}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.services = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def _site(url: str) -> str:
+        host = url.split("://")[-1].split("/")[0].lower()
+        return host[4:] if host.startswith("www.") else host
+
+    def page_for(self, url: str) -> str:
+        """The page of a site: the same for every URL variant of a host, distinct between hosts."""
+        site = self._site(url)
+        with self._lock:
+            revision = self._revisions.setdefault(site, 0)
+        rng = random.Random(f"{site}#{revision}" if revision else site)
+        sections, size = [], 0
+        while size < self.page_kb * 1024:
+            sections.append(rng.choice(self._sections))
+            size += len(sections[-1])
+        return "\n".join(sections)
+
+    def revise(self, share: float) -> int:
+        """Changes the page of `share` of the sites crawled so far, as if they had been updated. Returns how many."""
+        with self._lock:
+            sites = sorted(self._revisions)
+            changed = self._rng.sample(sites, round(share * len(sites)))
+            for site in changed:
+                self._revisions[site] += 1
+        return len(changed)
+
+    def record(self, service: str, failed: bool) -> None:
+        with self._lock:
+            if failed:
+                self.failures[service] += 1
+            else:
+                self.requests[service] += 1
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point the app's agents at these services."""
+        return env_for(self.url)
+
+    def start(self) -> "FakeServices":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serves on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeServices":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def env_for(url: str) -> Dict[str, str]:
+    """Environment variables that point the app's agents at stand-in services running at `url`."""
+    url = url.rstrip("/")
+    return {
+        "FIRECRAWL_API_URL": url, "EXA_API_URL": url,
+        "OPENAI_BASE_URL": url + "/v1", "ANTHROPIC_BASE_URL": url, "GOOGLE_BASE_URL": url, "DEEPSEEK_BASE_URL": url + "/deepseek",
+    }
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the --latency/--error-rate/--time-scale/--page-kb options shared with benchmark.py."""
+    parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=MEDIAN_MS[:P95_MS]",
+                        help="Latency distribution per service, or 'llm' for all providers (repeatable)")
+    parser.add_argument("--error-rate", action="append", default=[], metavar="SERVICE=RATE",
+                        help="Share of requests failing with 429/503 (repeatable)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every latency, e.g. 0.05 for quick runs")
+    parser.add_argument("--page-kb", type=int, default=DEFAULT_PAGE_KB, help="Size of crawled page markdown")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0,
+                        help="Share of search results repeating an earlier company under a www/locale URL variant")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for Firecrawl, Exa and the LLM providers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiles = build_profiles(args.latency, args.error_rate, args.time_scale)
+    services = FakeServices(args.host, args.port, profiles, args.page_kb, duplicate_rate=args.duplicate_rate)
+    print(f"Serving stand-in services at {services.url}. Point the app at them with:")
+    for name, value in services.env().items():
+        print(f"  export {name}={value}")
+    try:
+        services.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Background jobs for the Streamlit app.
+
+Streamlit reruns the whole script on every widget interaction, so an analysis running inline in a
+button handler is thrown away by the next click, and concurrent users compete for the same
+process. JobRunner runs analyses on a bounded, process-wide worker pool instead: each job gets an
+id, every user has a cap on active (queued or running) jobs, and a job's progress, messages and
+streamed analysis sections are kept on its Job while it runs, for the UI to poll.
+
+Finished jobs are persisted in JobStore (SQLite, next to the other caches) together with their
+result, so reruns and page reloads show them without recomputing, and dropped from memory.
+Cancellation is cooperative: work checks the job's cancel event (the pipeline does so between
+stages, crawls and streamed LLM chunks) and raises JobCancelled.
+
+Jobs belong to the user who submitted them: looking one up or cancelling it takes that user, so a
+job id alone (e.g. from a shared ?job= link) shows nothing to anyone else. Without sign-in the app's
+user is the browser session (see session_user in competitor_agent_team.py), so limits and ownership
+are then per session: a new tab or a reload starts with a fresh job allowance and no earlier jobs.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from cache import DEFAULT_CACHE_DIR
+from reporters import CollectingReporter, ProgressHandle, logger
+
+# Pool sizing can be tuned per deployment through the environment
+DEFAULT_JOB_WORKERS = int(os.environ.get("COMPETITOR_JOB_WORKERS", "4"))
+DEFAULT_JOBS_PER_USER = int(os.environ.get("COMPETITOR_JOBS_PER_USER", "2"))  # Queued or running jobs per user (or session)
+DEFAULT_JOB_RETENTION = 7 * 24 * 60 * 60  # Finished jobs older than this are pruned from the store
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work once the job has been cancelled"""
+
+
+class JobLimitError(Exception):
+    """Raised when a user already has the maximum number of active jobs"""
+
+
+class _JobProgress(ProgressHandle):
+    def __init__(self, job: "Job"):
+        self._job = job
+
+    def progress(self, value: float, text: Optional[str] = None) -> None:
+        self._job.progress = (value, text or "")
+
+
+class JobReporter(CollectingReporter):
+    """CollectingReporter that also records info messages and progress on its job, for the UI to poll"""
+    def __init__(self, job: "Job"):
+        super().__init__(prefix=f"job {job.id[:8]}")
+        self.job = job
+
+    def info(self, message: str) -> None:
+        super().info(message)
+        with self._lock:
+            self.messages.append(("info", message))
+
+    def progress(self, value: float, text: Optional[str] = None) -> ProgressHandle:
+        handle = _JobProgress(self.job)
+        handle.progress(value, text)
+        return handle
+
+
+class Job:
+    """One unit of background work: its status, progress, messages and, once finished, its result"""
+    def __init__(self, user: str, label: str, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.user = user
+        self.label = label
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.progress: Tuple[float, str] = (0.0, "")
+        self.sections: Dict[str, Any] = {} # Analysis sections streamed so far
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self.reporter = JobReporter(self)
+        self._messages: List[Tuple[str, str]] = [] # Messages of a job loaded from the store
+
+    @property
+    def messages(self) -> List[Tuple[str, str]]:
+        return self._messages or list(self.reporter.messages)
+
+    @property
+    def finished_ok(self) -> bool:
+        return self.status == DONE
+
+    @property
+    def active(self) -> bool:
+        return self.status not in FINISHED
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+
+class JobStore:
+    """SQLite store of finished jobs and their results"""
+    def __init__(self, path: Optional[str] = None, retention: Optional[float] = DEFAULT_JOB_RETENTION):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "jobs.sqlite")
+        self.retention = retention
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, user TEXT NOT NULL, label TEXT, status TEXT NOT NULL, created REAL NOT NULL,"
+                " started REAL, finished REAL, error TEXT, messages TEXT, result TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user, finished)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save(self, job: Job) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, user, label, status, created, started, finished, error, messages, result)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.user, job.label, job.status, job.created, job.started, job.finished, job.error,
+                 json.dumps(job.messages), json.dumps(job.result, default=str) if job.result is not None else None),
+            )
+            if self.retention:
+                conn.execute("DELETE FROM jobs WHERE finished < ?", (time.time() - self.retention,))
+
+    def load(self, job_id: str, user: str, with_result: bool = True) -> Optional[Job]:
+        """The job if it exists and belongs to `user`."""
+        columns = "user, label, status, created, started, finished, error, messages" + (", result" if with_result else "")
+        with self._lock, self._connect() as conn:
+            row = conn.execute(f"SELECT {columns} FROM jobs WHERE id = ? AND user = ?", (job_id, user)).fetchone()
+        if not row:
+            return None
+        job = Job(row[0], row[1], job_id=job_id)
+        job.status, job.created, job.started, job.finished, job.error = row[2], row[3], row[4], row[5], row[6]
+        job._messages = [tuple(m) for m in json.loads(row[7] or "[]")]
+        job.progress = (1.0, "")
+        job.result = json.loads(row[8]) if with_result and row[8] else None
+        return job
+
+    def recent(self, user: str, limit: int = 10) -> List[Job]:
+        """The user's most recently finished jobs, without their results."""
+        with self._lock, self._connect() as conn:
+            ids = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE user = ? ORDER BY finished DESC LIMIT ?",
+                                                  (user, limit)).fetchall()]
+        return [job for job in (self.load(job_id, user, with_result=False) for job_id in ids) if job]
+
+    def clear(self, user: Optional[str] = None) -> None:
+        with self._lock, self._connect() as conn:
+            if user is None:
+                conn.execute("DELETE FROM jobs")
+            else:
+                conn.execute("DELETE FROM jobs WHERE user = ?", (user,))
+
+
+class JobRunner:
+    """Runs jobs on a bounded thread pool, with a cap on active jobs per user. Finished jobs move to the store."""
+    def __init__(self, max_workers: int = DEFAULT_JOB_WORKERS, max_jobs_per_user: int = DEFAULT_JOBS_PER_USER,
+                 store: Optional[JobStore] = None):
+        self.max_workers = max(1, max_workers)
+        self.max_jobs_per_user = max(1, max_jobs_per_user)
+        self.store = store or JobStore()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {} # Active jobs
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user: str, label: str, work: Callable[[Job], Dict[str, Any]]) -> Job:
+        """
+        Queues `work(job)`, whose return value (JSON-serializable) becomes the job's result. Raises JobLimitError
+        when `user` already has max_jobs_per_user active jobs.
+        """
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.user == user)
+            if active >= self.max_jobs_per_user:
+                raise JobLimitError(f"{active} analyses are already running or queued "
+                                    f"(at most {self.max_jobs_per_user} per user). Wait for one to finish or cancel it.")
+            job = Job(user, label)
+            self._jobs[job.id] = job
+            self._futures[job.id] = self._executor.submit(self._run, job, work)
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], Dict[str, Any]]) -> None:
+        if job.cancel_event.is_set(): # Cancelled after the worker picked it up but before it started
+            job.status = CANCELLED
+            self._finish(job)
+            return
+        job.status, job.started = RUNNING, time.time()
+        try:
+            result = work(job)
+            job.raise_if_cancelled() # Cancelled after the last check: the result is discarded
+            job.result, job.status = result, DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status, job.error = FAILED, f"{type(e).__name__}: {e}"
+            logger.error("Job %s failed: %s", job.id, job.error)
+        finally:
+            if job.status == RUNNING: # e.g. KeyboardInterrupt
+                job.status = FAILED
+            self._finish(job)
+
+    def _finish(self, job: Job) -> None:
+        job.finished = time.time()
+        try:
+            self.store.save(job)
+        finally:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self._futures.pop(job.id, None)
+
+    def cancel(self, job_id: str, user: str) -> bool:
+        """Cancels one of the user's queued or running jobs. A running job stops at its next cancellation check."""
+        with self._lock:
+            job, future = self._jobs.get(job_id), self._futures.get(job_id)
+        if not job or job.user != user:
+            return False
+        job.cancel_event.set()
+        if future is not None and future.cancel(): # Still queued: it will never run
+            job.status = CANCELLED
+            self._finish(job)
+        return True
+
+    def get(self, job_id: str, user: str) -> Optional[Job]:
+        """The user's job, from memory while active or from the store once finished; None for other users' jobs."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job if job.user == user else None
+        return self.store.load(job_id, user)
+
+    def active(self, user: str) -> List[Job]:
+        with self._lock:
+            return sorted((job for job in self._jobs.values() if job.user == user), key=lambda job: job.created)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {"running": statuses.count(RUNNING), "queued": statuses.count(QUEUED), "workers": self.max_workers}
+
+
+# --- Process-wide runner ---
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Job runner shared by every session and rerun of the app in this process."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,211 @@
+"""
+Parsing of the JSON objects in LLM replies.
+
+LLM streams deliver the analysis JSON a few tokens at a time. IncrementalObjectParser scans each
+chunk once and reports every top-level member (e.g. "strengths") as soon as its value is
+complete, so the UI can render sections while the rest of the reply is still being generated.
+
+extract_json_object finds the object in a complete reply that isn't clean JSON (code fences,
+preamble, trailing commas, or a reply cut off at the token limit) without a second LLM call.
+An object recovered from a cut-off reply is returned as a PartialObject holding only its finished
+members; it must not be cached as if it were the whole reply.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_OBJECT_CANDIDATES = 5  # '{' positions tried before a reply is considered to hold no object
+MAX_REPAIR_CUTS = 50       # Trailing member boundaries tried when closing a truncated object
+
+
+class PartialObject(dict):
+    """An object closed after its last complete member because the reply was cut off"""
+
+
+def is_partial(value: Any) -> bool:
+    """True for an object recovered from a truncated reply."""
+    return isinstance(value, PartialObject)
+
+
+class IncrementalObjectParser:
+    """Feeds chunks of a JSON object and yields (key, value) pairs for each completed top-level member"""
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "start"          # start -> key -> colon -> value -> comma -> key ... -> done
+        self._token_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consumes a chunk and returns the top-level members completed by it, in order."""
+        self._text += chunk
+        completed: List[Tuple[str, Any]] = []
+        text = self._text
+        while self._pos < len(text) and not self.done:
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._close_top_level_string(completed)
+            elif self._expect == "start":
+                if ch == "{": # Anything before the object (code fences, preamble) is ignored
+                    self._depth = 1
+                    self._expect = "key"
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect in ("key", "value"):
+                    self._token_start = self._pos
+            elif ch in "{[":
+                if self._depth == 1 and self._expect == "value":
+                    self._token_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._token_start is not None:
+                    self._emit(self._pos + 1, completed)
+                elif self._depth == 0:
+                    if self._expect == "value" and self._token_start is not None:
+                        self._emit(self._pos, completed) # Trailing scalar such as `"k": 3}`
+                    self.done = True
+            elif self._depth == 1:
+                if ch == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif ch == ",":
+                    if self._expect == "value" and self._token_start is not None:
+                        self._emit(self._pos, completed)
+                    self._expect = "key"
+                elif not ch.isspace() and self._expect == "value" and self._token_start is None:
+                    self._token_start = self._pos # Start of a number, true, false or null
+            self._pos += 1
+        return completed
+
+    def _close_top_level_string(self, completed: List[Tuple[str, Any]]) -> None:
+        if self._expect == "key":
+            self._key = self._loads(self._text[self._token_start:self._pos + 1])
+            self._token_start = None
+            self._expect = "colon"
+        elif self._expect == "value":
+            self._emit(self._pos + 1, completed)
+
+    def _emit(self, end: int, completed: List[Tuple[str, Any]]) -> None:
+        raw = self._text[self._token_start:end].strip()
+        self._token_start = None
+        self._expect = "comma"
+        if self._key is None:
+            return
+        try:
+            completed.append((self._key, json.loads(raw)))
+        except json.JSONDecodeError:
+            pass # Leave malformed members to the full-response parser
+        self._key = None
+
+    @staticmethod
+    def _loads(raw: str) -> Optional[str]:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._text
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the first JSON object in an LLM reply, or None if there is none.
+    Each candidate '{' is scanned once to its balanced closing brace, ignoring braces inside strings
+    and dropping trailing commas on the way. An object cut off by the end of the reply is closed after
+    its last complete member and returned as a PartialObject, so a truncated reply keeps the sections it
+    finished; the member being written when it was cut off is dropped rather than kept half-written.
+    """
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value
+    except json.JSONDecodeError:
+        pass
+    start = text.find("{")
+    for _ in range(MAX_OBJECT_CANDIDATES):
+        if start == -1:
+            break
+        value = _scan_object(text, start)
+        if value is not None:
+            return value
+        start = text.find("{", start + 1)
+    return None
+
+
+def _scan_object(text: str, start: int) -> Optional[Dict[str, Any]]:
+    out: List[str] = []
+    closers: List[str] = []
+    cuts: List[int] = [] # Lengths of out at top-level member boundaries, where the object can be closed
+    in_string = escape = False
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if len(closers) == 1: # A top-level key or string value
+                    cuts.append(len(out))
+            continue
+        if ch in "}]":
+            if not closers or ch != closers[-1]:
+                return None
+            _drop_trailing_comma(out)
+            closers.pop()
+            out.append(ch)
+            if not closers:
+                return _loads_object("".join(out))
+            if len(closers) == 1: # End of a top-level array or object value
+                cuts.append(len(out))
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch == "," and len(closers) == 1:
+            cuts.append(len(out)) # Also ends a top-level number, true, false or null
+        out.append(ch)
+        if len(out) == 1:
+            cuts.append(1) # Just the opening brace: nothing was finished
+    return _close_truncated(out, cuts)
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    end = len(out)
+    while end and out[end - 1].isspace():
+        end -= 1
+    if end and out[end - 1] == ",":
+        del out[end - 1:]
+
+
+def _close_truncated(out: List[str], cuts: List[int]) -> Optional[Dict[str, Any]]:
+    for length in reversed(cuts[-MAX_REPAIR_CUTS:]):
+        candidate = out[:length]
+        _drop_trailing_comma(candidate)
+        value = _loads_object("".join(candidate) + "}")
+        if value is not None: # Cuts after an object key fail to parse and are skipped
+            return PartialObject(value)
+    return None
+
+
+def _loads_object(raw: str) -> Optional[Dict[str, Any]]:
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
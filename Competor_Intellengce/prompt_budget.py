@@ -0,0 +1,136 @@
+"""
+Token estimates and prompt compaction for analysis prompts.
+
+Crawled competitor content can be arbitrarily large, so prompts are built against a per-model
+token budget: text that several competitors share (taglines, template copy) is stated once,
+metadata is flattened into a compact form and fields are truncated in priority order.
+Token counts use tiktoken for OpenAI models when it is installed and a per-provider
+characters-per-token ratio otherwise, which is close enough for budgeting.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+# Average characters per token for English prose, per provider tokenizer
+CHARS_PER_TOKEN = {"openai": 4.0, "deepseek": 3.8, "anthropic": 3.5, "google": 4.0}
+
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4o": 128000, "gpt-4-turbo": 128000, "gpt-3.5-turbo": 16385,
+    "claude-3-opus-20240229": 200000, "claude-3-sonnet-20240229": 200000, "claude-3-haiku-20240307": 200000,
+    "gemini-1.5-pro-latest": 1000000, "gemini-1.5-flash-latest": 1000000, "gemini-1.0-pro": 30720,
+    "deepseek-chat": 64000, "deepseek-coder": 16000,
+}
+DEFAULT_CONTEXT_TOKENS = 16000
+OUTPUT_TOKEN_RESERVE = 4096        # Room left for the JSON report itself
+DEFAULT_MAX_PROMPT_TOKENS = 16000  # Cost/latency ceiling, even for models with huge context windows
+MIN_FIELD_TOKENS = 16
+MIN_SHARED_SENTENCE_CHARS = 20     # Shorter repeats ("Learn more.") aren't worth hoisting
+
+TRUNCATION_MARKER = " …"
+
+
+@lru_cache(maxsize=None)
+def _tiktoken_encoding(model_id: str) -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_id)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str, provider: str = "openai", model_id: Optional[str] = None) -> int:
+    """Estimates how many tokens `text` costs with the given provider's tokenizer."""
+    if provider == "openai" and model_id:
+        encoding = _tiktoken_encoding(model_id)
+        if encoding is not None:
+            return len(encoding.encode(text))
+    return int(len(text) / CHARS_PER_TOKEN.get(provider, 4.0)) + 1
+
+
+def context_window(model_id: Optional[str]) -> int:
+    return MODEL_CONTEXT_TOKENS.get(model_id or "", DEFAULT_CONTEXT_TOKENS)
+
+
+def prompt_token_budget(model_id: Optional[str], max_prompt_tokens: int = DEFAULT_MAX_PROMPT_TOKENS) -> int:
+    """Largest prompt worth sending to `model_id`: its context minus the output reserve, capped by `max_prompt_tokens`."""
+    return max(1024, min(max_prompt_tokens, context_window(model_id) - OUTPUT_TOKEN_RESERVE))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, provider: str = "openai", model_id: Optional[str] = None) -> str:
+    """Cuts `text` at a word boundary so that it fits in `max_tokens`."""
+    if estimate_tokens(text, provider, model_id) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    cut = int(max_tokens * CHARS_PER_TOKEN.get(provider, 4.0))
+    while cut > 0:
+        truncated = text[:cut].rsplit(" ", 1)[0].rstrip() + TRUNCATION_MARKER
+        if estimate_tokens(truncated, provider, model_id) <= max_tokens:
+            return truncated
+        cut = int(cut * 0.9)
+    return ""
+
+
+def fair_share(sizes: List[int], budget: int, floor: int = 0) -> List[int]:
+    """
+    Splits `budget` across items of the given natural sizes: small items keep their full size and
+    the budget they don't need is shared among the larger ones. No item gets less than `floor`.
+    """
+    allocations = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=sizes.__getitem__)
+    for position, index in enumerate(order):
+        share = remaining // (len(sizes) - position)
+        allocations[index] = max(floor, min(sizes[index], share))
+        remaining -= allocations[index]
+    return allocations
+
+
+def compact_metadata(metadata: Dict[str, Any]) -> str:
+    """Flattens metadata into `key=value; ...`, dropping empty and N/A values."""
+    parts = []
+    for key, value in metadata.items():
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(v) for v in value if v not in (None, "", "N/A"))
+        elif isinstance(value, dict):
+            value = compact_metadata(value)
+        if value in (None, "", "N/A"):
+            continue
+        parts.append(f"{key}={value}")
+    return "; ".join(parts)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in re.split(r"(?<=[.!?])\s+", (text or "").strip()) if s]
+
+
+def _sentence_key(sentence: str) -> str:
+    return re.sub(r"\s+", " ", sentence).strip().lower()
+
+
+def find_shared_sentences(texts_per_company: List[List[str]], min_companies: int = 2) -> List[str]:
+    """Returns sentences that appear in the text of at least `min_companies` competitors, in first-seen order."""
+    counts: Dict[str, int] = {}
+    first_seen: Dict[str, str] = {}
+    for texts in texts_per_company:
+        keys = set()
+        for text in texts:
+            for sentence in split_sentences(text):
+                if len(sentence) >= MIN_SHARED_SENTENCE_CHARS:
+                    key = _sentence_key(sentence)
+                    keys.add(key)
+                    first_seen.setdefault(key, sentence)
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+    return [first_seen[key] for key in first_seen if counts[key] >= min_companies]
+
+
+def remove_sentences(text: str, sentences: List[str]) -> str:
+    """Drops the given sentences from `text`."""
+    if not sentences:
+        return text
+    drop = {_sentence_key(s) for s in sentences}
+    return " ".join(s for s in split_sentences(text) if _sentence_key(s) not in drop)
@@ -0,0 +1,108 @@
+"""
+UI-agnostic reporting for the agents.
+
+Agents report user-facing warnings, errors and progress through a Reporter instead of calling
+Streamlit directly, so the same pipeline can run inside the Streamlit app or headless (batch
+runs, scheduled jobs) without importing Streamlit at all.
+"""
+import logging
+import threading
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger("competitor_intel")
+
+
+class ProgressHandle:
+    """Progress indicator returned by Reporter.progress; mirrors Streamlit's progress bar API"""
+    def progress(self, value: float, text: Optional[str] = None) -> None:
+        pass
+
+
+class Reporter:
+    """Receives user-facing messages from the agents. The base class discards everything."""
+    def info(self, message: str) -> None:
+        pass
+
+    def warning(self, message: str) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def progress(self, value: float, text: Optional[str] = None) -> ProgressHandle:
+        return ProgressHandle()
+
+
+class StreamlitReporter(Reporter):
+    """Renders messages and progress bars in the running Streamlit app"""
+    def __init__(self):
+        import streamlit as st # Only the interactive app pays for importing Streamlit
+        self._st = st
+
+    def info(self, message: str) -> None:
+        self._st.info(message)
+
+    def warning(self, message: str) -> None:
+        self._st.warning(message)
+
+    def error(self, message: str) -> None:
+        self._st.error(message)
+
+    def progress(self, value: float, text: Optional[str] = None) -> Any:
+        return self._st.progress(value, text=text) # Already exposes .progress(value, text=...)
+
+
+class _LoggingProgress(ProgressHandle):
+    def __init__(self, log: logging.Logger, prefix: str):
+        self._log = log
+        self._prefix = prefix
+
+    def progress(self, value: float, text: Optional[str] = None) -> None:
+        self._log.debug("%s%3.0f%% %s", self._prefix, value * 100, text or "")
+
+
+class LoggingReporter(Reporter):
+    """Sends messages to the `competitor_intel` logger, optionally tagged with a prefix such as a company id"""
+    def __init__(self, prefix: str = "", log: logging.Logger = logger):
+        self.prefix = f"[{prefix}] " if prefix else ""
+        self.log = log
+
+    def info(self, message: str) -> None:
+        self.log.info("%s%s", self.prefix, message)
+
+    def warning(self, message: str) -> None:
+        self.log.warning("%s%s", self.prefix, message)
+
+    def error(self, message: str) -> None:
+        self.log.error("%s%s", self.prefix, message)
+
+    def progress(self, value: float, text: Optional[str] = None) -> ProgressHandle:
+        handle = _LoggingProgress(self.log, self.prefix)
+        handle.progress(value, text)
+        return handle
+
+
+class CollectingReporter(LoggingReporter):
+    """LoggingReporter that also keeps every warning and error, so batch output can record them"""
+    def __init__(self, prefix: str = "", log: logging.Logger = logger):
+        super().__init__(prefix, log)
+        self.messages: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def warning(self, message: str) -> None:
+        super().warning(message)
+        with self._lock:
+            self.messages.append(("warning", message))
+
+    def error(self, message: str) -> None:
+        super().error(message)
+        with self._lock:
+            self.messages.append(("error", message))
+
+    @property
+    def warnings(self) -> List[str]:
+        return [message for level, message in self.messages if level == "warning"]
+
+    @property
+    def errors(self) -> List[str]:
+        return [message for level, message in self.messages if level == "error"]
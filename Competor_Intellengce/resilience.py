@@ -0,0 +1,252 @@
+"""
+Retries, rate limiting and circuit breaking for calls to external services.
+
+Every call to Firecrawl, Exa or an LLM provider goes through Resilience.call, which:
+  * waits for a token from a per-API-key token bucket, so bursts don't trigger 429s,
+  * retries transient failures (429, 408, 5xx, timeouts, dropped connections) with jittered
+    exponential backoff, honoring Retry-After headers,
+  * fails fast through a per-service circuit breaker while a service keeps failing,
+and raises ProviderError with a readable reason once it gives up.
+"""
+import email.utils
+import hashlib
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from reporters import logger
+
+T = TypeVar("T")
+
+# (requests per second, burst) per service and API key
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    "openai": (3.0, 6), "anthropic": (2.0, 4), "google": (2.0, 4), "deepseek": (2.0, 4),
+    "firecrawl": (5.0, 10), "exa": (5.0, 10),
+}
+FALLBACK_RATE_LIMIT = (2.0, 4)
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.5       # Seconds before the first retry; doubles per attempt
+DEFAULT_MAX_DELAY = 20.0       # Longest backoff between attempts
+MAX_RETRY_AFTER = 60.0         # Longer Retry-After values fail fast instead of blocking the run
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive transient failures that open the circuit
+BREAKER_RESET_TIMEOUT = 30.0   # Seconds before an open circuit lets a trial request through
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERROR_NAMES = ("Timeout", "Connection", "RateLimit", "ServiceUnavailable", "ResourceExhausted",
+                         "DeadlineExceeded", "InternalServerError", "Overloaded")
+
+
+class ProviderError(Exception):
+    """A call to an external service failed for good; `reason` is safe to show to users"""
+    def __init__(self, service: str, reason: str):
+        super().__init__(f"{service}: {reason}")
+        self.service = service
+        self.reason = reason
+
+
+class CircuitOpenError(ProviderError):
+    """The service's circuit breaker is open, so the call was not attempted"""
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of an SDK error, whichever SDK raised it."""
+    for candidate in (getattr(error, "status_code", None), getattr(getattr(error, "response", None), "status_code", None),
+                      getattr(error, "code", None)):
+        if isinstance(candidate, int):
+            return candidate
+        value = getattr(candidate, "value", None) # google.api_core codes are enums of (grpc code, http status)
+        if isinstance(value, tuple) and len(value) > 1 and isinstance(value[1], int):
+            return value[1]
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the service asked us to wait, from Retry-After / retry-after-ms headers."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return float(milliseconds) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value) if value else None
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def describe(error: BaseException) -> str:
+    """Short, user-facing reason for a failed call."""
+    status = status_code(error)
+    if status in (401, 403):
+        return f"authentication failed (HTTP {status}); check the API key"
+    if status == 429:
+        return "rate limited (HTTP 429)"
+    if status is not None and status >= 500:
+        return f"service error (HTTP {status})"
+    if status is not None:
+        return f"request rejected (HTTP {status}): {error}"
+    if is_retryable(error):
+        return f"network problem ({type(error).__name__})"
+    return f"{type(error).__name__}: {error}"
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, at most `capacity` saved up for bursts"""
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after consecutive transient failures, then lets one trial call through after a cool-down"""
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> Optional[float]:
+        """Returns None if a call may proceed, otherwise the seconds until the circuit will try again."""
+        with self._lock:
+            if self.opened_at is None:
+                return None
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining <= 0 and not self._trial_in_flight:
+                self._trial_in_flight = True # Half-open: exactly one trial call
+                return None
+            return max(remaining, 0.0)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Ends a trial call that said nothing about the service's health, so the next call becomes the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class Resilience:
+    """Process-wide registry of token buckets (per service and API key) and circuit breakers (per service)"""
+    def __init__(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS)
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, service: str, api_key: str) -> TokenBucket:
+        key = (service, hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16])
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(*self.rate_limits.get(service, FALLBACK_RATE_LIMIT))
+            return self._buckets[key]
+
+    def breaker(self, service: str) -> CircuitBreaker:
+        with self._lock:
+            return self._breakers.setdefault(service, CircuitBreaker())
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, service: str, api_key: str, fn: Callable[[], T]) -> T:
+        """
+        Calls `fn` with rate limiting, retries and circuit breaking; raises ProviderError when giving up. Errors that
+        are neither transient nor HTTP errors are re-raised unchanged.
+        """
+        bucket, breaker = self.bucket(service, api_key), self.breaker(service)
+        for attempt in range(1, self.max_attempts + 1):
+            wait = breaker.allow()
+            if wait is not None:
+                raise CircuitOpenError(service, f"temporarily unavailable after repeated failures; retrying in {wait:.0f}s")
+            bucket.acquire()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    if status_code(e) is None: # Not an answer from the service, e.g. a bug in `fn`
+                        breaker.release_trial()
+                        raise
+                    breaker.record_success() # The service answered; the request itself was bad
+                    raise ProviderError(service, describe(e)) from e
+                breaker.record_failure()
+                delay = retry_after(e)
+                if delay is not None and delay > MAX_RETRY_AFTER:
+                    raise ProviderError(service, f"{describe(e)}; asked to retry after {delay:.0f}s") from e
+                if attempt == self.max_attempts:
+                    raise ProviderError(service, f"{describe(e)} after {attempt} attempts") from e
+                delay = delay if delay is not None else self.backoff(attempt)
+                logger.warning("%s call failed (%s); retrying in %.1fs (attempt %d/%d)",
+                               service, describe(e), delay, attempt + 1, self.max_attempts)
+                time.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+        raise AssertionError("unreachable")
+
+    def breaker_states(self) -> Dict[str, str]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {service: breaker.state for service, breaker in breakers.items()}
+
+
+_resilience = Resilience()
+
+
+def get_resilience() -> Resilience:
+    """Returns the resilience registry shared by every session in this process."""
+    return _resilience
@@ -0,0 +1,203 @@
+"""
+Latency-aware, hedged routing of analysis requests across LLM providers.
+
+LatencyTracker keeps a rolling window of latencies and outcomes per (provider, model) for the
+whole process. HedgedRouter sends a request to the healthiest, fastest route. If no valid reply
+has arrived once the route's latency percentile has passed, it sends the same request to the next
+route as well. The first valid reply wins and the losing requests are cancelled. A route that
+fails fails over to the next one immediately, so tail latency is set by the fastest healthy
+provider rather than the slowest.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from reporters import logger
+from tracing import Tracer
+
+DEFAULT_WINDOW = 100              # Samples kept per route
+DEFAULT_HEDGE_PERCENTILE = 95.0   # Hedge once the primary is slower than this percentile of its history
+DEFAULT_HEDGE_DELAY = 10.0        # Seconds to wait before hedging a route without enough history
+DEFAULT_MIN_SAMPLES = 5
+DEFAULT_MAX_ERROR_RATE = 0.5      # Routes failing more often than this are tried last
+CANCEL_POLL_SECONDS = 0.2         # How often a routed request checks the caller's cancel event while waiting
+
+RouteKey = Tuple[str, str]
+
+
+class RequestCancelled(Exception):
+    """Raised inside a routed request when another route has already won"""
+
+
+class RoutingError(Exception):
+    """Raised when every route failed"""
+
+
+class LatencyTracker:
+    """Rolling latency percentiles and error rates per (provider, model)"""
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._samples: Dict[RouteKey, Deque[Tuple[float, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: RouteKey, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append((latency, ok))
+
+    def sample_count(self, key: RouteKey) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def percentile(self, key: RouteKey, q: float) -> Optional[float]:
+        """Latency percentile over successful requests, or None without data."""
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self._samples.get(key, ()) if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, int(round(q / 100.0 * (len(latencies) - 1)))))
+        return latencies[index]
+
+    def error_rate(self, key: RouteKey) -> float:
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        return sum(1 for _, ok in samples if not ok) / len(samples) if samples else 0.0
+
+    def snapshot(self) -> Dict[RouteKey, Dict[str, Any]]:
+        """p50/p95/error rate per route, for display."""
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            key: {"samples": self.sample_count(key), "p50": self.percentile(key, 50),
+                  "p95": self.percentile(key, 95), "error_rate": self.error_rate(key)}
+            for key in keys
+        }
+
+
+_tracker = LatencyTracker()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Returns the tracker shared by every session in this process."""
+    return _tracker
+
+
+class RouteCancel(threading.Event):
+    """Cancel event of one route: set when another route wins, and also reads as set once the caller's event is"""
+    def __init__(self, parent: Optional[threading.Event] = None):
+        super().__init__()
+        self.parent = parent
+
+    def is_set(self) -> bool:
+        return super().is_set() or (self.parent is not None and self.parent.is_set())
+
+
+class HedgedRouter:
+    """
+    Routes a prompt over several agents. Each agent must expose `provider`, `model_id` and
+    `complete_text(prompt, cancel_event)`, which should raise RequestCancelled once the event is set.
+    Setting `cancel_event` (e.g. a background job's) cancels every route in flight and makes complete()
+    raise RequestCancelled. With a `tracer`, spans opened by the routes nest under the caller's current span.
+    """
+    def __init__(self, agents: List[Any], tracker: Optional[LatencyTracker] = None,
+                 hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE, default_hedge_delay: float = DEFAULT_HEDGE_DELAY,
+                 min_samples: int = DEFAULT_MIN_SAMPLES, max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+                 cancel_event: Optional[threading.Event] = None, tracer: Optional[Tracer] = None):
+        self.agents = agents
+        self.cancel_event = cancel_event
+        self.tracer = tracer
+        self.tracker = tracker or get_latency_tracker()
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+
+    @staticmethod
+    def route_key(agent: Any) -> RouteKey:
+        return (agent.provider, agent.model_id)
+
+    def ranked(self) -> List[Any]:
+        """Healthy routes first, fastest median first. Routes without history keep their configured order up front."""
+        def score(agent: Any) -> Tuple[bool, float]:
+            key = self.route_key(agent)
+            known = self.tracker.sample_count(key) >= self.min_samples
+            unhealthy = known and self.tracker.error_rate(key) > self.max_error_rate
+            return unhealthy, (self.tracker.percentile(key, 50) or 0.0) if known else 0.0
+        return sorted(self.agents, key=score)
+
+    def hedge_delay(self, agent: Any) -> float:
+        key = self.route_key(agent)
+        if self.tracker.sample_count(key) < self.min_samples:
+            return self.default_hedge_delay
+        return self.tracker.percentile(key, self.hedge_percentile) or self.default_hedge_delay
+
+    def complete(self, prompt: str, validate: Callable[[str], bool]) -> Tuple[str, Any]:
+        """
+        Returns (response_text, winning_agent) for the first reply that passes `validate`.
+        If no reply validates, the last non-empty reply is returned so the caller can salvage it.
+        """
+        candidates = self.ranked()
+        executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="llm-route")
+        pending: Dict[Future, Tuple[Any, RouteCancel, float]] = {}
+        errors: List[str] = []
+        fallback: Optional[Tuple[str, Any]] = None
+        next_index = 0
+        deadline = 0.0
+
+        def launch() -> None:
+            nonlocal next_index, deadline
+            agent = candidates[next_index]
+            next_index += 1
+            cancel_event = RouteCancel(self.cancel_event)
+            complete_text = self.tracer.bind(agent.complete_text) if self.tracer else agent.complete_text
+            pending[executor.submit(complete_text, prompt, cancel_event)] = (agent, cancel_event, time.monotonic())
+            deadline = time.monotonic() + self.hedge_delay(agent)
+            if next_index > 1:
+                logger.info("Hedging analysis request with %s model %s...", agent.provider, agent.model_id)
+
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise RequestCancelled() # Cancelled before any route was sent
+        try:
+            launch()
+            while pending:
+                timeout = max(0.0, deadline - time.monotonic()) if next_index < len(candidates) else None
+                if self.cancel_event is not None:
+                    timeout = CANCEL_POLL_SECONDS if timeout is None else min(timeout, CANCEL_POLL_SECONDS)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    raise RequestCancelled() # The routes see the caller's event and stop on their own
+                if not done:
+                    if next_index < len(candidates) and time.monotonic() >= deadline:
+                        launch() # Current routes are slower than their latency percentile: hedge
+                    continue
+                for future in done:
+                    agent, _, started = pending.pop(future)
+                    latency = time.monotonic() - started
+                    label = f"{agent.provider}/{agent.model_id}"
+                    try:
+                        text = future.result()
+                    except RequestCancelled:
+                        continue
+                    except Exception as e:
+                        self.tracker.record(self.route_key(agent), latency, False)
+                        errors.append(f"{label}: {e}")
+                        continue
+                    valid = bool(text) and validate(text)
+                    self.tracker.record(self.route_key(agent), latency, valid)
+                    if valid:
+                        for _, cancel_event, _ in pending.values():
+                            cancel_event.set() # Losers stop at their next streamed chunk
+                        return text, agent
+                    errors.append(f"{label}: invalid response")
+                    if text:
+                        fallback = (text, agent)
+                if not pending and next_index < len(candidates): # Fail over straight away
+                    launch()
+        finally:
+            for _, cancel_event, _ in pending.values():
+                cancel_event.set() # Nothing will read their replies any more
+            executor.shutdown(wait=False, cancel_futures=True)
+        if fallback:
+            return fallback
+        raise RoutingError("All providers failed: " + "; ".join(errors))
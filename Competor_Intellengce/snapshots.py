@@ -0,0 +1,207 @@
+"""
+Per-competitor snapshots for incremental re-analysis.
+
+SnapshotStore keeps, for every competitor, the content hash of its last crawl, its summary and
+metadata, and per analyzed company (the input of a run) the analysis fragment each competitor was
+last analyzed in. A fragment is the report of one LLM analysis over a group of competitors (the
+whole set, or one map-reduce chunk), stored with the content hash each member had at the time. A
+later run for the same input reuses a fragment while all of its members are present with unchanged
+content, so only competitors whose pages changed (and those sharing a fragment with them) are
+re-summarized and re-analyzed, and the report is merged from reused and new fragments.
+
+The last report per input is kept as well, so each run can be compared with the previous one
+(change_report): competitors added, removed or changed and the analysis items that appeared or
+disappeared.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from cache import DEFAULT_CACHE_DIR, content_hash
+from dedupe import canonical_url
+
+Fragment = Tuple[List[Dict[str, Any]], Dict[str, Any]] # (competitors analyzed together, their report)
+
+
+def company_key(company: Dict[str, Any]) -> str:
+    """Snapshot key of a competitor: its canonical URL, or its name when it has no URL."""
+    if company.get("url"):
+        return canonical_url(company["url"])
+    return "name:" + " ".join(str(company.get("name") or "Unknown").lower().split())
+
+
+def subject_key(input_text: str, is_url: bool) -> str:
+    """Key of the company an analysis was run for, so reruns for the same input are compared."""
+    return canonical_url(input_text) if is_url else "description:" + " ".join(input_text.lower().split())
+
+
+def fingerprint(company: Dict[str, Any]) -> str:
+    """Content hash of a competitor's crawled page; competitors without one are fingerprinted by their description."""
+    return company.get("content_hash") or content_hash(str(company.get("description") or ""))
+
+
+def _normalize_item(item: Any) -> str:
+    return " ".join(str(item).lower().split())
+
+
+class SnapshotStore:
+    """SQLite store of per-competitor snapshots, analysis fragments and the last report per input"""
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "snapshots.sqlite")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS companies ("
+                " key TEXT PRIMARY KEY, name TEXT, url TEXT, content_hash TEXT, summary TEXT, metadata TEXT,"
+                " updated REAL NOT NULL)"
+            )
+            conn.execute( # Fragment each competitor was last analyzed in, per input: competitors shared by
+                          # several inputs are analyzed with different peers
+                "CREATE TABLE IF NOT EXISTS assignments ("
+                " subject TEXT NOT NULL, key TEXT NOT NULL, fragment TEXT NOT NULL, PRIMARY KEY (subject, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fragments ("
+                " id TEXT PRIMARY KEY, analyzer TEXT NOT NULL, members TEXT NOT NULL, report TEXT NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " subject TEXT PRIMARY KEY, companies TEXT NOT NULL, analysis TEXT NOT NULL, finished REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def companies(self, companies: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """The stored snapshot of each of `companies` that has one, by company_key."""
+        keys = list({company_key(c) for c in companies})
+        snapshots = {}
+        with self._lock, self._connect() as conn:
+            for key in keys:
+                row = conn.execute("SELECT name, url, content_hash, summary, metadata, updated"
+                                   " FROM companies WHERE key = ?", (key,)).fetchone()
+                if row:
+                    snapshots[key] = {"name": row[0], "url": row[1], "content_hash": row[2], "summary": row[3],
+                                      "metadata": json.loads(row[4]) if row[4] else {}, "updated": row[5]}
+        return snapshots
+
+    def plan(self, subject: str, competitors: Sequence[Dict[str, Any]],
+             analyzer: str) -> Tuple[List[Fragment], List[Dict[str, Any]]]:
+        """
+        Splits a run for `subject` into the stored fragments that are still valid and the competitors that need
+        analysis. A fragment is valid when it was produced by the same `analyzer` (provider/model), and every member
+        is in this run with unchanged content and was last analyzed in that fragment. Returns (fragments, competitors to
+        analyze), with each fragment's members taken from `competitors`.
+        """
+        keys = [company_key(c) for c in competitors]
+        positions = {key: index for index, key in reversed(list(enumerate(keys)))}
+        current = {key: fingerprint(c) for key, c in zip(keys, competitors)}
+        valid: Dict[str, Fragment] = {}
+        with self._lock, self._connect() as conn:
+            pointers = dict(conn.execute("SELECT key, fragment FROM assignments WHERE subject = ?", (subject,)).fetchall())
+            for fragment_id in set(pointers[key] for key in current if key in pointers):
+                row = conn.execute("SELECT analyzer, members, report FROM fragments WHERE id = ?", (fragment_id,)).fetchone()
+                if not row or row[0] != analyzer:
+                    continue
+                members = json.loads(row[1])
+                if all(current.get(key) == hashed and pointers.get(key) == fragment_id for key, hashed in members.items()):
+                    valid[fragment_id] = ([competitors[i] for i in sorted(positions[key] for key in members)], json.loads(row[2]))
+        covered = {key for key in current if pointers.get(key) in valid}
+        return list(valid.values()), [c for key, c in zip(keys, competitors) if key not in covered]
+
+    def record(self, subject: str, competitors: Sequence[Dict[str, Any]], fragments: Sequence[Fragment],
+               analyzer: str) -> None:
+        """
+        Stores the snapshot of every competitor and the `fragments` newly produced for `subject`. Competitors outside
+        the new fragments keep pointing at the fragment they were last analyzed in; fragments no longer referenced
+        are dropped.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            for group, report in fragments:
+                fragment_id = uuid.uuid4().hex
+                members = {company_key(c): fingerprint(c) for c in group}
+                conn.execute("INSERT INTO fragments (id, analyzer, members, report, created) VALUES (?, ?, ?, ?, ?)",
+                             (fragment_id, analyzer, json.dumps(members), json.dumps(report), now))
+                conn.executemany("INSERT OR REPLACE INTO assignments (subject, key, fragment) VALUES (?, ?, ?)",
+                                 [(subject, key, fragment_id) for key in members])
+            for company in competitors:
+                key = company_key(company)
+                # Failed crawls keep the content and summary of the last successful one
+                crawled = bool(company.get("content_hash"))
+                conn.execute(
+                    "INSERT INTO companies (key, name, url, content_hash, summary, metadata, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET name = excluded.name,"
+                    " url = excluded.url, updated = excluded.updated,"
+                    " content_hash = COALESCE(excluded.content_hash, content_hash),"
+                    " summary = COALESCE(excluded.summary, summary), metadata = COALESCE(excluded.metadata, metadata)",
+                    (key, company.get("name"), company.get("url"), company.get("content_hash"),
+                     company.get("summary") if crawled else None,
+                     json.dumps(company.get("metadata") or {}, default=str) if crawled else None, now),
+                )
+            conn.execute("DELETE FROM fragments WHERE id NOT IN (SELECT fragment FROM assignments)")
+
+    def last_run(self, subject: str) -> Optional[Dict[str, Any]]:
+        """The competitors and analysis of the last recorded run for `subject`, or None."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT companies, analysis, finished FROM runs WHERE subject = ?", (subject,)).fetchone()
+        return {"companies": json.loads(row[0]), "analysis": json.loads(row[1]), "finished": row[2]} if row else None
+
+    def record_run(self, subject: str, competitors: Sequence[Dict[str, Any]], analysis: Dict[str, Any]) -> None:
+        companies = {company_key(c): {"name": c.get("name"), "url": c.get("url"), "fingerprint": fingerprint(c)}
+                     for c in competitors}
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO runs (subject, companies, analysis, finished) VALUES (?, ?, ?, ?)",
+                         (subject, json.dumps(companies), json.dumps(analysis), time.time()))
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM companies")
+            conn.execute("DELETE FROM assignments")
+            conn.execute("DELETE FROM fragments")
+            conn.execute("DELETE FROM runs")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock, self._connect() as conn:
+            return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ("companies", "fragments", "runs")}
+
+
+def change_report(previous: Optional[Dict[str, Any]], competitors: Sequence[Dict[str, Any]],
+                  analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What changed since `previous` (SnapshotStore.last_run): competitors added, removed and with changed content,
+    and per analysis section the items added and removed. Without a previous run every competitor counts as added.
+    """
+    before = (previous or {}).get("companies", {})
+    current = {company_key(c): c for c in competitors}
+    entry = lambda company: {"name": company.get("name"), "url": company.get("url")}
+    sections = {}
+    for key, items in analysis.items():
+        old = (previous or {}).get("analysis", {}).get(key) or []
+        new = items if isinstance(items, list) else [items]
+        old_items, new_items = {_normalize_item(i) for i in old}, {_normalize_item(i) for i in new}
+        sections[key] = {"added": [i for i in new if _normalize_item(i) not in old_items and i != "N/A"],
+                         "removed": [i for i in old if _normalize_item(i) not in new_items and i != "N/A"]}
+    return {
+        "previous_run": (previous or {}).get("finished"),
+        "added": [entry(c) for key, c in current.items() if key not in before],
+        "removed": [entry(c) for key, c in before.items() if key not in current],
+        "changed": [entry(c) for key, c in current.items() if key in before and before[key]["fingerprint"] != fingerprint(c)],
+        "unchanged": sum(1 for key, c in current.items() if key in before and before[key]["fingerprint"] == fingerprint(c)),
+        "analysis": sections if previous else {},
+    }
@@ -0,0 +1,275 @@
+"""
+Summaries of crawled competitor pages: a local extractive summarizer and batched LLM summaries.
+
+extractive_summary picks a page's most representative sentences without any network call. The
+page markdown is read one chunk at a time; navigation, link lists, tables and code are skipped.
+Sentences are scored against the page's running term statistics (TF-IDF), and only a bounded pool
+of the best candidates is kept, so memory stays flat however long the page is. The summary
+sentences are then chosen by TextRank over that pool (PageRank over the cosine similarity of their
+TF-IDF vectors), with near-repeats dropped, and returned in page order.
+
+SummaryBatcher summarizes several pages per LLM request instead of one request per page. Each page
+is reduced to an extractive digest first, pages are added as their crawls finish, and a batch is
+sent as soon as its token budget is full, so summarization overlaps crawling. Pages a batch could
+not summarize fall back to their extractive summary.
+"""
+import math
+import re
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from prompt_budget import estimate_tokens, truncate_to_tokens
+
+SUMMARY_MODES = {"extractive": "Local (extractive)", "llm": "LLM (batched)"}
+DEFAULT_SUMMARY_MODE = "extractive"
+NO_SUMMARY = "No summary could be extracted from the page."  # Summary of a page without usable prose
+DEFAULT_SUMMARY_SENTENCES = 4
+DEFAULT_SUMMARY_CHARS = 700      # Upper bound on the length of a summary
+DEFAULT_CHUNK_CHARS = 16 * 1024  # Page text processed at a time
+DEFAULT_CANDIDATE_POOL = 48      # Best-scoring sentences kept while a page is scanned
+MAX_TERMS = 20000                # Term counts kept per page; the rarest are pruned beyond this
+MAX_PARAGRAPH_CHARS = 4000       # Text without a paragraph break is split here
+MIN_SENTENCE_WORDS = 6           # Shorter lines are mostly navigation, buttons and labels
+MAX_SENTENCE_WORDS = 60
+REDUNDANCY_SIMILARITY = 0.6      # Cosine similarity at which a sentence repeats one already chosen
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 30
+DEFAULT_BATCH_TOKENS = 6000      # Page text per batched summary request
+DEFAULT_PAGE_TOKENS = 500        # Digest of one page within a batch
+DEFAULT_DIGEST_SENTENCES = 12
+DEFAULT_BATCH_CONCURRENCY = 2
+STOPWORDS = frozenset(
+    "a about above after again all also am an and any are as at be because been before being below between both but by "
+    "can could did do does doing down during each few for from further had has have having he her here hers him his how "
+    "i if in into is it its itself just me more most my no nor not now of off on once only or other our ours out over "
+    "own same she should so some such than that the their theirs them then there these they this those through to too "
+    "under until up very was we were what when where which while who whom why will with would you your yours us get "
+    "use using used one two new learn read see click".split()
+)
+
+_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_TAG = re.compile(r"<[^>]+>")
+_MARKUP = re.compile(r"[*_`~>#|]+")
+_BULLET = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_TERM = re.compile(r"[a-z][a-z0-9'-]+")
+
+
+def _clean_line(line: str) -> str:
+    line = _BULLET.sub("", _IMAGE.sub("", line))
+    line = _MARKUP.sub(" ", _TAG.sub(" ", _URL.sub(" ", _LINK.sub(r"\1", line))))
+    return " ".join(line.split())
+
+
+def iter_paragraphs(content: Union[str, Iterable[str]], chunk_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Cleaned prose paragraphs of page markdown, given as one string or as an iterable of chunks. Only one chunk
+    and the paragraph in progress are held at a time. Headings, tables, code blocks and link-only lines are skipped.
+    """
+    chunks = (content[i:i + chunk_chars] for i in range(0, len(content), chunk_chars)) if isinstance(content, str) else content
+    carry, paragraph, size, in_code = "", [], 0, False
+    for chunk in chunks:
+        lines = (carry + chunk).split("\n")
+        carry = lines.pop() # Possibly cut in the middle; completed by the next chunk
+        for line in lines:
+            stripped = line.strip()
+            if stripped.startswith("```"):
+                in_code = not in_code
+                continue
+            is_break = (in_code or not stripped or stripped.startswith(("#", "|", "---", "===", "<"))
+                        or not _LINK.sub("", _IMAGE.sub("", stripped)).strip(" -*|•·"))
+            text = "" if is_break else _clean_line(stripped)
+            if text:
+                paragraph.append(text)
+                size += len(text) + 1
+            if (is_break or size > MAX_PARAGRAPH_CHARS) and paragraph:
+                yield " ".join(paragraph)
+                paragraph, size = [], 0
+    if carry.strip() and not in_code:
+        paragraph.append(_clean_line(carry.strip()))
+    if paragraph:
+        yield " ".join(paragraph)
+
+
+def iter_sentences(content: Union[str, Iterable[str]], chunk_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[str]:
+    """Sentences of the page's prose that are long enough to carry information, each once."""
+    seen = set()
+    for paragraph in iter_paragraphs(content, chunk_chars):
+        for sentence in _SENTENCE_END.split(paragraph):
+            words = sentence.split()
+            if not MIN_SENTENCE_WORDS <= len(words) <= MAX_SENTENCE_WORDS:
+                continue
+            key = hash(sentence.lower())
+            if key not in seen: # Footers and banners repeat on a page
+                seen.add(key)
+                yield sentence
+
+
+def _terms(sentence: str) -> List[str]:
+    return [term for term in _TERM.findall(sentence.lower()) if term not in STOPWORDS and len(term) > 2]
+
+
+class _Candidate:
+    __slots__ = ("position", "text", "counts")
+
+    def __init__(self, position: int, text: str, counts: Counter):
+        self.position, self.text, self.counts = position, text, counts
+
+
+class ExtractiveSummarizer:
+    """TF-IDF candidate selection over a bounded pool, then TextRank; see the module docstring"""
+    def __init__(self, max_sentences: int = DEFAULT_SUMMARY_SENTENCES, max_chars: int = DEFAULT_SUMMARY_CHARS,
+                 pool_size: int = DEFAULT_CANDIDATE_POOL, chunk_chars: int = DEFAULT_CHUNK_CHARS):
+        self.max_sentences = max(1, max_sentences)
+        self.max_chars = max_chars
+        self.pool_size = max(self.max_sentences, pool_size)
+        self.chunk_chars = chunk_chars
+
+    def summarize(self, content: Union[str, Iterable[str]]) -> str:
+        sentences = self.select(content)
+        summary, size = [], 0
+        for sentence in sentences:
+            if summary and size + len(sentence) + 1 > self.max_chars:
+                break
+            summary.append(sentence)
+            size += len(sentence) + 1
+        text = " ".join(summary)
+        return text if len(text) <= self.max_chars else text[:self.max_chars].rsplit(" ", 1)[0] + " …"
+
+    def select(self, content: Union[str, Iterable[str]]) -> List[str]:
+        """The summary sentences of `content`, in page order."""
+        document = Counter() # Sentences each term appears in
+        sentences = 0
+        pool: List[_Candidate] = []
+        for position, sentence in enumerate(iter_sentences(content, self.chunk_chars)):
+            counts = Counter(_terms(sentence))
+            if not counts:
+                continue
+            sentences += 1
+            document.update(counts.keys())
+            if len(document) > MAX_TERMS:
+                for term, count in list(document.items()):
+                    if count == 1:
+                        del document[term]
+            pool.append(_Candidate(position, sentence, counts))
+            if len(pool) >= 2 * self.pool_size: # Evict half at once, so rescoring is amortized
+                pool = self._best(pool, document, sentences, self.pool_size)
+        pool = self._best(pool, document, sentences, self.pool_size)
+        if len(pool) <= self.max_sentences:
+            return [c.text for c in sorted(pool, key=lambda c: c.position)]
+        chosen = self._textrank(pool, document, sentences)
+        return [c.text for c in sorted(chosen, key=lambda c: c.position)]
+
+    @staticmethod
+    def _idf(document: Counter, sentences: int) -> Callable[[str], float]:
+        return lambda term: math.log((1 + sentences) / (1 + document.get(term, 0))) + 1.0
+
+    def _best(self, pool: List[_Candidate], document: Counter, sentences: int, size: int) -> List[_Candidate]:
+        """The `size` candidates whose terms best represent the page so far: mean of each term's page-level TF-IDF."""
+        if len(pool) <= size:
+            return pool
+        idf = self._idf(document, sentences)
+        def score(candidate: _Candidate) -> float:
+            weights = [document.get(term, 1) * idf(term) for term in candidate.counts]
+            return sum(weights) / (len(weights) + 2) # Smoothed mean: a single rare term doesn't win
+        return sorted(pool, key=score, reverse=True)[:size]
+
+    def _textrank(self, pool: List[_Candidate], document: Counter, sentences: int) -> List[_Candidate]:
+        idf = self._idf(document, sentences)
+        vectors = []
+        for candidate in pool:
+            vector = {term: count * idf(term) for term, count in candidate.counts.items()}
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            vectors.append({term: w / norm for term, w in vector.items()})
+        n = len(pool)
+        similarity = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(i + 1, n):
+                a, b = (vectors[i], vectors[j]) if len(vectors[i]) < len(vectors[j]) else (vectors[j], vectors[i])
+                similarity[i][j] = similarity[j][i] = sum(w * b[term] for term, w in a.items() if term in b)
+        totals = [sum(row) or 1.0 for row in similarity]
+        ranks = [1.0 / n] * n
+        for _ in range(TEXTRANK_ITERATIONS):
+            ranks = [(1 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * sum(similarity[j][i] / totals[j] * ranks[j] for j in range(n))
+                     for i in range(n)]
+        # Earlier sentences (the page's lead) break near-ties
+        order = sorted(range(n), key=lambda i: ranks[i] * (1 + 0.5 / (1 + pool[i].position)), reverse=True)
+        chosen: List[int] = []
+        for i in order:
+            if all(similarity[i][j] < REDUNDANCY_SIMILARITY for j in chosen):
+                chosen.append(i)
+            if len(chosen) == self.max_sentences:
+                break
+        return [pool[i] for i in chosen]
+
+
+def extractive_summary(content: Union[str, Iterable[str]], max_sentences: int = DEFAULT_SUMMARY_SENTENCES,
+                       max_chars: int = DEFAULT_SUMMARY_CHARS) -> str:
+    """Summary of a page made of its most representative sentences; empty when the page has no prose."""
+    return ExtractiveSummarizer(max_sentences, max_chars).summarize(content)
+
+
+class SummaryBatcher:
+    """
+    Packs pages into batched summary requests within a token budget. `summarize_batch(pages)` gets (id, digest)
+    pairs and returns {id: summary}; it runs on worker threads. add() may send a batch; results() waits for all.
+    """
+    def __init__(self, summarize_batch: Callable[[Sequence[Tuple[str, str]]], Dict[str, str]],
+                 batch_tokens: int = DEFAULT_BATCH_TOKENS, page_tokens: int = DEFAULT_PAGE_TOKENS,
+                 concurrency: int = DEFAULT_BATCH_CONCURRENCY, provider: str = "openai", model_id: Optional[str] = None):
+        self.summarize_batch = summarize_batch
+        self.batch_tokens = batch_tokens
+        self.page_tokens = min(page_tokens, batch_tokens)
+        self.provider, self.model_id = provider, model_id
+        self.batches = 0
+        self._pending: List[Tuple[str, str]] = []
+        self._pending_tokens = 0
+        self._fallbacks: Dict[str, str] = {} # Extractive summary of every page, used when its batch fails
+        self._futures: List[Tuple[List[str], Future]] = []
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="summary-batch")
+        self._lock = threading.Lock()
+
+    def add(self, key: str, content: str) -> None:
+        """Queues a page; only its digest is kept, so memory grows with the budget rather than the page sizes."""
+        # ~4 characters per token bounds the digest before its exact token count is taken
+        digest = truncate_to_tokens(ExtractiveSummarizer(DEFAULT_DIGEST_SENTENCES, self.page_tokens * 4).summarize(content),
+                                    self.page_tokens, self.provider, self.model_id)
+        tokens = estimate_tokens(digest, self.provider, self.model_id)
+        with self._lock:
+            self._fallbacks[key] = extractive_summary(digest) or NO_SUMMARY
+            if self._pending and self._pending_tokens + tokens > self.batch_tokens:
+                self._send()
+            self._pending.append((key, digest))
+            self._pending_tokens += tokens
+
+    def _send(self) -> None:
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        self.batches += 1
+        self._futures.append(([key for key, _ in batch], self._executor.submit(self.summarize_batch, batch)))
+
+    def results(self) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Sends the last batch and waits for every batch. Returns the summary of every page added, and the errors of
+        batches that failed (their pages get the extractive summary).
+        """
+        with self._lock:
+            if self._pending:
+                self._send()
+        summaries, errors = {}, []
+        try:
+            for keys, future in self._futures:
+                try:
+                    summaries.update({key: text for key, text in (future.result() or {}).items() if key in keys and text})
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            self.close()
+        return {key: summaries.get(key) or fallback for key, fallback in self._fallbacks.items()}, errors
+
+    def close(self) -> None:
+        """Drops batches not yet started, e.g. when the run is cancelled before results()."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
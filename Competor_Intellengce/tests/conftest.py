@@ -0,0 +1,41 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# The app's modules import each other as top-level modules (they run from this directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """Stands in for the time module: time()/monotonic() only move when advanced, sleep() advances them"""
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def patch_time(monkeypatch, clock):
+    """Replaces the `time` module of the given app modules with the fake clock."""
+    def patch(*modules):
+        for module in modules:
+            monkeypatch.setattr(module, "time", SimpleNamespace(time=clock.time, monotonic=clock.monotonic,
+                                                               sleep=clock.sleep, strftime=lambda *a: ""))
+        return clock
+    return patch
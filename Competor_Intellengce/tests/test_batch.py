@@ -0,0 +1,52 @@
+import json
+import sys
+
+from batch import Checkpoint, JsonlReportWriter, serialize_report
+from comparison import ComparisonTable
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resumed_companies_keep_only_their_latest_record(tmp_path):
+    path = str(tmp_path / "reports.jsonl")
+    writer = JsonlReportWriter(path)
+    writer.write({"id": "acme", "status": "failed"})
+    writer.write({"id": "globex", "status": "ok"})
+    writer.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": "initech", "sta') # Torn line from an interrupted write
+
+    writer = JsonlReportWriter(path) # Resume: the failed company is retried
+    writer.write({"id": "acme", "status": "ok"})
+    writer.close()
+    assert read_records(path) == [{"id": "globex", "status": "ok"}, {"id": "acme", "status": "ok"}]
+
+
+def test_checkpoint_retries_failed_companies_on_resume(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.record("acme", "ok")
+    checkpoint.record("globex", "failed")
+    resumed = Checkpoint(path)
+    assert resumed.is_done("acme") and not resumed.is_done("globex")
+    assert resumed.is_done("globex", retry_failed=False)
+
+
+def test_report_without_competitors_is_serialized_without_pandas(monkeypatch):
+    from competitor_agent_team import CompetitorIntelligenceTeam
+    monkeypatch.setitem(sys.modules, "pandas", None) # Importing it now raises ImportError
+    report = CompetitorIntelligenceTeam().generate_intelligence_report([])
+    assert serialize_report(report) == {"competitors": [], "analysis": {}, "analysis_error": None,
+                                        "comparison_table": [], "changes": None}
+
+
+def test_comparison_rows_are_serialized_without_pandas(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pandas", None)
+    table = ComparisonTable([{"name": "Acme", "url": "https://acme.test", "description": "Rockets",
+                              "metadata": {"technologies": "React, Go", "founded": "est. 2012"}}])
+    assert serialize_report({"comparison": table})["comparison_table"] == [{
+        "Company": "Acme", "Website": "https://acme.test", "Description": "Rockets", "Summary": "N/A",
+        "Technologies": "React, Go", "Team Size": None, "Founded": 2012}]
@@ -0,0 +1,77 @@
+import os
+
+import cache
+from cache import CrawlCache, DiskCache, MemoryLRU, ResponseCache, normalize_url
+
+
+def test_disk_cache_expires_entries_after_ttl(tmp_path, patch_time):
+    clock = patch_time(cache)
+    store = DiskCache(str(tmp_path / "c.sqlite"), ttl_seconds=60)
+    store.set("k", {"v": 1})
+    clock.advance(59)
+    assert store.get("k") == {"v": 1}
+    clock.advance(2)
+    assert store.get("k") is None
+    assert store.peek("k") is None # Expired entries are deleted on read
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+
+
+def test_peek_returns_expired_entries_without_counting(tmp_path, patch_time):
+    clock = patch_time(cache)
+    store = DiskCache(str(tmp_path / "c.sqlite"), ttl_seconds=10)
+    store.set("k", "old")
+    clock.advance(11)
+    assert store.peek("k") == "old"
+    assert store.stats()["hits"] == store.stats()["misses"] == 0
+
+
+def test_disk_cache_evicts_least_recently_used_over_byte_budget(tmp_path, patch_time):
+    clock = patch_time(cache)
+    value = "x" * 100 # 102 bytes as JSON
+    store = DiskCache(str(tmp_path / "c.sqlite"), max_bytes=350)
+    for key in ("a", "b", "c"):
+        store.set(key, value)
+        clock.advance(1)
+    store.get("a") # "b" is now the least recently used
+    clock.advance(1)
+    store.set("d", value)
+    assert store.peek("b") is None
+    assert all(store.peek(key) == value for key in ("a", "c", "d"))
+    assert store.stats()["evictions"] == 1
+
+
+def test_disk_cache_skips_values_larger_than_the_budget(tmp_path):
+    store = DiskCache(str(tmp_path / "c.sqlite"), max_bytes=50)
+    store.set("small", "x")
+    store.set("huge", "x" * 100)
+    assert store.peek("huge") is None and store.peek("small") == "x"
+
+
+def test_crawl_cache_is_keyed_by_normalized_url(tmp_path):
+    crawls = CrawlCache(str(tmp_path / "crawl.sqlite"))
+    crawls.put_crawl("https://WWW.Example.com/?utm_source=x", {"content": "page"}, summary="s")
+    entry = crawls.get_crawl("https://www.example.com")
+    assert entry["summary"] == "s" and entry["content_hash"]
+    assert normalize_url("https://www.example.com/?utm_source=x") == normalize_url("https://www.example.com")
+
+
+def test_memory_lru_bounds_entries_and_bytes():
+    lru = MemoryLRU(max_entries=2, max_bytes=10)
+    lru.set("a", "1234")
+    lru.set("b", "1234")
+    lru.get("a")
+    lru.set("c", "1234")
+    assert lru.get("b") is None and lru.get("a") == "1234"
+    lru.set("d", "123456789")
+    assert lru.stats()["bytes"] <= 10 and lru.stats()["entries"] == 1
+
+
+def test_response_cache_promotes_disk_hits_and_returns_copies(tmp_path):
+    disk = DiskCache(os.path.join(tmp_path, "llm.sqlite"))
+    key = ResponseCache.make_key("openai", "gpt-4o", "prompt")
+    ResponseCache(MemoryLRU(), disk).set(key, {"strengths": ["a"]})
+    responses = ResponseCache(MemoryLRU(), disk)
+    value = responses.get(key)
+    value["strengths"].append("mutated")
+    assert responses.memory.stats()["entries"] == 1
+    assert responses.get(key) == {"strengths": ["a"]}
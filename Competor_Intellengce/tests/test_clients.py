@@ -0,0 +1,88 @@
+import pytest
+
+import clients
+from clients import ClientRegistry, _Entry
+
+
+class FakeHTTP:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRegistry(ClientRegistry):
+    """Builds placeholder clients instead of importing provider SDKs"""
+    def _build(self, provider, api_key, base_url):
+        return _Entry(object(), FakeHTTP())
+
+    def _http_client(self):
+        return FakeHTTP()
+
+
+class OwnHTTPStackSDK(FakeHTTP):
+    """An SDK client that rejects an injected httpx.Client"""
+    def __init__(self, http_client=None, **kwargs):
+        if http_client is not None:
+            raise TypeError("Invalid http_client argument")
+        super().__init__()
+        self.kwargs = kwargs
+
+
+@pytest.fixture
+def registry(patch_time):
+    patch_time(clients)
+    return FakeRegistry(idle_ttl=60)
+
+
+def test_clients_are_shared_per_provider_key_and_base_url(registry):
+    client = registry.get("openai", "key-1")
+    assert registry.get("OpenAI", "key-1") is client
+    assert registry.get("openai", "key-2") is not client
+    assert registry.get("openai", "key-1", base_url="http://proxy") is not client
+    assert registry.stats() == {"clients": 3}
+
+
+def test_idle_clients_are_evicted_and_closed(registry, clock):
+    registry.get("openai", "key")
+    entry = next(iter(registry._entries.values()))
+    clock.advance(61)
+    registry.get("anthropic", "key")
+    assert entry.http_client.closed and registry.stats() == {"clients": 1}
+
+
+def test_leased_clients_are_never_evicted(registry, clock):
+    with registry.lease("openai", "key") as client:
+        entry = next(iter(registry._entries.values()))
+        clock.advance(600) # A long streamed request
+        registry.get("anthropic", "key")
+        assert not entry.http_client.closed
+        assert registry.get("openai", "key") is client
+    clock.advance(61) # Idle time counts from the end of the lease
+    registry.get("anthropic", "key")
+    assert entry.http_client.closed
+
+
+def test_sdk_rejecting_the_pooled_http_client_keeps_its_own(registry):
+    entry = registry._sdk_entry(OwnHTTPStackSDK, api_key="key")
+    assert isinstance(entry.client, OwnHTTPStackSDK) and entry.http_client is entry.client
+    assert entry.client.kwargs["max_retries"] == clients.SDK_MAX_RETRIES
+
+
+def test_client_built_concurrently_is_discarded(registry):
+    built = []
+    def build(provider, api_key, base_url):
+        entry = _Entry(object(), FakeHTTP())
+        built.append(entry)
+        if len(built) == 1: # Another session builds the same client while this one is building
+            registry.get(provider, api_key, base_url)
+        return entry
+    registry._build = build
+    assert registry.get("openai", "key") is built[1].client
+    assert built[0].http_client.closed and registry.stats() == {"clients": 1}
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        ClientRegistry().get("acme-llm", "key")
@@ -0,0 +1,79 @@
+import importlib.util
+import random
+
+import pytest
+
+from dedupe import Deduplicator, DomainIndex, canonical_url, minhash, near_duplicate_groups, site_host
+
+requires_numpy = pytest.mark.skipif(importlib.util.find_spec("numpy") is None, reason="MinHash needs numpy")
+
+
+def page(seed, words=400):
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DomainIndex(str(tmp_path / "domains.sqlite"))
+
+
+def test_canonical_url_merges_host_locale_index_and_tracking_variants():
+    variants = ["https://www.acme.com/en-us/", "http://acme.com/index.html?utm_source=x", "acme.com", "https://m.acme.com/#top"]
+    assert {canonical_url(url) for url in variants} == {"https://acme.com/"}
+    assert canonical_url("https://acme.com/pricing?b=2&a=1") == "https://acme.com/pricing?a=1&b=2"
+    assert canonical_url("https://acme.io", {"acme.io": "acme.com"}) == "https://acme.com/"
+    assert site_host("https://WWW.Acme.com/en") == "acme.com"
+
+
+def test_merge_urls_keeps_the_first_competitor_and_drops_the_users_own_site():
+    competitors = [{"url": "https://acme.com", "name": "Acme"}, {"url": "https://www.acme.com/en/", "description": "d"},
+                   {"url": "https://me.com/"}, {"name": "No URL"}]
+    merged = Deduplicator().merge_urls(competitors, exclude="https://www.me.com")
+    assert [c.get("url") for c in merged] == ["https://acme.com", None]
+    assert merged[0]["aliases"] == ["https://www.acme.com/en/"] and merged[0]["description"] == "d"
+
+
+@requires_numpy
+def test_minhash_finds_near_duplicates_but_not_distinct_pages():
+    base = page(1)
+    edited = base.replace("word1 ", "changed ", 3)
+    signatures = [minhash(base), minhash(page(2)), minhash(edited), minhash("too short to compare")]
+    assert signatures[3] is None
+    assert near_duplicate_groups(signatures, threshold=0.8) == {0: [2]}
+
+
+@requires_numpy
+def test_merge_content_merges_duplicates_within_the_run_only(index):
+    base = page(1)
+    competitors = [{"url": "https://acme.com", "name": "Acme"}, {"url": "https://acme-mirror.net", "name": "Mirror"},
+                   {"url": "https://other.com", "name": "Other"}]
+    signatures = {"https://acme.com": minhash(base), "https://acme-mirror.net": minhash(base + " extra words"),
+                  "https://other.com": minhash(page(2))}
+    merged = Deduplicator(index).merge_content(competitors, signatures)
+    assert [c["name"] for c in merged] == ["Acme", "Other"]
+    assert merged[0]["aliases"] == ["https://acme-mirror.net"]
+    # A content match is not persisted: later runs crawl the "mirror" again instead of dropping it up front
+    assert index.aliases(["acme-mirror.net"]) == {}
+    later = Deduplicator(index).merge_urls([{"url": "https://acme.com"}, {"url": "https://acme-mirror.net"}])
+    assert len(later) == 2
+
+
+def test_redirects_are_persisted_as_aliases(index):
+    competitors = [{"url": "https://old-brand.com", "metadata": {"url": "https://www.new-brand.com/home"}},
+                   {"url": "https://new-brand.com"}]
+    Deduplicator(index).merge_content(competitors, {c["url"]: None for c in competitors})
+    assert index.aliases(["old-brand.com"]) == {"old-brand.com": "new-brand.com"}
+    merged = Deduplicator(index).merge_urls([{"url": "https://new-brand.com"}, {"url": "https://old-brand.com"}])
+    assert len(merged) == 1 and merged[0]["aliases"] == ["https://old-brand.com"]
+    assert index.stats() == {"domains": 2, "aliases": 1}
+
+
+def test_alias_chains_are_followed_and_cycles_rejected(index):
+    index.record(["a.com"], {"a.com": "b.com"})
+    index.record(["b.com"], {"b.com": "c.com"})
+    assert index.aliases(["a.com"]) == {"a.com": "c.com"}
+    index.record(["c.com"], {"c.com": "a.com"}) # Would point back at its own alias
+    assert index.aliases(["c.com"]) == {}
+
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from jobs import CANCELLED, DONE, FAILED, Job, JobCancelled, JobLimitError, JobRunner, JobStore
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = JobRunner(max_workers=2, max_jobs_per_user=1, store=JobStore(str(tmp_path / "jobs.sqlite")))
+    yield runner
+    runner._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def wait_finished(runner, job, user):
+    """The job as loaded from the store, once the runner has finished with it."""
+    for _ in range(200):
+        if job.id not in {active.id for active in runner.active(user)}:
+            return runner.get(job.id, user)
+        threading.Event().wait(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_finished_job_is_only_visible_to_its_owner(runner):
+    job = runner.submit("alice", "Acme", lambda job: {"report": "secret"})
+    finished = wait_finished(runner, job, "alice")
+    assert finished.status == DONE and finished.result == {"report": "secret"}
+    assert runner.get(job.id, "mallory") is None
+    assert runner.store.load(job.id, "mallory") is None
+    assert [j.id for j in runner.store.recent("alice")] == [job.id]
+    assert runner.store.recent("mallory") == []
+
+
+def test_active_job_is_only_visible_and_cancellable_by_its_owner(runner):
+    release = threading.Event()
+    def work(job):
+        while not release.wait(0.01):
+            job.raise_if_cancelled()
+        return {}
+    job = runner.submit("alice", "Acme", work)
+    try:
+        assert runner.get(job.id, "alice") is job
+        assert runner.get(job.id, "mallory") is None
+        assert runner.cancel(job.id, "mallory") is False
+        assert not job.cancel_event.is_set()
+        assert runner.cancel(job.id, "alice") is True
+        assert wait_finished(runner, job, "alice").status == CANCELLED
+    finally:
+        release.set()
+
+
+def test_per_user_limit_counts_queued_and_running_jobs(runner):
+    release = threading.Event()
+    first = runner.submit("alice", "first", lambda job: release.wait(5) and {})
+    try:
+        with pytest.raises(JobLimitError):
+            runner.submit("alice", "second", lambda job: {})
+        other = runner.submit("bob", "other", lambda job: {}) # Limits are per user
+        assert wait_finished(runner, other, "bob").status == DONE
+    finally:
+        release.set()
+    wait_finished(runner, first, "alice")
+    runner.submit("alice", "third", lambda job: {}) # The finished job no longer counts
+
+
+def test_failed_and_cancelled_outcomes_are_stored(runner):
+    failed = runner.submit("alice", "boom", lambda job: 1 / 0)
+    assert wait_finished(runner, failed, "alice").error.startswith("ZeroDivisionError")
+    assert runner.get(failed.id, "alice").status == FAILED
+    def cancelled(job):
+        job.cancel_event.set()
+        raise JobCancelled()
+    job = runner.submit("alice", "stop", cancelled)
+    assert wait_finished(runner, job, "alice").status == CANCELLED
+
+
+def test_job_cancelled_before_it_starts_is_finished(runner):
+    job = Job("alice", "Acme") # Cancelled once a worker had picked it up, so future.cancel() failed
+    runner._jobs[job.id] = job
+    job.cancel_event.set()
+    runner._run(job, lambda job: {})
+    assert runner.active("alice") == []
+    assert runner.get(job.id, "alice").status == CANCELLED
+
+
+def test_job_messages_and_progress_are_recorded(runner):
+    def work(job):
+        job.reporter.info("Crawling")
+        job.reporter.progress(0.5, "Halfway")
+        assert job.progress == (0.5, "Halfway")
+        return {}
+    job = runner.submit("alice", "Acme", work)
+    assert ("info", "Crawling") in wait_finished(runner, job, "alice").messages
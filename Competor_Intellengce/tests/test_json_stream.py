@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from json_stream import IncrementalObjectParser, extract_json_object, is_partial
+
+OBJECT = ('{"strengths": ["Fast, \\"reliable\\" {setup}", "Big [team]"], "score": 12, '
+          '"meta": {"a": [1, {"b": null}]}, "flag": true, "note": "done"}')
+REPLY = "```json\n" + OBJECT + "\n```"
+
+
+def feed_all(chunks):
+    parser = IncrementalObjectParser()
+    sections = []
+    for chunk in chunks:
+        sections.extend(parser.feed(chunk))
+    return parser, sections
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(REPLY)])
+def test_incremental_parser_reports_each_member_across_chunk_boundaries(size):
+    parser, sections = feed_all(REPLY[i:i + size] for i in range(0, len(REPLY), size))
+    assert sections == list(json.loads(OBJECT).items())
+    assert parser.done and parser.text == REPLY
+
+
+def test_incremental_parser_emits_members_as_soon_as_they_close():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"a": [1, 2') == []
+    assert parser.feed('], "b": "x') == [("a", [1, 2])]
+    assert parser.feed('", "c": 3') == [("b", "x")]
+    assert parser.feed("}") == [("c", 3)]
+
+
+def test_incremental_parser_holds_back_a_cut_off_member():
+    _, sections = feed_all(['{"a": ["x"], "b": ["y", "z'])
+    assert sections == [("a", ["x"])]
+
+
+def test_extract_json_object_skips_preamble_fences_and_trailing_commas():
+    value = extract_json_object('Sure! Here it is:\n```json\n{"a": [1, 2,], "b": {"c": "}"},}\n```')
+    assert value == {"a": [1, 2], "b": {"c": "}"}}
+    assert not is_partial(value)
+
+
+def test_extract_json_object_returns_none_without_an_object():
+    assert extract_json_object("no JSON here") is None
+    assert extract_json_object("[1, 2]") is None
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ('{"a": ["x"], "b": ["y", "z', {"a": ["x"]}),          # Cut inside the trailing array
+    ('{"a": ["x"], "b": {"c": [1', {"a": ["x"]}),          # Cut inside a nested value
+    ('{"a": 12', {}),                                       # Cut in a trailing scalar, which may be incomplete
+    ('{"a": "x", "b": 3,', {"a": "x", "b": 3}),             # Cut after a finished member
+    ('{"a": ["x"], "b": ["y"]', {"a": ["x"], "b": ["y"]}),  # Only the closing brace is missing
+    ('{"a": "say \\"hi\\"", "b": "unfinish', {"a": 'say "hi"'}),
+])
+def test_truncated_replies_keep_finished_members_and_are_marked_partial(reply, expected):
+    value = extract_json_object(reply)
+    assert value == expected
+    assert is_partial(value)
+
+
+def test_complete_replies_are_not_partial():
+    assert not is_partial(extract_json_object('{"a": 1}'))
+    assert not is_partial({"a": 1})
@@ -0,0 +1,35 @@
+from prompt_budget import (TRUNCATION_MARKER, compact_metadata, estimate_tokens, fair_share, find_shared_sentences,
+                           prompt_token_budget, remove_sentences, truncate_to_tokens)
+
+
+def test_fair_share_gives_small_items_their_size_and_splits_the_rest():
+    assert fair_share([10, 100, 1000], 300) == [10, 100, 190]
+    assert fair_share([500, 500], 300) == [150, 150]
+    assert fair_share([500, 500], 10, floor=20) == [20, 20]
+
+
+def test_truncate_to_tokens_cuts_at_a_word_boundary_within_budget():
+    text = "word " * 400
+    truncated = truncate_to_tokens(text, 50, "anthropic")
+    assert truncated.endswith(TRUNCATION_MARKER)
+    assert estimate_tokens(truncated, "anthropic") <= 50
+    assert truncate_to_tokens("short", 50) == "short"
+    assert truncate_to_tokens(text, 0) == ""
+
+
+def test_prompt_budget_respects_context_window_and_cap():
+    assert prompt_token_budget("gpt-4o", 8000) == 8000
+    assert prompt_token_budget("unknown-model", 10**6) < 10**6
+    assert prompt_token_budget("unknown-model", 10) == 1024
+
+
+def test_shared_sentences_are_found_once_and_removed_per_competitor():
+    boilerplate = "Trusted by thousands of teams worldwide."
+    texts = [[f"Acme sells billing tools. {boilerplate}"], [f"{boilerplate} Globex sells CRM software."], ["Unique."]]
+    assert find_shared_sentences(texts) == [boilerplate]
+    assert remove_sentences(texts[0][0], [boilerplate]) == "Acme sells billing tools."
+
+
+def test_compact_metadata_drops_empty_values():
+    assert compact_metadata({"tech": ["React", "", "N/A"], "size": "N/A", "hq": {"city": "Berlin", "zip": None}}) == \
+        "tech=React; hq=city=Berlin"
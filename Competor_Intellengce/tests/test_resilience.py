@@ -0,0 +1,121 @@
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, ProviderError, Resilience, TokenBucket, is_retryable, retry_after
+
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        # httpx headers are case-insensitive; a plain dict holds them lower-cased as the SDKs send them
+        self.response = type("Response", (), {"status_code": status, "headers": headers or {}})()
+
+
+@pytest.fixture
+def clock(patch_time):
+    return patch_time(resilience)
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow() is None
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow() == pytest.approx(30)
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.state == "half-open"
+    assert breaker.allow() is None  # The trial
+    assert breaker.allow() == 0.0   # Everyone else waits for its outcome
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() is None
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.advance(31)
+    assert breaker.allow() is None
+    breaker.record_failure() # One failure is enough while half-open
+    assert breaker.state == "open"
+    assert breaker.allow() == pytest.approx(30)
+
+
+def test_call_retries_transient_errors_then_succeeds(clock):
+    outcomes = [HTTPError(503), HTTPError(429, {"retry-after": "2"}), "ok"]
+    def request():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    calls = Resilience(max_attempts=3, base_delay=0.1)
+    started = clock.now
+    assert calls.call("svc", "key", request) == "ok"
+    assert clock.now - started >= 2 # Retry-After was honored
+    assert calls.breaker("svc").state == "closed"
+
+
+def test_call_does_not_retry_rejected_requests(clock):
+    attempts = []
+    def request():
+        attempts.append(1)
+        raise HTTPError(400)
+    with pytest.raises(ProviderError, match="HTTP 400"):
+        Resilience().call("svc", "key", request)
+    assert len(attempts) == 1
+
+
+def test_call_reraises_errors_that_are_not_from_the_service(clock):
+    calls = Resilience(max_attempts=1)
+    def failing():
+        raise HTTPError(503)
+    with pytest.raises(ProviderError):
+        calls.call("svc", "key", failing)
+    def bug():
+        raise KeyError("choices")
+    with pytest.raises(KeyError):
+        calls.call("svc", "key", bug)
+    assert calls.breaker("svc").failures == 1 # Neither a success nor a failure of the service
+
+
+def test_call_fails_fast_once_the_breaker_is_open(clock):
+    calls = Resilience(max_attempts=1)
+    def failing():
+        raise HTTPError(503)
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(ProviderError):
+            calls.call("svc", "key", failing)
+    with pytest.raises(CircuitOpenError):
+        calls.call("svc", "key", lambda: "never sent")
+    assert calls.breaker_states() == {"svc": "open"}
+
+
+def test_retry_classification():
+    assert is_retryable(HTTPError(429)) and is_retryable(TimeoutError())
+    assert not is_retryable(HTTPError(401))
+    assert retry_after(HTTPError(429, {"retry-after": "7"})) == 7
+
+
+def test_token_bucket_waits_once_the_burst_is_spent(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    started = clock.now
+    bucket.acquire()
+    assert clock.now - started == pytest.approx(0.5)
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from routing import HedgedRouter, LatencyTracker, RequestCancelled, RoutingError
+from tracing import Tracer
+
+
+class Route:
+    """Fake agent whose reply takes `delay` seconds; it checks its cancel event like a streamed request does"""
+    def __init__(self, provider, delay=0.0, reply="ok", error=None):
+        self.provider, self.model_id = provider, "model"
+        self.delay, self.reply, self.error = delay, reply, error
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+
+    def complete_text(self, prompt, cancel_event):
+        self.started.set()
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline:
+            if cancel_event.is_set():
+                self.cancelled.set()
+                raise RequestCancelled()
+            time.sleep(0.005)
+        if self.error:
+            raise self.error
+        return self.reply
+
+
+def router(routes, **kwargs):
+    kwargs.setdefault("default_hedge_delay", 0.05)
+    return HedgedRouter(routes, tracker=LatencyTracker(), **kwargs)
+
+
+def test_slow_primary_is_hedged_and_cancelled_when_the_hedge_wins():
+    slow, fast = Route("slow", delay=2.0, reply="slow"), Route("fast", delay=0.0, reply="fast")
+    text, winner = router([slow, fast]).complete("prompt", validate=bool)
+    assert (text, winner) == ("fast", fast)
+    assert slow.cancelled.wait(1.0)
+
+
+def test_failed_route_fails_over_without_waiting_for_the_hedge_delay():
+    broken, backup = Route("broken", error=RuntimeError("down")), Route("backup", reply="fine")
+    started = time.monotonic()
+    text, winner = router([broken, backup], default_hedge_delay=10).complete("prompt", validate=bool)
+    assert winner is backup and time.monotonic() - started < 1.0
+
+
+def test_invalid_replies_fall_back_to_the_last_one_and_all_failures_raise():
+    first, second = Route("a", reply="bad"), Route("b", reply="worse")
+    text, _ = router([first, second]).complete("prompt", validate=lambda text: False)
+    assert text in ("bad", "worse")
+    with pytest.raises(RoutingError, match="All providers failed"):
+        router([Route("a", error=RuntimeError("x"))]).complete("prompt", validate=bool)
+
+
+def test_cancelling_the_job_cancels_every_route_in_flight():
+    job_cancel = threading.Event()
+    primary, hedge = Route("primary", delay=5.0), Route("hedge", delay=5.0)
+    threading.Timer(0.2, job_cancel.set).start()
+    started = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        router([primary, hedge], cancel_event=job_cancel).complete("prompt", validate=bool)
+    assert time.monotonic() - started < 2.0
+    assert primary.cancelled.wait(1.0) and hedge.cancelled.wait(1.0)
+
+
+def test_routes_are_not_started_once_the_job_is_cancelled():
+    job_cancel = threading.Event()
+    job_cancel.set()
+    late = Route("late")
+    with pytest.raises(RequestCancelled):
+        router([late], cancel_event=job_cancel).complete("prompt", validate=bool)
+    assert not late.started.is_set()
+
+
+def test_route_spans_nest_under_the_callers_span():
+    tracer = Tracer()
+    class TracedRoute(Route):
+        def complete_text(self, prompt, cancel_event):
+            with tracer.span("llm", provider=self.provider):
+                return super().complete_text(prompt, cancel_event)
+    with tracer.span("analysis") as analysis:
+        router([TracedRoute("a")], tracer=tracer).complete("prompt", validate=bool)
+    llm = next(record for record in tracer.records() if record["name"] == "llm")
+    assert llm["parent_id"] == analysis.span_id
+
+
+def test_agent_waiting_for_a_slot_does_not_send_once_cancelled(monkeypatch):
+    from competitor_agent_team import AnalysisAgent
+    slots = threading.Semaphore(1)
+    agent = AnalysisAgent("openai", api_key=None, model_id="gpt-4o", llm_slots=slots)
+    sent = []
+    monkeypatch.setattr(agent, "_iter_completion_stream", lambda prompt: sent.append(prompt) or iter(["{}"]))
+    cancel = threading.Event()
+    outcome = []
+    slots.acquire() # Every slot is taken
+    worker = threading.Thread(target=lambda: outcome.append(_run(agent.complete_text, "prompt", cancel)))
+    worker.start()
+    time.sleep(0.05)
+    cancel.set()
+    slots.release()
+    worker.join(2.0)
+    assert outcome == [RequestCancelled] and sent == []
+
+
+def test_latency_tracker_ranks_healthy_fast_routes_first():
+    tracker = LatencyTracker()
+    fast, slow, flaky = Route("fast"), Route("slow"), Route("flaky")
+    for _ in range(5):
+        tracker.record(("fast", "model"), 0.1, True)
+        tracker.record(("slow", "model"), 1.0, True)
+        tracker.record(("flaky", "model"), 0.01, False)
+    ranked = HedgedRouter([flaky, slow, fast], tracker=tracker).ranked()
+    assert ranked == [fast, slow, flaky]
+    assert tracker.percentile(("slow", "model"), 95) == 1.0
+
+
+def _run(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return type(e)
@@ -0,0 +1,61 @@
+import pytest
+
+from snapshots import SnapshotStore, change_report, company_key, subject_key
+
+ANALYZER = "openai/gpt-4o"
+
+
+def competitor(name, content_hash):
+    return {"name": name, "url": f"https://{name}.com", "content_hash": content_hash, "summary": f"{name} summary"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / "snapshots.sqlite"))
+
+
+def test_unchanged_fragments_are_reused_and_changed_competitors_reanalyzed(store):
+    subject = subject_key("https://me.com", True)
+    a, b, c = competitor("a", "h1"), competitor("b", "h2"), competitor("c", "h3")
+    store.record(subject, [a, b, c], [([a, b], {"strengths": ["ab"]}), ([c], {"strengths": ["c"]})], ANALYZER)
+
+    fragments, todo = store.plan(subject, [a, b, competitor("c", "changed")], ANALYZER)
+    assert fragments == [([a, b], {"strengths": ["ab"]})]
+    assert [x["name"] for x in todo] == ["c"]
+
+
+def test_a_change_invalidates_the_whole_fragment_it_belongs_to(store):
+    subject = subject_key("We sell shoes", False)
+    a, b = competitor("a", "h1"), competitor("b", "h2")
+    store.record(subject, [a, b], [([a, b], {"strengths": ["ab"]})], ANALYZER)
+    fragments, todo = store.plan(subject, [a, competitor("b", "new")], ANALYZER)
+    assert fragments == [] and [x["name"] for x in todo] == ["a", "b"]
+
+
+def test_fragments_are_not_reused_across_models_or_inputs(store):
+    a = competitor("a", "h1")
+    store.record("subject-1", [a], [([a], {"strengths": ["a"]})], ANALYZER)
+    assert store.plan("subject-1", [a], "anthropic/claude")[0] == []
+    assert store.plan("subject-2", [a], ANALYZER)[0] == []
+
+
+def test_failed_crawls_keep_the_last_snapshot(store):
+    store.record("s", [competitor("a", "h1")], [], ANALYZER)
+    store.record("s", [{"name": "a", "url": "https://a.com"}], [], ANALYZER) # Crawl failed: no content hash
+    snapshot = store.companies([{"url": "https://a.com"}])[company_key({"url": "https://a.com"})]
+    assert snapshot["content_hash"] == "h1" and snapshot["summary"] == "a summary"
+
+
+def test_change_report_lists_competitor_and_analysis_changes(store):
+    store.record_run("s", [competitor("a", "h1"), competitor("b", "h2")], {"strengths": ["Fast", "Cheap"]})
+    report = change_report(store.last_run("s"), [competitor("a", "h1"), competitor("c", "h3")],
+                           {"strengths": ["fast", "Global"]})
+    assert [x["name"] for x in report["added"]] == ["c"]
+    assert [x["name"] for x in report["removed"]] == ["b"]
+    assert report["unchanged"] == 1 and report["changed"] == []
+    assert report["analysis"]["strengths"] == {"added": ["Global"], "removed": ["Cheap"]}
+
+
+def test_first_run_reports_every_competitor_as_added():
+    report = change_report(None, [competitor("a", "h1")], {"strengths": ["x"]})
+    assert len(report["added"]) == 1 and report["analysis"] == {}
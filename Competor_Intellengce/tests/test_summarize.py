@@ -0,0 +1,83 @@
+import threading
+
+from summarize import NO_SUMMARY, ExtractiveSummarizer, SummaryBatcher, extractive_summary, iter_sentences
+
+PAGE = """# Acme Billing
+
+[Home](https://acme.com) | [Pricing](https://acme.com/pricing) | [Login](https://acme.com/login)
+
+Acme builds subscription billing software for small software companies and agencies.
+Our billing platform automates invoices, dunning and revenue reports for subscription businesses.
+Pricing starts at 49 dollars per month for teams that bill fewer than one thousand customers.
+
+| Plan | Price |
+|------|-------|
+| Starter | $49 |
+
+```js
+acme.charge({ amount: 4900 })
+```
+
+Subscription billing software from Acme integrates with Stripe, QuickBooks and Xero out of the box.
+Copyright 2024 Acme Inc. All rights reserved worldwide by the company.
+"""
+
+
+def test_sentences_skip_navigation_tables_and_code():
+    sentences = list(iter_sentences(PAGE))
+    assert sentences[0].startswith("Acme builds subscription billing software")
+    assert not any("Login" in s or "charge" in s or "Starter" in s for s in sentences)
+
+
+def test_chunked_input_gives_the_same_sentences_as_one_string():
+    chunks = [PAGE[i:i + 17] for i in range(0, len(PAGE), 17)]
+    assert list(iter_sentences(chunks)) == list(iter_sentences(PAGE))
+
+
+def test_summary_keeps_representative_sentences_in_page_order_within_max_chars():
+    summary = extractive_summary(PAGE, max_sentences=2)
+    assert "billing" in summary.lower()
+    assert summary.index("Acme") <= summary.index("billing")
+    assert len(extractive_summary(PAGE * 50, max_chars=120)) <= 120 + 2
+
+
+def test_candidate_pool_stays_bounded_on_long_pages(monkeypatch):
+    text = "\n\n".join(f"Sentence number {i} talks about billing topic {i % 7} for customers." for i in range(5000))
+    summarizer = ExtractiveSummarizer(max_sentences=3, pool_size=10)
+    pool_sizes = []
+    best = summarizer._best
+    monkeypatch.setattr(summarizer, "_best", lambda pool, *args: pool_sizes.append(len(pool)) or best(pool, *args))
+    assert 1 <= len(summarizer.select(text)) <= 3 # Near-repeats are dropped
+    assert len(pool_sizes) > 100 and max(pool_sizes) <= 20
+
+
+def test_page_without_prose_has_an_empty_summary():
+    assert extractive_summary("[Home](/) | [About](/about)") == ""
+
+
+def test_batcher_packs_pages_within_the_token_budget():
+    batches = []
+    lock = threading.Lock()
+    def summarize_batch(pages):
+        with lock:
+            batches.append([key for key, _ in pages])
+        return {key: f"summary of {key}" for key, _ in pages}
+    batcher = SummaryBatcher(summarize_batch, batch_tokens=300, page_tokens=100)
+    for i in range(6):
+        batcher.add(f"page{i}", PAGE)
+    summaries, errors = batcher.results()
+    assert errors == [] and summaries == {f"page{i}": f"summary of page{i}" for i in range(6)}
+    assert 1 < batcher.batches < 6
+    assert sorted(key for batch in batches for key in batch) == sorted(summaries)
+
+
+def test_failed_batch_falls_back_to_extractive_summaries():
+    def failing(pages):
+        raise RuntimeError("provider down")
+    batcher = SummaryBatcher(failing)
+    batcher.add("prose", PAGE)
+    batcher.add("links", "[Home](/) | [About](/about)")
+    summaries, errors = batcher.results()
+    assert errors == ["RuntimeError: provider down"]
+    assert "billing" in summaries["prose"].lower()
+    assert summaries["links"] == NO_SUMMARY
@@ -0,0 +1,206 @@
+"""
+Lightweight tracing for the competitor pipeline.
+
+A Tracer records one span per stage (discovery, each competitor's crawl, summarization, every LLM
+request, response parsing, the comparison table) with its duration, outcome and attributes. LLM
+spans also carry token usage from the provider response and an estimated cost. Spans export as
+JSON lines (one span per line, for ad-hoc analysis) or OpenMetrics text (per-stage latency
+quantiles plus token and cost counters), so p95s can be tracked across runs.
+"""
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Estimated USD per million (input, output) tokens. Check provider pricing pages for current rates.
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00), "gpt-4-turbo": (10.00, 30.00), "gpt-3.5-turbo": (0.50, 1.50),
+    "claude-3-opus-20240229": (15.00, 75.00), "claude-3-sonnet-20240229": (3.00, 15.00),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "gemini-1.5-pro-latest": (3.50, 10.50), "gemini-1.5-flash-latest": (0.35, 1.05), "gemini-1.0-pro": (0.50, 1.50),
+    "deepseek-chat": (0.14, 0.28), "deepseek-coder": (0.14, 0.28),
+}
+METRIC_PREFIX = "competitor_intel"
+
+
+def estimate_cost(model_id: Optional[str], prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD cost of a request, or None for models without a known price."""
+    price = MODEL_PRICING.get(model_id or "")
+    if not price:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+class Span:
+    """One timed stage of a run; attributes are free-form and exported as-is"""
+    def __init__(self, tracer: "Tracer", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def record_usage(self, provider: str, model_id: Optional[str], prompt_tokens: int, completion_tokens: int,
+                     estimated: bool = False) -> None:
+        """Attaches LLM token usage and its estimated cost; `estimated` marks counts not reported by the provider."""
+        self.set(provider=provider, model=model_id, prompt_tokens=int(prompt_tokens),
+                 completion_tokens=int(completion_tokens), tokens_estimated=estimated,
+                 cost_usd=estimate_cost(model_id, prompt_tokens, completion_tokens))
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            "trace_id": self.tracer.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start": round(self.started_at, 6),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": "error" if self.error else "ok",
+        }
+        if self.error:
+            record["error"] = self.error
+        record.update(self.attributes)
+        return record
+
+
+class Tracer:
+    """Collects the spans of one run. Safe to use from worker threads."""
+    def __init__(self, **attributes: Any):
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = attributes # Added to every exported span, e.g. a batch company id
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self) -> Optional[Span]:
+        """The innermost open span on this thread, if any."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+        """Times the enclosed block as a span, nested under `parent` or this thread's current span."""
+        parent = parent or self.current()
+        span = Span(self, name, parent.span_id if parent else None, attributes)
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._started
+            stack.pop()
+            with self._lock:
+                self._spans.append(span)
+
+    def bind(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Wraps `fn` so spans it opens on another thread nest under the span that is current now."""
+        parent = self.current()
+
+        def bound(*args: Any, **kwargs: Any) -> Any:
+            stack = self._stack()
+            if parent is None or parent in stack:
+                return fn(*args, **kwargs)
+            stack.append(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stack.pop()
+        return bound
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Finished spans as dicts, in start order."""
+        with self._lock:
+            spans = sorted(self._spans, key=lambda s: s.started_at)
+        return [dict(span.to_dict(), **self.attributes) for span in spans]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        return summarize(self.records())
+
+    def to_jsonl(self) -> str:
+        return "".join(json.dumps(record, default=str) + "\n" for record in self.records())
+
+    def to_openmetrics(self) -> str:
+        return to_openmetrics(self.records())
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))]
+
+
+def summarize(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-stage count, latency percentiles, errors, tokens and cost, in order of first appearance."""
+    stages: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        stages.setdefault(record["name"], []).append(record)
+    rows = []
+    for name, spans in stages.items():
+        durations = [s["duration_ms"] / 1000 for s in spans if s.get("duration_ms") is not None]
+        costs = [s["cost_usd"] for s in spans if s.get("cost_usd") is not None]
+        rows.append({
+            "stage": name, "count": len(spans), "errors": sum(1 for s in spans if s.get("status") == "error"),
+            "total_s": sum(durations), "p50_s": _percentile(durations, 50), "p95_s": _percentile(durations, 95),
+            "max_s": max(durations) if durations else None,
+            "prompt_tokens": sum(s.get("prompt_tokens") or 0 for s in spans),
+            "completion_tokens": sum(s.get("completion_tokens") or 0 for s in spans),
+            "cost_usd": round(sum(costs), 6) if costs else None,
+        })
+    return rows
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def to_openmetrics(records: List[Dict[str, Any]]) -> str:
+    """Renders spans as OpenMetrics text: stage latency summaries, stage errors, LLM token and cost counters."""
+    duration = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines = [f"# TYPE {duration} summary", f"# UNIT {duration} seconds",
+             f"# HELP {duration} Duration of pipeline stages."]
+    errors = [f"# TYPE {METRIC_PREFIX}_stage_errors counter", f"# HELP {METRIC_PREFIX}_stage_errors Failed stage spans."]
+    for row in summarize(records):
+        stage = row["stage"]
+        for q, key in (("0.5", "p50_s"), ("0.95", "p95_s")):
+            if row[key] is not None:
+                lines.append(f"{duration}{_labels(stage=stage, quantile=q)} {row[key]:.6f}")
+        lines.append(f"{duration}_sum{_labels(stage=stage)} {row['total_s']:.6f}")
+        lines.append(f"{duration}_count{_labels(stage=stage)} {row['count']}")
+        errors.append(f"{METRIC_PREFIX}_stage_errors_total{_labels(stage=stage)} {row['errors']}")
+
+    tokens: Dict[Tuple[str, str, str], int] = {}
+    costs: Dict[Tuple[str, str], float] = {}
+    for record in records:
+        if record.get("prompt_tokens") is None:
+            continue
+        route = (str(record.get("provider")), str(record.get("model")))
+        for kind in ("prompt", "completion"):
+            tokens[route + (kind,)] = tokens.get(route + (kind,), 0) + (record.get(f"{kind}_tokens") or 0)
+        if record.get("cost_usd") is not None:
+            costs[route] = costs.get(route, 0.0) + record["cost_usd"]
+    lines += errors
+    lines += [f"# TYPE {METRIC_PREFIX}_llm_tokens counter", f"# HELP {METRIC_PREFIX}_llm_tokens LLM tokens used."]
+    lines += [f"{METRIC_PREFIX}_llm_tokens_total{_labels(provider=p, model=m, kind=k)} {n}" for (p, m, k), n in tokens.items()]
+    lines += [f"# TYPE {METRIC_PREFIX}_llm_cost_usd counter", f"# HELP {METRIC_PREFIX}_llm_cost_usd Estimated LLM cost in USD."]
+    lines += [f"{METRIC_PREFIX}_llm_cost_usd_total{_labels(provider=p, model=m)} {c:.6f}" for (p, m), c in costs.items()]
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,166 @@
+"""
+Watch mode: re-runs the competitor pipeline for one company on an interval and reports what changed.
+
+    python watch.py --url https://example.com --interval 6h --changes changes.jsonl
+
+Every poll searches and crawls the competitors again (crawl cache reads are bypassed so changes are
+seen), and the per-competitor snapshots (snapshots.py) limit the rest of the work to what changed:
+only competitors whose pages changed are re-summarized and re-analyzed, and the report is merged
+from the stored analyses of the others. Each poll appends a change report to --changes as a JSON
+line: competitors added, removed and changed since the previous poll, the analysis items that
+appeared or disappeared, how many competitors were re-analyzed and the LLM calls and cost it took.
+
+API keys are read from the environment, as in batch.py.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from batch import PROVIDER_KEY_ENV
+from cache import CrawlCache, get_response_cache
+from clients import PROVIDER_SDKS, provider_available
+from competitor_agent_team import DEFAULT_COMPETITOR_COUNT, DEFAULT_CRAWL_CONCURRENCY, MODEL_OPTIONS, CompetitorIntelligenceTeam
+from dedupe import DomainIndex
+from reporters import CollectingReporter
+from snapshots import SnapshotStore
+from summarize import DEFAULT_SUMMARY_MODE, SUMMARY_MODES
+from tracing import Tracer
+
+logger = logging.getLogger("competitor_intel.watch")
+
+DEFAULT_INTERVAL = 24 * 60 * 60  # One day
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_interval(value: str) -> float:
+    """Seconds in an interval such as "900", "15m", "6h" or "1d"."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", value.lower())
+    if not match or float(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(f"invalid interval: {value!r} (use e.g. 900, 15m, 6h or 1d)")
+    return float(match.group(1)) * INTERVAL_UNITS[match.group(2) or "s"]
+
+
+class Watcher:
+    """Polls the pipeline for one company, reusing snapshots so each poll costs roughly what changed"""
+    def __init__(self, args: argparse.Namespace, keys: Dict[str, str]):
+        self.args = args
+        self.keys = keys
+        self.snapshots = SnapshotStore()
+        self.crawl_cache = CrawlCache()
+        self.response_cache = get_response_cache(persist=True)
+        self.domain_index = DomainIndex()
+
+    def poll(self) -> Dict[str, Any]:
+        """Runs the pipeline once and returns the change report of this poll."""
+        reporter = CollectingReporter(prefix="watch")
+        tracer = Tracer()
+        started = time.monotonic()
+        team = CompetitorIntelligenceTeam(reporter=reporter, tracer=tracer)
+        team.configure_crawler(max_concurrency=self.args.crawl_concurrency)
+        team.configure_agents(
+            llm_provider=self.args.provider, llm_api_key=self.keys["llm"], llm_model_id=self.args.model,
+            firecrawl_key=self.keys["firecrawl"], exa_key=self.keys["exa"],
+            crawl_cache=self.crawl_cache, refresh_cache=True, response_cache=self.response_cache,
+            domain_index=self.domain_index, snapshots=self.snapshots, summary_mode=self.args.summaries,
+        )
+        is_url = bool(self.args.url)
+        competitors = team.discover_competitors(self.args.url or self.args.description, is_url, count=self.args.count)
+        report = team.generate_intelligence_report(competitors) if competitors else {}
+        if not competitors:
+            reporter.error("No competitors found or discovery failed.")
+        records = tracer.records()
+        costs = [r["cost_usd"] for r in records if r.get("cost_usd") is not None]
+        return dict(report.get("changes") or {}, **{
+            "input": self.args.url or self.args.description, "polled_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "competitors": len(competitors), "analysis_error": report.get("analysis_error"),
+            "llm_calls": sum(1 for r in records if r["name"] == "llm"),
+            "llm_cost_usd": round(sum(costs), 6) if costs else None,
+            "warnings": reporter.warnings, "errors": reporter.errors,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+        })
+
+    def run(self) -> int:
+        """Polls every `interval` seconds until `--polls` is reached or the process is interrupted."""
+        polls, next_poll = 0, time.monotonic()
+        while True:
+            changes = self.poll()
+            polls += 1
+            logger.info(describe_changes(changes))
+            if self.args.changes:
+                with open(self.args.changes, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(changes, default=str) + "\n")
+            if self.args.polls and polls >= self.args.polls:
+                return 0
+            # A poll that took longer than the interval is followed immediately, without catching up on missed ones
+            next_poll = max(next_poll + self.args.interval, time.monotonic())
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+
+
+def describe_changes(changes: Dict[str, Any]) -> str:
+    """One-line summary of a poll's change report."""
+    if changes.get("errors") and not changes.get("competitors"):
+        return f"Poll failed: {changes['errors'][0]}"
+    text = f"{changes['competitors']} competitors"
+    if changes.get("previous_run"):
+        text += (f": {len(changes['changed'])} changed, {len(changes['added'])} new, {len(changes['removed'])} gone"
+                 f"; {changes['reanalyzed']} re-analyzed")
+        items = sum(len(diff["added"]) + len(diff["removed"]) for diff in changes["analysis"].values())
+        text += f", {items} analysis items changed" if items else ", analysis unchanged"
+    else:
+        text += ", first snapshot"
+    text += f" ({changes['llm_calls']} LLM calls"
+    text += f", ${changes['llm_cost_usd']:.4f})" if changes["llm_cost_usd"] is not None else ")"
+    return text + (f". Analysis failed: {changes['analysis_error']}" if changes.get("analysis_error") else "")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Track a company's competitors and report what changed on each poll.")
+    subject = parser.add_mutually_exclusive_group(required=True)
+    subject.add_argument("--url", help="Your company's website")
+    subject.add_argument("--description", help="A description of your company")
+    parser.add_argument("--interval", type=parse_interval, default=DEFAULT_INTERVAL,
+                        help="Time between polls, e.g. 900, 15m, 6h or 1d (default 1d)")
+    parser.add_argument("--polls", type=int, default=0, help="Stop after this many polls (default: run until interrupted)")
+    parser.add_argument("--changes", help="Append each poll's change report to this JSONL file")
+    parser.add_argument("--count", type=int, default=DEFAULT_COMPETITOR_COUNT, help="Competitors to track")
+    parser.add_argument("--provider", choices=sorted(MODEL_OPTIONS), default="openai")
+    parser.add_argument("--model", help="Model id (defaults to the provider's first model)")
+    parser.add_argument("--crawl-concurrency", type=int, default=DEFAULT_CRAWL_CONCURRENCY)
+    parser.add_argument("--summaries", choices=sorted(SUMMARY_MODES), default=DEFAULT_SUMMARY_MODE,
+                        help="Summarize pages locally or in batched LLM requests")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    args.model = args.model or next(iter(MODEL_OPTIONS[args.provider]))
+    if not provider_available(args.provider):
+        parser.error(f"SDK not installed for {args.provider} (pip install {PROVIDER_SDKS[args.provider][1]})")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    keys = {
+        "llm": os.environ.get(PROVIDER_KEY_ENV[args.provider], ""),
+        "firecrawl": os.environ.get("FIRECRAWL_API_KEY", ""),
+        "exa": os.environ.get("EXA_API_KEY", ""),
+    }
+    missing = [name for name, value in ((PROVIDER_KEY_ENV[args.provider], keys["llm"]),
+                                        ("FIRECRAWL_API_KEY", keys["firecrawl"]), ("EXA_API_KEY", keys["exa"])) if not value]
+    if missing:
+        logger.error("Missing API keys in environment: %s", ", ".join(missing))
+        return 2
+    logger.info("Watching %s every %.0fs with %s/%s", args.url or "description", args.interval, args.provider, args.model)
+    try:
+        return Watcher(args, keys).run()
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())